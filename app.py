@@ -1,12 +1,22 @@
-from flask import Flask, render_template, jsonify, request, session, redirect, url_for, flash
+import json
+from flask import Flask, Response, render_template, jsonify, request, session, redirect, url_for, flash, abort, stream_with_context, g
 from psycopg2.errors import ForeignKeyViolation
 from functools import wraps
 from utils.database_manager import DatabaseManager
-from utils.auth_manager import AuthManager
+from utils.auth_manager import AuthManager, HashQueueFull
+from utils.pagination import clamp_page_size
+from utils.view_tracker import view_tracker
+from utils.cache import report_cache
+from utils.query_trace import query_tracer
+from utils import reports
+from routes.reaction_experiment import bp as reaction_experiment_bp
+from routes.simulate import bp as simulate_bp
 
 app = Flask(__name__)
 app.secret_key = 'simlab-secret-key-2024'
 app.config['JSON_AS_ASCII'] = False
+app.register_blueprint(reaction_experiment_bp)
+app.register_blueprint(simulate_bp)
 
 
 # ------------------------------
@@ -25,16 +35,74 @@ def require_login(role=None):
     return decorator
 
 
-def _render_generic(title, rows):
-    headers = list(rows[0].keys()) if rows else []
-    return render_template('reports/generic_report.html', title=title, headers=headers, rows=rows)
+# барања кон базата по request (utils/query_trace.py) → Server-Timing
+@app.before_request
+def _start_query_trace():
+    g.query_trace_token = query_tracer.start(request.endpoint or '<unmatched>')
+
+
+@app.after_request
+def _add_server_timing(response):
+    trace = query_tracer.current()
+    if trace is not None:
+        response.headers.add('Server-Timing', trace.server_timing())
+    return response
+
+
+@app.teardown_request
+def _finish_query_trace(exc):
+    query_tracer.finish(g.pop('query_trace_token', None))
+
+
+def _render_generic(title, rows, refreshed_at=None, headers=None):
+    headers = list(headers) if headers else (list(rows[0].keys()) if rows else [])
+    return render_template('reports/generic_report.html', title=title, headers=headers, rows=rows,
+                           refreshed_at=refreshed_at)
+
+
+# report name -> (TTL во секунди, табели од кои се пресметува)
+_REPORT_POLICY = {
+    'equipment_usage':                 (600, ('labequipment', 'experimentlabequipment')),
+    'teacher_statistics':              (300, ('User', 'teacher', 'student', 'userparticipatesinexperiment')),
+    'inactive_students':               (120, ('User', 'student', 'userparticipatesinexperiment')),
+    'element_views':                   (120, ('User', 'elements', 'userviewselement')),
+    'detailed_experiments':            (120, ('User', 'student', 'experiment', 'reaction', 'elements',
+                                              'userparticipatesinexperiment', 'mv_students_experiments')),
+    'low_activity_students':           (120, ('User', 'student', 'userparticipatesinexperiment')),
+    'student_experiments':             (120, ('User', 'student', 'experiment', 'reaction', 'elements',
+                                              'userparticipatesinexperiment')),
+    'user_activity':                   (120, ('User', 'userviewselement', 'userviewslabequipment',
+                                              'userparticipatesinexperiment', 'mv_user_activity_summary')),
+}
+# напредните извештаи ги носат TTL и зависностите во својата дефиниција
+_REPORT_POLICY.update({'adv_' + r.name: (r.ttl, r.depends_on) for r in reports.REPORTS.values()})
+
+
+def _cached_report(name, loader, *params):
+    """(rows, refreshed_at) for a report; ?refresh=1 forces recomputation."""
+    ttl, tables = _REPORT_POLICY[name]
+    rows, refreshed_at = report_cache.get(name, params, loader, ttl=ttl, depends_on=tables,
+                                          force=bool(request.args.get('refresh')))
+    return (rows if rows is not None else []), refreshed_at
+
+
+def _page_args():
+    return request.args.get('page_token'), clamp_page_size(request.args.get('page_size'))
+
+
+@app.template_global()
+def with_total():
+    """True for ?with_total=1 / true; list totals (COUNT(*)) are computed only then."""
+    return request.args.get('with_total', '').strip().lower() in ('1', 'true')
 
 
 def _enrich_with_equipment(exp_rows):
+    exp_rows = exp_rows or []
+    by_exp = DatabaseManager.get_equipment_for_experiments(r['experiment_id'] for r in exp_rows)
     enriched = []
-    for row in (exp_rows or []):
+    for row in exp_rows:
         exp = dict(row)
-        exp['equipment'] = DatabaseManager.get_experiment_equipment(exp['experiment_id']) or []
+        exp['equipment'] = by_exp.get(exp['experiment_id']) or []
         enriched.append(exp)
     return enriched
 
@@ -62,16 +130,80 @@ def test_db():
     return jsonify({'status': 'error', 'message': 'Грешка при поврзување'})
 
 
+@app.route('/api/db-pool')
+@require_login('teacher')
+def db_pool_stats():
+    return jsonify(DatabaseManager.get_pool_stats()), 200
+
+
+@app.route('/api/view-tracking')
+@require_login('teacher')
+def view_tracking_stats():
+    return jsonify(view_tracker.stats()), 200
+
+
+@app.route('/api/auth-hashing')
+@require_login('teacher')
+def auth_hashing_stats():
+    return jsonify(AuthManager.hashing_stats()), 200
+
+
+@app.route('/api/query-stats', methods=['GET', 'DELETE'])
+@require_login('teacher')
+def query_stats():
+    # DELETE → почни ново мерење
+    if request.method == 'DELETE':
+        query_tracer.reset()
+    return jsonify(DatabaseManager.get_query_stats()), 200
+
+
+@app.route('/api/cache-stats')
+@require_login('teacher')
+def cache_stats():
+    return jsonify(DatabaseManager.get_cache_stats()), 200
+
+
+@app.route('/api/schema')
+@require_login('teacher')
+def schema_status():
+    status = DatabaseManager.get_schema_status()
+    if status is None:
+        return jsonify({'status': 'error', 'message': 'Грешка при читање од базата'}), 500
+    return jsonify(status), 200
+
+
+@app.route('/api/matviews', methods=['GET', 'POST'])
+@require_login('teacher')
+def matview_status():
+    # POST → освежи ги сите materialized views веднаш
+    if request.method == 'POST':
+        return jsonify({'refreshed': DatabaseManager.refresh_matviews(),
+                        **DatabaseManager.get_matview_status()}), 200
+    return jsonify(DatabaseManager.get_matview_status()), 200
+
+
 @app.route('/users')
 def users():
-    users = DatabaseManager.get_all_users()
-    if users:
-        return jsonify({
+    if request.args.get('stream'):
+        # NDJSON преку server-side cursor – без целата табела во меморија
+        rows = DatabaseManager.stream_query(
+            'SELECT user_id, user_name, user_surname, email, role FROM "User" ORDER BY user_name, user_id'
+        )
+        body = (json.dumps(dict(r), ensure_ascii=False, default=str) + '\n' for r in rows)
+        return Response(stream_with_context(body), mimetype='application/x-ndjson')
+
+    page = DatabaseManager.get_users_page(*_page_args())
+    if page:
+        payload = {
             'status': 'success',
-            'sql_query': 'SELECT user_id, user_name, user_surname, email, role FROM "User" ORDER BY user_name',
-            'count': len(users),
-            'data': users
-        })
+            'sql_query': 'SELECT user_id, user_name, user_surname, email, role FROM "User" ORDER BY user_name, user_id',
+            'count': len(page),
+            'next_page_token': page.next_token,
+            'data': page.items
+        }
+        if with_total():
+            payload['total'] = int(page.total)
+        return jsonify(payload)
     return jsonify({'status': 'error', 'message': 'Нема корисници'})
 
 
@@ -81,7 +213,24 @@ def login():
         email = (request.form['email'] or '').strip().lower()  # normalize
         password = request.form['password']
         user = DatabaseManager.authenticate_user(email, password)
-        if user and AuthManager.verify_password(password, user['password']):
+        try:
+            if user:
+                valid = AuthManager.verify_password(password, user['password'])
+            else:
+                valid = AuthManager.dummy_verify(password)
+        except HashQueueFull:
+            return render_template('login.html', error='Серверот е преоптоварен, обиди се повторно.'), 503
+        if valid:
+            legacy = not DatabaseManager.password_hash_format_ready()
+            try:
+                if AuthManager.needs_rehash(user['password'], legacy=legacy):
+                    # параметрите за хеширање се сменети → зачувај нов hash од веќе проверената лозинка
+                    DatabaseManager.update_user_password(user['user_id'], AuthManager.hash_password(password))
+            except HashQueueFull:
+                pass    # ќе се обиде при следната најава
+            except ValueError:
+                # погрешни PASSWORD_* параметри – најавата сепак успева со стариот hash
+                app.logger.exception("password rehash failed (user_id=%s)", user['user_id'])
             session['user_id'] = user['user_id']
             session['user_name'] = user['user_name']
             session['role'] = user['role']
@@ -109,7 +258,13 @@ def register():
             except ValueError:
                 return render_template('register.html', error='Невалиден наставник.', teachers=teachers)
 
-        password_hash = AuthManager.hash_password(password)
+        try:
+            # стар формат додека колоната не е проширена (миграција 6)
+            password_hash = AuthManager.hash_password(
+                password, legacy=not DatabaseManager.password_hash_format_ready())
+        except HashQueueFull:
+            return render_template('register.html', error='Серверот е преоптоварен, обиди се повторно.',
+                                   teachers=teachers), 503
         user_id = DatabaseManager.register_user(name, surname, email, password_hash, role, teacher_id)
         if user_id:
             return redirect(url_for('login'))
@@ -184,16 +339,16 @@ def api_debug_dashboard():
 @app.route('/elements')
 @require_login()
 def elements():
-    elements_data = DatabaseManager.get_all_elements()
-    if elements_data:
-        return render_template('elements_list.html', elements=elements_data, user_role=session['role'])
+    page = DatabaseManager.get_elements_page(*_page_args())
+    if page:
+        return render_template('elements_list.html', elements=page, page=page, user_role=session['role'])
     return render_template('elements_list.html', elements=[], error='Нема елементи во базата')
 
 
 @app.route('/elements/<int:element_id>')
 @require_login()
 def element_detail(element_id):
-    DatabaseManager.track_element_view(session['user_id'], element_id)
+    view_tracker.track_element_view(session['user_id'], element_id)
     element = DatabaseManager.get_element_by_id(element_id)
     if element:
         return render_template('element_detail.html', element=element, user_role=session['role'])
@@ -253,9 +408,9 @@ def edit_element(element_id):
 @app.route('/equipment')
 @require_login()
 def equipment():
-    equipment_data = DatabaseManager.get_all_equipment()
-    if equipment_data:
-        return render_template('equipment_list.html', equipment=equipment_data, user_role=session['role'])
+    page = DatabaseManager.get_equipment_page(*_page_args())
+    if page:
+        return render_template('equipment_list.html', equipment=page, page=page, user_role=session['role'])
     return render_template('equipment_list.html', equipment=[], error='Нема опрема во базата')
 
 
@@ -278,7 +433,7 @@ def add_equipment():
 @app.route('/equipment/<int:equipment_id>')
 @require_login()
 def equipment_detail(equipment_id):
-    DatabaseManager.track_equipment_view(session['user_id'], equipment_id)
+    view_tracker.track_equipment_view(session['user_id'], equipment_id)
     equipment_data = DatabaseManager.get_all_equipment()
     equipment = None
     for item in (equipment_data or []):
@@ -313,8 +468,8 @@ def edit_equipment(equipment_id):
 @app.route('/reactions')
 @require_login()
 def reactions():
-    reactions_data = DatabaseManager.get_all_reactions()
-    return render_template('reactions_list.html', reactions=reactions_data, user_role=session['role'])
+    page = DatabaseManager.get_reactions_page(*_page_args())
+    return render_template('reactions_list.html', reactions=page, page=page, user_role=session['role'])
 
 
 @app.route('/reactions/add', methods=['GET', 'POST'])
@@ -404,6 +559,7 @@ def delete_reaction(reaction_id):
 # Laboratory + APIs
 # ------------------------------
 @app.route('/laboratory')
+@app.route('/virtual-lab')       # поранешната адреса од routes/virtual_lab.py
 @require_login()
 def laboratory():
     elements = DatabaseManager.get_all_elements()
@@ -412,62 +568,19 @@ def laboratory():
     return render_template('virtual_laboratory.html', elements=elements, user_role=session['role'])
 
 
-def _to_element_id(v):
-    # пробај како int
-    try:
-        return int(v)
-    except Exception:
-        pass
-    # fallback: симбол/име -> id
-    row = DatabaseManager.execute_query("""
-        SELECT element_id
-        FROM elements
-        WHERE UPPER(symbol)=UPPER(%s) OR UPPER(element_name)=UPPER(%s)
-        LIMIT 1
-    """, (v, v)) or []
-    return row[0]['element_id'] if row else None
-
-@app.route('/api/simulate-reaction', methods=['POST'])
-@require_login()
-def simulate_reaction():
-    try:
-        data = request.get_json(silent=True) or {}
-        e1 = _to_element_id(data.get('element1_id') or data.get('element1'))
-        e2 = _to_element_id(data.get('element2_id') or data.get('element2'))
-        if not e1 or not e2:
-            return jsonify({'success': False, 'message': 'Недостигаат валидни element_id вредности.'}), 400
-
-        rx = DatabaseManager.get_reaction_by_element_ids(e1, e2)
-        if not rx:
-            return jsonify({'success': False, 'message': 'Реакцијата не е дефинирана во системот.'}), 200
-
-        rx_full = DatabaseManager.get_reaction_by_id(rx['reaction_id']) or {}
-        exp     = DatabaseManager.get_experiment_by_reaction(rx['reaction_id'])
-
-        return jsonify({
-            'success': True,
-            'product': rx.get('product'),
-            'conditions': rx.get('conditions'),
-            'reaction_id': rx['reaction_id'],
-            'experiment_id': exp['experiment_id'] if exp else None,
-            'elements': f"{rx_full.get('element1_name','')} + {rx_full.get('element2_name','')}"
-        }), 200
-    except Exception as e:
-        app.logger.exception("simulate_reaction failed")
-        return jsonify({'success': False, 'message': f'Серверска грешка: {str(e)}'}), 500
-
 @app.route('/api/check-reaction', methods=['POST'])
 @require_login()
 def check_reaction():
     try:
         data = request.get_json(silent=True) or {}
-        e1 = _to_element_id(data.get('element1_id') or data.get('element1'))
-        e2 = _to_element_id(data.get('element2_id') or data.get('element2'))
-        if not e1 or not e2:
-            return jsonify({'success': False, 'message': 'Недостигаат валидни element_id вредности.'}), 400
-
-        rx = DatabaseManager.get_reaction_by_element_ids(e1, e2)
+        rx = DatabaseManager.resolve_reaction_pair(
+            data.get('element1_id') or data.get('element1'),
+            data.get('element2_id') or data.get('element2'),
+            with_experiment=False,
+        )
         if not rx:
+            return jsonify({'success': False, 'message': 'Недостигаат валидни element_id вредности.'}), 400
+        if not rx['reaction_id']:
             return jsonify({'success': False, 'message': 'Реакцијата не е дефинирана во системот.'}), 200
 
         return jsonify({
@@ -513,23 +626,17 @@ def save_experiment():
 @app.route('/experiments')
 @require_login()
 def experiments():
-    base = DatabaseManager.get_all_experiments()
-    experiments = _enrich_with_equipment(base)
-    return render_template('experiments_list.html', experiments=experiments, user_role=session['role'])
+    page = DatabaseManager.get_experiments_page(*_page_args(), with_equipment=True)
+    return render_template('experiments_list.html', experiments=page, page=page, user_role=session['role'])
 
 
 @app.route('/experiments/<int:experiment_id>')
 @require_login()
 def experiment_detail(experiment_id):
-    experiments_list = DatabaseManager.get_all_experiments()
-    experiment = None
-    for exp in (experiments_list or []):
-        if exp['experiment_id'] == experiment_id:
-            experiment = exp
-            break
+    experiment = DatabaseManager.get_experiment_by_id(experiment_id, with_equipment=True)
     if not experiment:
         return redirect(url_for('experiments'))
-    equipment = DatabaseManager.get_experiment_equipment(experiment_id)
+    equipment = experiment.pop('equipment', None) or []
     return render_template('experiment_detail.html', experiment=experiment, equipment=equipment, user_role=session['role'])
 
 
@@ -551,10 +658,9 @@ def my_students():
 @require_login()
 def my_experiments():
     if session['role'] == 'student':
-        base = DatabaseManager.get_student_participation_experiments(session['user_id'])
+        experiments = DatabaseManager.get_student_participation_experiments(session['user_id'], with_equipment=True)
     else:
-        base = DatabaseManager.get_user_experiments(session['user_id'])
-    experiments = _enrich_with_equipment(base)
+        experiments = DatabaseManager.get_user_experiments(session['user_id'], with_equipment=True)
     return render_template('my_experiments.html', experiments=experiments, user_name=session['user_name'], user_role=session['role'])
 
 
@@ -570,10 +676,11 @@ def reports_menu():
 @app.route('/reports/equipment-usage')
 @require_login('teacher')
 def reports_equipment_usage():
-    usage_report = DatabaseManager.get_equipment_usage_report()
+    usage_report, refreshed_at = _cached_report('equipment_usage', DatabaseManager.get_equipment_usage_report)
     if usage_report:
         return jsonify({
             'status': 'success',
+            'refreshed_at': refreshed_at.isoformat(timespec='seconds'),
             'report_name': 'Извештај за користење на лабораториска опрема',
             'sql_query': '''
                 SELECT le.equipment_name, COUNT(ele.experiment_id) AS usage_count
@@ -591,259 +698,115 @@ def reports_equipment_usage():
 @app.route('/reports/teacher_statistics')
 @require_login('teacher')
 def reports_teacher_statistics():
-    stats = DatabaseManager.get_teacher_statistics()
-    return render_template('reports/teacher_statistics.html', statistics=stats)
+    stats, refreshed_at = _cached_report('teacher_statistics', DatabaseManager.get_teacher_statistics)
+    return render_template('reports/teacher_statistics.html', statistics=stats, refreshed_at=refreshed_at)
 
 
 @app.route('/reports/inactive_students')
 @require_login('teacher')
 def reports_inactive_students():
     teacher_id = session['user_id']
-    students = DatabaseManager.get_students_without_experiments(teacher_id)
-    return render_template('reports/inactive_students.html', students=students)
+    students, refreshed_at = _cached_report(
+        'inactive_students', lambda: DatabaseManager.get_students_without_experiments(teacher_id), teacher_id)
+    return render_template('reports/inactive_students.html', students=students, refreshed_at=refreshed_at)
 
 
 @app.route('/reports/element_views')
 @require_login('teacher')
 def reports_element_views():
-    views_data = DatabaseManager.get_element_views_report()
-    return render_template('reports/element_views.html', views=views_data)
+    views_data, refreshed_at = _cached_report('element_views', DatabaseManager.get_element_views_report)
+    return render_template('reports/element_views.html', views=views_data, refreshed_at=refreshed_at)
 
 
 @app.route('/reports/detailed_experiments')
 @require_login('teacher')
 def reports_detailed_experiments():
     teacher_id = session['user_id']
-    experiments = DatabaseManager.get_students_experiments_detailed(teacher_id)
-    return render_template('reports/detailed_experiments.html', experiments=experiments)
+    experiments, refreshed_at = _cached_report(
+        'detailed_experiments', lambda: DatabaseManager.get_students_experiments_detailed(teacher_id), teacher_id)
+    return render_template('reports/detailed_experiments.html', experiments=experiments, refreshed_at=refreshed_at)
 
 
 @app.route('/reports/low_activity_students')
 @require_login('teacher')
 def reports_low_activity_students():
     teacher_id = session['user_id']
-    students = DatabaseManager.get_students_with_few_experiments(teacher_id, 3)
-    return render_template('reports/low_activity_students.html', students=students)
+    students, refreshed_at = _cached_report(
+        'low_activity_students', lambda: DatabaseManager.get_students_with_few_experiments(teacher_id, 3), teacher_id, 3)
+    return render_template('reports/low_activity_students.html', students=students, refreshed_at=refreshed_at)
 
 
 @app.route('/reports/student_experiments')
 @require_login('teacher')
 def reports_student_experiments():
     teacher_id = session['user_id']
-    experiments = DatabaseManager.get_students_experiments_for_teacher(teacher_id)
-    return render_template('reports/student_experiments.html', student_experiments=experiments)
+    experiments, refreshed_at = _cached_report(
+        'student_experiments', lambda: DatabaseManager.get_students_experiments_for_teacher(teacher_id), teacher_id)
+    return render_template('reports/student_experiments.html', student_experiments=experiments,
+                           refreshed_at=refreshed_at)
 
 
 @app.route('/reports/user_activity')
 @require_login('teacher')
 def reports_user_activity():
-    summary = DatabaseManager.get_user_activity_summary()
-    return render_template('reports/user_activity.html', summary=summary)
+    summary, refreshed_at = _cached_report('user_activity', DatabaseManager.get_user_activity_summary)
+    return render_template('reports/user_activity.html', summary=summary, refreshed_at=refreshed_at)
 
 
 # ------------------------------
 # Advanced Reports (SQL)
 # ------------------------------
-@app.route('/reports/adv/student_experiment_counts')
-@require_login('teacher')
-def reports_adv_student_experiment_counts():
-    sql = """
-        SELECT 
-            s.student_id,
-            u.user_name || ' ' || u.user_surname AS full_name,
-            COUNT(up.experiment_id) AS total_experiments
-        FROM student s
-        JOIN "User" u ON s.student_id = u.user_id
-        LEFT JOIN userparticipatesinexperiment up ON s.student_id = up.user_id
-        LEFT JOIN experiment e ON up.experiment_id = e.experiment_id
-        WHERE s.teacher_id = %s
-        GROUP BY s.student_id, full_name
-        ORDER BY total_experiments DESC, full_name
-    """
-    rows = DatabaseManager.execute_query(sql, (session['user_id'],)) or []
-    return _render_generic("Студенти и број на извршени експерименти", rows)
-
-
-@app.route('/reports/adv/equipment_usage')
-@require_login('teacher')
-def reports_adv_equipment_usage():
-    sql = """
-        SELECT 
-            le.equipment_name,
-            COUNT(ele.experiment_id) AS usage_count
-        FROM experimentlabequipment ele
-        JOIN labequipment le ON ele.equipment_id = le.equipment_id
-        GROUP BY le.equipment_name
-        ORDER BY usage_count DESC, le.equipment_name
-    """
-    rows = DatabaseManager.execute_query(sql) or []
-    return _render_generic("Користеност на лабораториска опрема", rows)
-
-
-@app.route('/reports/adv/students_experiments_detailed')
-@require_login('teacher')
-def reports_adv_students_experiments_detailed():
-    sql = """
-        SELECT 
-            s.student_id,
-            u.user_name || ' ' || u.user_surname AS full_name,
-            e.experiment_id,
-            e.result,
-            up.participation_timestamp AS participation_time
-        FROM student s
-        JOIN "User" u ON s.student_id = u.user_id
-        JOIN userparticipatesinexperiment up ON s.student_id = up.user_id
-        JOIN experiment e ON up.experiment_id = e.experiment_id
-        WHERE s.teacher_id = %s
-        ORDER BY u.user_name, up.participation_timestamp DESC
-    """
-    rows = DatabaseManager.execute_query(sql, (session['user_id'],)) or []
-    return _render_generic("Детален извештај: студенти и експерименти", rows)
-
-
-@app.route('/reports/adv/experiment_participants')
-@require_login('teacher')
-def reports_adv_experiment_participants():
-    experiment_id = request.args.get('experiment_id', type=int)
-    if not experiment_id:
-        exps = DatabaseManager.execute_query(
-            "SELECT experiment_id, result FROM experiment ORDER BY experiment_id DESC"
-        ) or []
-        return render_template('reports/experiment_participants.html', experiments=exps)
-
-    sql = """
-        SELECT 
-            s.student_id,
-            u.user_name || ' ' || u.user_surname AS full_name,
-            e.experiment_id,
-            e.result
-        FROM student s
-        JOIN "User" u ON s.student_id = u.user_id
-        JOIN userparticipatesinexperiment up ON s.student_id = up.user_id
-        JOIN experiment e ON up.experiment_id = e.experiment_id
-        WHERE s.teacher_id = %s AND e.experiment_id = %s
-        ORDER BY u.user_name
-    """
-    rows = DatabaseManager.execute_query(sql, (session['user_id'], experiment_id)) or []
-    return _render_generic(f"Студенти кои го извршиле експеримент #{experiment_id}", rows)
-
-
-@app.route('/reports/adv/avg_equipment_per_experiment')
-@require_login('teacher')
-def reports_adv_avg_equipment_per_experiment():
-    sql = """
-        SELECT 
-            COALESCE(AVG(instrument_count), 0) AS average_lab_equipment_per_experiment
-        FROM (
-            SELECT e.experiment_id, COUNT(ele.equipment_id) AS instrument_count
-            FROM experiment e
-            LEFT JOIN experimentlabequipment ele ON e.experiment_id = ele.experiment_id
-            GROUP BY e.experiment_id
-        ) subquery
-    """
-    rows = DatabaseManager.execute_query(sql) or []
-    return _render_generic("Просечен број инструменти по експеримент", rows)
-
-
-@app.route('/reports/adv/most_used_elements')
-@require_login('teacher')
-def reports_adv_most_used_elements():
-    sql = """
-        SELECT 
-            el.element_name,
-            COUNT(r.reaction_id) AS total_uses
-        FROM elements el
-        JOIN reaction r 
-          ON el.element_id = r.element1_id 
-          OR el.element_id = r.element2_id
-        GROUP BY el.element_name
-        ORDER BY total_uses DESC, el.element_name
-    """
-    rows = DatabaseManager.execute_query(sql) or []
-    return _render_generic("Најчесто користени елементи во експерименти", rows)
-
-
-@app.route('/reports/adv/most_performed_experiments')
-@require_login('teacher')
-def reports_adv_most_performed_experiments():
-    sql = """
-        SELECT 
-            e.experiment_id,
-            e.result,
-            COUNT(up.user_id) AS student_participation
-        FROM experiment e
-        LEFT JOIN userparticipatesinexperiment up 
-               ON e.experiment_id = up.experiment_id
-        GROUP BY e.experiment_id, e.result
-        ORDER BY student_participination DESC, e.experiment_id
-    """
-    sql = sql.replace("student_participination", "student_participation")
-    rows = DatabaseManager.execute_query(sql) or []
-    return _render_generic("Најчесто реализирани експерименти", rows)
-
-
-@app.route('/reports/adv/never_participated_students')
-@require_login('teacher')
-def reports_adv_never_participated_students():
-    sql = """
-        SELECT 
-            s.student_id,
-            u.user_name || ' ' || u.user_surname AS full_name
-        FROM student s
-        JOIN "User" u ON s.student_id = u.user_id
-        LEFT JOIN userparticipatesinexperiment up ON s.student_id = up.user_id
-        WHERE s.teacher_id = %s
-          AND up.user_id IS NULL
-        ORDER BY full_name
-    """
-    rows = DatabaseManager.execute_query(sql, (session['user_id'],)) or []
-    return _render_generic("Студенти кои никогаш не учествувале во експерименти", rows)
-
-
-@app.route('/reports/adv/students_below_threshold')
+def _experiment_picker():
+    exps = DatabaseManager.execute_query(
+        "SELECT experiment_id, result FROM experiment ORDER BY experiment_id DESC"
+    ) or []
+    return render_template('reports/experiment_participants.html', experiments=exps)
+
+
+# извештаи кои без задолжителниот параметар прикажуваат форма за избор
+_REPORT_PICKERS = {'experiment_participants': _experiment_picker}
+
+
+@app.route('/reports/adv')
 @require_login('teacher')
-def reports_adv_students_below_threshold():
-    max_exp = request.args.get('max', default=3, type=int)
-    sql = """
-        SELECT 
-            s.student_id,
-            u.user_name || ' ' || u.user_surname AS full_name,
-            COUNT(up.experiment_id) AS total_experiments
-        FROM student s
-        JOIN "User" u ON s.student_id = u.user_id
-        LEFT JOIN userparticipatesinexperiment up ON s.student_id = up.user_id
-        WHERE s.teacher_id = %s
-        GROUP BY s.student_id, full_name
-        HAVING COUNT(up.experiment_id) < %s
-        ORDER BY total_experiments ASC, full_name
-    """
-    rows = DatabaseManager.execute_query(sql, (session['user_id'], max_exp)) or []
-    return _render_generic(f"Студенти со помалку од {max_exp} експерименти", rows)
-
-
-@app.route('/reports/adv/student_views')
+def reports_adv_index():
+    return jsonify({'reports': [r.as_dict() for r in reports.REPORTS.values()]})
+
+
+@app.route('/reports/adv/<name>')
 @require_login('teacher')
-def reports_adv_student_views():
-    sql = """
-        SELECT 
-            s.student_id,
-            u.user_name || ' ' || u.user_surname AS full_name,
-            COUNT(DISTINCT ue.element_id)  AS total_elements_viewed,
-            COUNT(DISTINCT ul.equipment_id) AS total_lab_equipment_viewed
-        FROM student s
-        JOIN "User" u ON s.student_id = u.user_id
-        LEFT JOIN userviewselement     ue ON s.student_id = ue.user_id
-        LEFT JOIN userviewslabequipment ul ON s.student_id = ul.user_id
-        WHERE s.teacher_id = %s
-        GROUP BY s.student_id, full_name
-        ORDER BY total_elements_viewed DESC, total_lab_equipment_viewed DESC
-    """
-    rows = DatabaseManager.execute_query(sql, (session['user_id'],)) or []
-    return _render_generic("Прегледи на елементи и опрема по студент", rows)
+def reports_adv(name):
+    """Registered report (utils/reports.py) as HTML, or JSON with ?format=json."""
+    report = reports.get(name)
+    if report is None:
+        abort(404)
+    try:
+        values = report.bind(request.args, session['user_id'])
+    except reports.MissingParameter as ex:
+        values, missing = None, str(ex)
+    if values is None:
+        if name in _REPORT_PICKERS:
+            return _REPORT_PICKERS[name]()
+        return jsonify({'status': 'error', 'message': f'Недостасува параметар: {missing}'}), 400
+
+    rows, refreshed_at = _cached_report('adv_' + name, lambda: DatabaseManager.run_report(report, values), *values)
+    title = report.format_title(values)
+    if request.args.get('format') == 'json':
+        return jsonify({
+            'status': 'success',
+            'report': name,
+            'title': title,
+            'columns': list(report.columns),
+            'rows': rows,
+            'refreshed_at': refreshed_at.isoformat(timespec='seconds'),
+        })
+    return _render_generic(title, rows, refreshed_at, headers=report.columns)
 
 
 # ------------------------------
 # Run
 # ------------------------------
 if __name__ == '__main__':
+    DatabaseManager.migrate_schema()
+    DatabaseManager.detect_capabilities()
     app.run(debug=True)
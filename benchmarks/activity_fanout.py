@@ -0,0 +1,152 @@
+# activity_fanout.py
+"""Regression benchmark for the per-student activity aggregates.
+
+Builds TEMP copies of the activity tables (they shadow the real ones for this
+session only, nothing is written to the database), grows the view history of
+every student and compares the old multi-LEFT-JOIN form with the queries the
+app now runs. For each size it reports execution time and the largest row
+count produced by any plan node, which is what exposes the fan-out:
+the old form grows with views_e * views_l per student, the new one with
+views_e + views_l.
+
+    python -m benchmarks.activity_fanout [--students 10] [--sizes 50,100,200,500]
+
+Exits with 1 if the new queries stop scaling linearly or return different rows.
+"""
+import argparse, sys, time
+
+from utils.database_manager import DatabaseManager, _MY_STUDENTS_ACTIVITY_SQL, _USER_ACTIVITY_SUMMARY_SQL
+from utils import reports
+
+TEACHER_ID = 1
+
+# облиците пред исправката (за споредба)
+LEGACY_MY_STUDENTS_ACTIVITY_SQL = """
+    SELECT
+        s.student_id,
+        (u.user_name || ' ' || u.user_surname) AS full_name,
+        COALESCE(COUNT(DISTINCT uve.element_id), 0)      AS total_elements_viewed,
+        COALESCE(COUNT(DISTINCT uvl.equipment_id), 0)    AS total_lab_equipment_viewed
+    FROM student s
+    JOIN "User" u ON s.student_id = u.user_id
+    LEFT JOIN userviewselement      uve ON s.student_id = uve.user_id
+    LEFT JOIN userviewslabequipment uvl ON s.student_id = uvl.user_id
+    WHERE s.teacher_id = %s
+    GROUP BY s.student_id, full_name
+    ORDER BY total_elements_viewed DESC, total_lab_equipment_viewed DESC
+"""
+
+LEGACY_USER_ACTIVITY_SUMMARY_SQL = """
+    SELECT
+        u.user_id,
+        (u.user_name || ' ' || u.user_surname) AS full_name,
+        u.role,
+        COUNT(DISTINCT uve.element_id)     AS elements_viewed,
+        COUNT(DISTINCT uvl.equipment_id)   AS equipment_viewed,
+        COUNT(DISTINCT upe.experiment_id)  AS experiments_participated
+    FROM "User" u
+    LEFT JOIN userviewselement           uve ON u.user_id = uve.user_id
+    LEFT JOIN userviewslabequipment      uvl ON u.user_id = uvl.user_id
+    LEFT JOIN userparticipatesinexperiment upe ON u.user_id = upe.user_id
+    GROUP BY u.user_id, full_name, u.role
+    ORDER BY full_name
+"""
+
+# (name, legacy sql, current sql, params)
+CASES = [
+    ("my_students_activity", LEGACY_MY_STUDENTS_ACTIVITY_SQL, _MY_STUDENTS_ACTIVITY_SQL, (TEACHER_ID,)),
+    ("adv_student_views", LEGACY_MY_STUDENTS_ACTIVITY_SQL,
+     reports.get('student_views').sql.replace('$1', '%s'), (TEACHER_ID,)),
+    ("user_activity_summary", LEGACY_USER_ACTIVITY_SUMMARY_SQL, _USER_ACTIVITY_SUMMARY_SQL, ()),
+]
+
+_SETUP = """
+    CREATE TEMP TABLE "User" (user_id INT PRIMARY KEY, user_name TEXT, user_surname TEXT, role TEXT);
+    CREATE TEMP TABLE student (student_id INT PRIMARY KEY, teacher_id INT);
+    CREATE TEMP TABLE userviewselement (user_id INT, element_id INT, PRIMARY KEY (user_id, element_id));
+    CREATE TEMP TABLE userviewslabequipment (user_id INT, equipment_id INT, PRIMARY KEY (user_id, equipment_id));
+    CREATE TEMP TABLE userparticipatesinexperiment (user_id INT, experiment_id INT,
+                                                    PRIMARY KEY (user_id, experiment_id));
+"""
+
+
+def _populate(cur, students, element_views):
+    equipment_views = max(1, element_views * 2 // 5)      # 500 елементи → 200 опрема
+    experiments = max(1, element_views // 100)
+    cur.execute("TRUNCATE \"User\", student, userviewselement, userviewslabequipment, userparticipatesinexperiment")
+    cur.execute("""
+        INSERT INTO "User" SELECT g, 'Student', 'No' || g, 'student' FROM generate_series(1, %(s)s) g;
+        INSERT INTO student SELECT g, %(t)s FROM generate_series(1, %(s)s) g;
+        INSERT INTO userviewselement SELECT u, e FROM generate_series(1, %(s)s) u, generate_series(1, %(ve)s) e;
+        INSERT INTO userviewslabequipment SELECT u, e FROM generate_series(1, %(s)s) u, generate_series(1, %(vl)s) e;
+        INSERT INTO userparticipatesinexperiment
+            SELECT u, e FROM generate_series(1, %(s)s) u, generate_series(1, %(p)s) e;
+        ANALYZE "User"; ANALYZE student; ANALYZE userviewselement;
+        ANALYZE userviewslabequipment; ANALYZE userparticipatesinexperiment;
+    """, {'s': students, 't': TEACHER_ID, 've': element_views, 'vl': equipment_views, 'p': experiments})
+    return equipment_views
+
+
+def _max_rows(plan):
+    rows = plan.get('Actual Rows', 0) * plan.get('Actual Loops', 1)
+    return max([rows] + [_max_rows(p) for p in plan.get('Plans', [])])
+
+
+def _measure(cur, sql, params):
+    cur.execute("EXPLAIN (ANALYZE, FORMAT JSON) " + sql, params)
+    raw = cur.fetchone()
+    plan = (raw['QUERY PLAN'] if isinstance(raw, dict) else raw[0])[0]
+    cur.execute(sql, params)
+    rows = [tuple(r.values()) if isinstance(r, dict) else tuple(r) for r in cur.fetchall()]
+    return plan['Execution Time'], _max_rows(plan['Plan']), sorted(rows)
+
+
+def run(students, sizes):
+    conn = DatabaseManager.get_connection()
+    ok = True
+    try:
+        with conn.cursor() as cur:
+            cur.execute(_SETUP)
+            results = {name: [] for name, *_ in CASES}
+            for n in sizes:
+                nl = _populate(cur, students, n)
+                for name, legacy, current, params in CASES:
+                    lt, lr, lrows = _measure(cur, legacy, params)
+                    ct, cr, crows = _measure(cur, current, params)
+                    if lrows != crows:
+                        ok = False
+                        print("MISMATCH %s at %d views" % (name, n), file=sys.stderr)
+                    results[name].append((n, nl, lt, lr, ct, cr))
+
+        for name, series in results.items():
+            print("\n%s (%d students)" % (name, students))
+            print("%8s %8s | %12s %14s | %12s %14s" % ("el.views", "eq.views", "legacy ms", "legacy rows",
+                                                        "current ms", "current rows"))
+            for n, nl, lt, lr, ct, cr in series:
+                print("%8d %8d | %12.2f %14d | %12.2f %14d" % (n, nl, lt, lr, ct, cr))
+            # линеарно: редовите растат најмногу колку и историјата (со мала толеранција)
+            (n0, _, _, _, _, r0), (n1, _, _, _, _, r1) = series[0], series[-1]
+            if r0 and r1 / r0 > 1.5 * n1 / n0:
+                ok = False
+                print("NOT LINEAR: %s grew %.1fx for %.1fx more views" % (name, r1 / r0, n1 / n0),
+                      file=sys.stderr)
+    finally:
+        conn.rollback()
+        conn.close()
+    return ok
+
+
+def main(argv=None):
+    ap = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    ap.add_argument("--students", type=int, default=10)
+    ap.add_argument("--sizes", default="50,100,200,500", help="element views per student")
+    args = ap.parse_args(argv)
+    sizes = sorted(int(x) for x in args.sizes.split(","))
+    started = time.monotonic()
+    ok = run(args.students, sizes)
+    print("\n%s in %.1fs" % ("OK" if ok else "FAILED", time.monotonic() - started))
+    return 0 if ok else 1
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
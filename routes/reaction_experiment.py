@@ -1,18 +1,24 @@
 # SIMLAB/routes/reaction_experiment.py
 import logging
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, request, jsonify, session
 from utils.database_manager import DatabaseManager
 
 
 bp = Blueprint("reaction_experiment", __name__, url_prefix="/api")
 log = logging.getLogger(__name__)
 
+@bp.before_request
+def _require_teacher():
+    # реакции креираат само професори; teacher_id секогаш е од сесијата
+    if session.get("role") != "teacher":
+        return jsonify({"ok": False, "error": "Само професори можат да внесуваат реакции"}), 403
+
 @bp.post("/reaction-experiment")
 def create_rxn_exp():
     data = request.get_json(silent=True) or {}
 
     # задолжителни полиња
-    required = ["teacher_id", "element1_id", "element2_id"]
+    required = ["element1_id", "element2_id"]
     missing = [k for k in required if data.get(k) in (None, "", [])]
     if missing:
         return jsonify({"ok": False, "error": f"Недостасува: {', '.join(missing)}"}), 400
@@ -29,7 +35,7 @@ def create_rxn_exp():
 
     try:
         res = DatabaseManager.create_reaction_and_experiment(
-            teacher_id=int(data["teacher_id"]),
+            teacher_id=session["user_id"],
             element1_id=int(data["element1_id"]),
             element2_id=int(data["element2_id"]),
             product=data.get("product"),
@@ -46,3 +52,36 @@ def create_rxn_exp():
     except Exception:
         log.exception("create_rxn_exp failed")
         return jsonify({"ok": False, "error": "Внатрешна грешка"}), 500
+
+
+def _flag(name):
+    return request.args.get(name, "").lower() in ("1", "true", "yes")
+
+@bp.post("/reaction-experiment/bulk")
+def bulk_import_rxn_exp():
+    """CSV / JSON lines (body or multipart `file`); ?dry_run=1 проверува без внес, ?strict=1 – сè или ништо."""
+    upload = request.files.get("file")
+    if upload is not None:
+        text, mimetype = upload.read().decode("utf-8-sig", errors="replace"), upload.mimetype
+    else:
+        text, mimetype = request.get_data(as_text=True), request.mimetype
+    if not text.strip():
+        return jsonify({"ok": False, "error": "Празна содржина"}), 400
+
+    res = DatabaseManager.bulk_import_reactions(
+        text,
+        teacher_id=session["user_id"],
+        fmt=request.args.get("format") or mimetype,
+        dry_run=_flag("dry_run"),
+        strict=_flag("strict"),
+    )
+    if res is None:
+        return jsonify({"ok": False, "error": "Внатрешна грешка"}), 500
+    if "message" in res:
+        # 400 за нечитлив влез, 413 над MAX_ROWS
+        return jsonify({"ok": False, "error": res["message"]}), res["status"]
+
+    status = 201 if res["imported"] and not res["dry_run"] else 200
+    if not res["imported"] and res["errors"]:
+        status = 422
+    return jsonify({"ok": not res["errors"], **res}), status
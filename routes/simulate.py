@@ -0,0 +1,190 @@
+# SIMLAB/routes/simulate.py
+"""Reaction simulation API.
+
+One code path for the virtual lab: the reaction is looked up in memory
+(element resolver + reaction index, see DatabaseManager.resolve_reaction_pair)
+and the temperature curve comes from utils/simulation.py.
+
+    POST /api/v1/simulate-reaction         (alias: /api/simulate-reaction)
+    POST /api/v1/simulate-reaction/batch   (alias: /api/simulate-reaction/batch)
+"""
+import json
+import math
+import logging
+from flask import Blueprint, Response, request, jsonify, session, stream_with_context
+from utils.database_manager import DatabaseManager
+from utils import simulation
+
+bp = Blueprint("simulate", __name__, url_prefix="/api")
+log = logging.getLogger(__name__)
+
+MAX_BATCH_ITEMS = 500
+
+
+@bp.before_request
+def _require_login():
+    if "user_id" not in session:
+        return jsonify({"success": False, "message": "Немаш активна сесија."}), 401
+
+
+def _finite(value, name):
+    # nan/inf би дале NaN/Infinity во одговорот, што не е валиден JSON
+    value = float(value)
+    if not math.isfinite(value):
+        raise ValueError(f"{name} мора да е конечен број")
+    return value
+
+
+def _grid(data):
+    duration = _finite(data.get("duration_sec") or 60, "duration_sec")
+    step = _finite(data.get("step_sec") or 1.0, "step_sec")
+    simulation.time_grid(duration, step)      # валидација пред базата
+    return duration, step
+
+
+def _element(rx, n):
+    return {"id": rx[f"element{n}_id"], "symbol": rx[f"element{n}_symbol"], "name": rx[f"element{n}_name"]}
+
+
+# ---------- една комбинација ----------
+@bp.post("/v1/simulate-reaction")
+@bp.post("/simulate-reaction")
+def simulate_reaction():
+    """
+    Очекува JSON: element1/element2 (id, симбол или име; или element1_id/element2_id),
+    опционално amount, duration_sec, step_sec.
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        amount = _finite(data.get("amount") or 1.0, "amount")
+        duration, step = _grid(data)
+    except (TypeError, ValueError) as ex:
+        return jsonify({"success": False, "message": str(ex)}), 400
+
+    try:
+        rx = DatabaseManager.resolve_reaction_pair(
+            data.get("element1_id") or data.get("element1"),
+            data.get("element2_id") or data.get("element2"),
+        )
+        if not rx:
+            return jsonify({"success": False, "message": "Недостигаат валидни element_id вредности."}), 400
+
+        found = bool(rx["reaction_id"])
+        reactivity = simulation.reactivity(rx["element1_atomic_number"], rx["element1_hazard_type"],
+                                           rx["element2_atomic_number"], rx["element2_hazard_type"],
+                                           found, amount)
+        times, temps = simulation.temperature_curve(reactivity, duration_sec=duration, step_sec=step)
+        temps = simulation.to_list(temps)
+    except Exception as e:
+        log.exception("simulate_reaction failed")
+        return jsonify({"success": False, "message": f"Серверска грешка: {str(e)}"}), 500
+
+    body = {
+        "success": found,
+        "reaction": {
+            "found": found,
+            "reaction_id": rx["reaction_id"],
+            "product": rx["product"],
+            "conditions": rx["conditions"],
+            "e1": _element(rx, 1),
+            "e2": _element(rx, 2),
+        },
+        "reactivity": reactivity,
+        "max_temperature": max(temps),
+        "series": {"time": simulation.to_list(times), "temperature": temps},
+    }
+    if not found:
+        body["message"] = "Реакцијата не е дефинирана во системот."
+        return jsonify(body), 200
+
+    # полиња што ги читаат laboratory.html / virtual_laboratory.html
+    body.update(
+        product=rx["product"],
+        conditions=rx["conditions"],
+        reaction_id=rx["reaction_id"],
+        experiment_id=rx["experiment_id"],
+        elements=f"{rx['reaction_element1_name'] or ''} + {rx['reaction_element2_name'] or ''}",
+    )
+    return jsonify(body), 200
+
+
+# ---------- batch (parameter sweep) ----------
+def _batch_items(data):
+    """Items from either an explicit list or a sweep (pairs x amounts)."""
+    items = data.get("items")
+    if items is None:
+        pairs = data.get("pairs") or []
+        amounts = data.get("amounts") or [1.0]
+        if not isinstance(pairs, list) or not isinstance(amounts, list):
+            raise ValueError("pairs и amounts мора да се листи")
+        # проверка ПРЕД да се изгради производот (pairs × amounts)
+        if len(pairs) * len(amounts) > MAX_BATCH_ITEMS:
+            raise ValueError(f"најмногу {MAX_BATCH_ITEMS} комбинации по барање")
+        items = [{"element1_id": p[0], "element2_id": p[1], "amount": a} for p in pairs for a in amounts]
+    if not isinstance(items, list) or not items:
+        raise ValueError("items (или pairs/amounts) е задолжително")
+    if len(items) > MAX_BATCH_ITEMS:
+        raise ValueError(f"најмногу {MAX_BATCH_ITEMS} комбинации по барање")
+    return [(int(it["element1_id"]), int(it["element2_id"]), _finite(it.get("amount") or 1.0, "amount"))
+            for it in items]
+
+
+@bp.post("/v1/simulate-reaction/batch")
+@bp.post("/simulate-reaction/batch")
+def simulate_reaction_batch():
+    """
+    Очекува JSON: items=[{element1_id, element2_id, amount}] или pairs=[[e1, e2], ...] + amounts=[...],
+    опционално duration_sec, step_sec, stream (NDJSON по еден ред за секоја комбинација).
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        items = _batch_items(data)
+        duration, step = _grid(data)
+    except (KeyError, TypeError, ValueError) as ex:
+        return jsonify({"ok": False, "error": str(ex)}), 400
+
+    details = DatabaseManager.get_pair_details((a, b) for a, b, _ in items)
+    if details is None:
+        return jsonify({"ok": False, "error": "Грешка при читање од базата"}), 500
+
+    results, reactivities = [], []
+    for idx, (a, b, amount) in enumerate(items):
+        d = details.get((a, b)) or {}
+        found = bool(d.get("reaction_id"))
+        reactivities.append(simulation.reactivity(d.get("e1_atomic_number"), d.get("e1_hazard_type"),
+                                                  d.get("e2_atomic_number"), d.get("e2_hazard_type"),
+                                                  found, amount))
+        results.append({
+            "index": idx,
+            "amount": amount,
+            "reaction": {
+                "found": found,
+                "reaction_id": d.get("reaction_id"),
+                "product": d.get("product"),
+                "conditions": d.get("conditions"),
+                "e1": {"id": a, "symbol": d.get("e1_symbol"), "name": d.get("e1_name")},
+                "e2": {"id": b, "symbol": d.get("e2_symbol"), "name": d.get("e2_name")},
+            },
+        })
+
+    times, curves = simulation.temperature_curves(reactivities, duration_sec=duration, step_sec=step)
+    time_axis = simulation.to_list(times)
+
+    def _with_series(i):
+        temps = simulation.to_list(curves[i])
+        return dict(results[i], reactivity=reactivities[i], max_temperature=max(temps),
+                    series={"temperature": temps})
+
+    if data.get("stream") or request.args.get("stream"):
+        def generate():
+            yield json.dumps({"ok": True, "count": len(results), "time": time_axis}) + "\n"
+            for i in range(len(results)):
+                yield json.dumps(_with_series(i), ensure_ascii=False) + "\n"
+        return Response(stream_with_context(generate()), mimetype="application/x-ndjson")
+
+    return jsonify({
+        "ok": True,
+        "count": len(results),
+        "time": time_axis,
+        "results": [_with_series(i) for i in range(len(results))],
+    })
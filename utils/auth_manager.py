@@ -1,22 +1,206 @@
+# auth_manager.py
+"""Password hashing.
+
+Stored hashes describe themselves, so the cost can change without breaking
+existing accounts:
+
+    pbkdf2_sha256$<iterations>$<salt>$<hex digest>
+    scrypt$<n>$<r>$<p>$<salt>$<hex digest>
+
+Hashes from before this format (32 hex salt + 64 hex digest, PBKDF2 with
+100,000 iterations) still verify, and are still written (`legacy=True`)
+while the database column is too short for the new layout (migration 6). When a stored hash does not match the
+configured algorithm/cost, `needs_rehash` is true and the login route
+replaces it with a fresh hash of the (just verified) password.
+
+    python -m utils.auth_manager calibrate [--target-ms 100]
+"""
+import os
+import sys
+import hmac
+import logging
+import time
 import hashlib
 import secrets
+from utils.hash_executor import hash_executor, HashQueueFull  # noqa: F401 (HashQueueFull за рутите)
+
+log = logging.getLogger("simlab.auth")
+
+PBKDF2 = 'pbkdf2_sha256'
+SCRYPT = 'scrypt'
+LEGACY_ITERATIONS = 100000
+
+
+def _settings():
+    return {
+        'algorithm': os.getenv('PASSWORD_HASH_ALGORITHM', PBKDF2),
+        'iterations': int(os.getenv('PASSWORD_PBKDF2_ITERATIONS', str(LEGACY_ITERATIONS))),
+        'n': int(os.getenv('PASSWORD_SCRYPT_N', str(2 ** 14))),
+        'r': int(os.getenv('PASSWORD_SCRYPT_R', '8')),
+        'p': int(os.getenv('PASSWORD_SCRYPT_P', '1')),
+    }
+
+
+def check_settings():
+    """Raise ValueError when the PASSWORD_* configuration cannot produce a hash."""
+    cfg = _settings()
+    if cfg['algorithm'] == PBKDF2:
+        if cfg['iterations'] < 1:
+            raise ValueError("PASSWORD_PBKDF2_ITERATIONS must be >= 1")
+    elif cfg['algorithm'] == SCRYPT:
+        n, r, p = cfg['n'], cfg['r'], cfg['p']
+        if n < 2 or n & (n - 1) or r < 1 or p < 1:
+            raise ValueError("PASSWORD_SCRYPT_N must be a power of 2 > 1, _R and _P >= 1")
+    else:
+        raise ValueError("unsupported PASSWORD_HASH_ALGORITHM: %s" % cfg['algorithm'])
+
+
+# module-level за да може да се испратат во процесот-работник
+def _pbkdf2_hex(password, salt, iterations=LEGACY_ITERATIONS):
+    return hashlib.pbkdf2_hmac('sha256',
+                               password.encode('utf-8'),
+                               salt.encode('utf-8'),
+                               iterations).hex()
+
+
+def _scrypt_hex(password, salt, n, r, p):
+    return hashlib.scrypt(password.encode('utf-8'), salt=salt.encode('utf-8'), n=n, r=r, p=p,
+                          maxmem=256 * n * r * p + (1 << 20), dklen=32).hex()
+
+
+def _parse(stored_hash):
+    """(algorithm, params, salt, digest); raises ValueError for an unknown layout."""
+    if '$' not in stored_hash:
+        if len(stored_hash) != 96:
+            raise ValueError("unknown password hash format")
+        return PBKDF2, (LEGACY_ITERATIONS,), stored_hash[:32], stored_hash[32:]
+    parts = stored_hash.split('$')
+    if parts[0] == PBKDF2 and len(parts) == 4:
+        return PBKDF2, (int(parts[1]),), parts[2], parts[3]
+    if parts[0] == SCRYPT and len(parts) == 6:
+        return SCRYPT, (int(parts[1]), int(parts[2]), int(parts[3])), parts[4], parts[5]
+    raise ValueError("unknown password hash format")
+
+
+def _derive(algorithm, password, salt, params):
+    fn = _pbkdf2_hex if algorithm == PBKDF2 else _scrypt_hex
+    return hash_executor.run(fn, password, salt, *params)
+
 
 class AuthManager:
     @staticmethod
-    def hash_password(password):
+    def hash_password(password, legacy=False):
         salt = secrets.token_hex(16)
-        password_hash = hashlib.pbkdf2_hmac('sha256', 
-                                           password.encode('utf-8'), 
-                                           salt.encode('utf-8'), 
-                                           100000)
-        return salt + password_hash.hex()
-    
+        if legacy:
+            return salt + _derive(PBKDF2, password, salt, (LEGACY_ITERATIONS,))
+        cfg = _settings()
+        if cfg['algorithm'] == SCRYPT:
+            params = (cfg['n'], cfg['r'], cfg['p'])
+        elif cfg['algorithm'] == PBKDF2:
+            params = (cfg['iterations'],)
+        else:
+            raise ValueError("unsupported PASSWORD_HASH_ALGORITHM: %s" % cfg['algorithm'])
+        digest = _derive(cfg['algorithm'], password, salt, params)
+        return '$'.join([cfg['algorithm'], *map(str, params), salt, digest])
+
     @staticmethod
     def verify_password(password, stored_hash):
-        salt = stored_hash[:32]
-        stored_password_hash = stored_hash[32:]
-        password_hash = hashlib.pbkdf2_hmac('sha256',
-                                           password.encode('utf-8'),
-                                           salt.encode('utf-8'),
-                                           100000)
-        return password_hash.hex() == stored_password_hash
\ No newline at end of file
+        """False for a wrong password and for a malformed stored hash (e.g. invalid scrypt n)."""
+        try:
+            algorithm, params, salt, stored_password_hash = _parse(stored_hash or '')
+            password_hash = _derive(algorithm, password, salt, params)
+            return hmac.compare_digest(password_hash, stored_password_hash)
+        except (ValueError, OverflowError, TypeError):
+            # HashQueueFull (RuntimeError) не се фаќа тука – најавата враќа 503
+            log.warning("malformed password hash, treating as mismatch")
+            return False
+
+    @staticmethod
+    def needs_rehash(stored_hash, legacy=False):
+        """True when the hash is legacy or uses other parameters than the current configuration.
+
+        Always False with `legacy` (the new layout cannot be stored yet).
+        """
+        if legacy:
+            return False
+        if '$' not in (stored_hash or ''):
+            return True
+        try:
+            algorithm, params, _, _ = _parse(stored_hash)
+        except ValueError:
+            return False
+        cfg = _settings()
+        if algorithm != cfg['algorithm']:
+            return True
+        if algorithm == PBKDF2:
+            return params != (cfg['iterations'],)
+        return params != (cfg['n'], cfg['r'], cfg['p'])
+
+    @staticmethod
+    def dummy_verify(password):
+        """Same cost as verify_password for an unknown email, so response time does not reveal it."""
+        AuthManager.hash_password(password)
+        return False
+
+    @staticmethod
+    def hashing_stats():
+        return hash_executor.stats()
+
+
+# погрешна конфигурација се гледа при старт, не при прва најава
+try:
+    check_settings()
+except ValueError as _ex:
+    log.error("invalid password hashing configuration: %s", _ex)
+
+
+# ---------- калибрација ----------
+def _time_ms(fn, *args, repeat=3):
+    best = None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn(*args)
+        elapsed = (time.perf_counter() - started) * 1000.0
+        best = elapsed if best is None else min(best, elapsed)
+    return best
+
+
+def calibrate(target_ms=100.0):
+    """Parameters whose single verification takes about `target_ms` on this machine."""
+    salt = secrets.token_hex(16)
+    probe = 50000
+    per_iter = _time_ms(_pbkdf2_hex, 'calibration', salt, probe) / probe
+    iterations = max(10000, int(round(target_ms / per_iter, -3)))
+    pbkdf2 = {'iterations': iterations, 'ms': round(_time_ms(_pbkdf2_hex, 'calibration', salt, iterations), 1)}
+
+    # scrypt: најголем N (степен на 2) под целта; r=8, p=1
+    n, scrypt = 2 ** 12, None
+    while n <= 2 ** 20:
+        ms = _time_ms(_scrypt_hex, 'calibration', salt, n, 8, 1)
+        if scrypt is not None and ms > target_ms:
+            break
+        scrypt = {'n': n, 'r': 8, 'p': 1, 'ms': round(ms, 1), 'memory_mb': round(128 * n * 8 / 2 ** 20, 1)}
+        n *= 2
+    return {'target_ms': target_ms, PBKDF2: pbkdf2, SCRYPT: scrypt}
+
+
+def main(argv=None):
+    import argparse
+    ap = argparse.ArgumentParser(description="Calibrate password hashing cost to a target verify latency.")
+    ap.add_argument("command", choices=["calibrate"])
+    ap.add_argument("--target-ms", type=float, default=100.0)
+    args = ap.parse_args(argv)
+    res = calibrate(args.target_ms)
+    pb, sc = res[PBKDF2], res[SCRYPT]
+    print("target: %.0f ms per verification (single core)" % res['target_ms'])
+    print("\n# PBKDF2-SHA256 (%.1f ms)" % pb['ms'])
+    print("PASSWORD_HASH_ALGORITHM=%s" % PBKDF2)
+    print("PASSWORD_PBKDF2_ITERATIONS=%d" % pb['iterations'])
+    print("\n# scrypt (%.1f ms, %.1f MB per verification)" % (sc['ms'], sc['memory_mb']))
+    print("PASSWORD_HASH_ALGORITHM=%s" % SCRYPT)
+    print("PASSWORD_SCRYPT_N=%d\nPASSWORD_SCRYPT_R=%d\nPASSWORD_SCRYPT_P=%d" % (sc['n'], sc['r'], sc['p']))
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,290 @@
+# bulk_import.py
+"""Bulk import of reactions together with their experiments and equipment.
+
+Input is CSV (header row) or JSON lines, one reaction per row with the same
+fields as POST /api/reaction-experiment:
+
+    element1_id, element2_id, product, conditions, experiment_result,
+    safety_warning, equipment_ids
+
+`element1`/`element2` may be used instead and hold an id, symbol or name;
+in CSV, equipment_ids is written as "1;2;3". Rows are validated in memory
+against the cached element and equipment lists, COPYed into temporary
+staging tables and inserted with a few set-based statements in a single
+transaction. Invalid rows are reported with their line number.
+
+    python -m utils.bulk_import reactions.csv --teacher-id 1 [--dry-run] [--strict]
+"""
+import io, re, csv, sys, json, logging
+
+log = logging.getLogger("simlab.bulk_import")
+
+MAX_ROWS = 5000
+FORMATS = ('csv', 'jsonl')
+
+_REACTION_COLUMNS = ('row_no', 'element1_id', 'element2_id', 'product', 'conditions',
+                     'result', 'safety_warning')
+
+_STAGING_DDL = """
+    CREATE TEMP TABLE import_reaction (
+        row_no         INT PRIMARY KEY,
+        element1_id    INT NOT NULL,
+        element2_id    INT NOT NULL,
+        product        TEXT,
+        conditions     TEXT,
+        result         TEXT,
+        safety_warning TEXT,
+        reaction_id    INT,
+        experiment_id  INT
+    ) ON COMMIT DROP;
+    CREATE TEMP TABLE import_equipment (
+        row_no       INT NOT NULL,
+        equipment_id INT NOT NULL
+    ) ON COMMIT DROP;
+"""
+
+# ист клуч како UNIQUE (element1_id, element2_id, conditions) на reaction
+_CONFLICTS_SQL = """
+    SELECT s.row_no, r.reaction_id
+    FROM import_reaction s
+    JOIN reaction r
+      ON r.element1_id = s.element1_id
+     AND r.element2_id = s.element2_id
+     AND r.conditions  = s.conditions
+"""
+
+# id-јата се земаат однапред од секвенците, па експериментите и опремата се врзуваат по row_no
+_ALLOCATE_IDS_SQL = """
+    UPDATE import_reaction
+       SET reaction_id   = nextval(pg_get_serial_sequence('reaction', 'reaction_id')),
+           experiment_id = nextval(pg_get_serial_sequence('experiment', 'experiment_id'))
+"""
+
+_INSERT_REACTIONS_SQL = """
+    INSERT INTO reaction (reaction_id, teacher_id, element1_id, element2_id, product, conditions)
+    SELECT reaction_id, %(t)s, element1_id, element2_id, product, conditions
+    FROM import_reaction
+    ORDER BY row_no
+"""
+
+_INSERT_EXPERIMENTS_SQL = """
+    INSERT INTO experiment (experiment_id, teacher_id, reaction_id, result, safety_warning, time_stamp)
+    SELECT s.experiment_id, %(t)s, s.reaction_id,
+           COALESCE(s.result,
+                    'Експеримент со ' || e1.symbol || ' и ' || e2.symbol
+                    || ' под услови: ' || COALESCE(s.conditions, 'стандардни')
+                    || '. Очекуван производ: ' || COALESCE(s.product, 'непознат') || '.'),
+           s.safety_warning, CURRENT_TIMESTAMP
+    FROM import_reaction s
+    JOIN elements e1 ON e1.element_id = s.element1_id
+    JOIN elements e2 ON e2.element_id = s.element2_id
+    ORDER BY s.row_no
+"""
+
+_INSERT_EQUIPMENT_SQL = """
+    INSERT INTO experimentlabequipment (experiment_id, equipment_id)
+    SELECT DISTINCT s.experiment_id, q.equipment_id
+    FROM import_equipment q
+    JOIN import_reaction s ON s.row_no = q.row_no
+    ON CONFLICT DO NOTHING
+"""
+
+
+class BulkImportError(ValueError):
+    """The input as a whole cannot be imported (unreadable format, missing columns)."""
+    status = 400
+
+
+class TooManyRows(BulkImportError):
+    """More than MAX_ROWS rows in one import."""
+    status = 413
+
+
+def _blank_to_none(value):
+    if value is None:
+        return None
+    value = str(value).strip()
+    return value or None
+
+
+def detect_format(text, hint=None):
+    """'csv' or 'jsonl' from an explicit hint / mimetype, else from the first character."""
+    hint = (hint or '').lower()
+    if hint in FORMATS:
+        return hint
+    if 'json' in hint:
+        return 'jsonl'
+    if 'csv' in hint:
+        return 'csv'
+    return 'jsonl' if text.lstrip()[:1] in ('{', '[') else 'csv'
+
+
+def parse(text, fmt=None):
+    """([(line_no, record dict)], [errors]) from CSV, JSON lines or a JSON array."""
+    fmt = detect_format(text, fmt)
+    records, errors = [], []
+    if fmt == 'jsonl' and text.lstrip().startswith('['):
+        # цел JSON низ (пр. готов dataset) – „редот“ е позицијата во низата
+        try:
+            items = json.loads(text)
+        except ValueError as ex:
+            raise BulkImportError("невалиден JSON: %s" % ex)
+        for pos, rec in enumerate(items, 1):
+            if isinstance(rec, dict):
+                records.append((pos, rec))
+            else:
+                errors.append({'row': pos, 'error': "елементот мора да е JSON објект"})
+    elif fmt == 'jsonl':
+        for line_no, line in enumerate(text.splitlines(), 1):
+            if not line.strip():
+                continue
+            try:
+                rec = json.loads(line)
+            except ValueError as ex:
+                errors.append({'row': line_no, 'error': "невалиден JSON: %s" % ex})
+                continue
+            if not isinstance(rec, dict):
+                errors.append({'row': line_no, 'error': "редот мора да е JSON објект"})
+                continue
+            records.append((line_no, rec))
+    else:
+        reader = csv.DictReader(io.StringIO(text))
+        for rec in reader:
+            if not any((v or '').strip() for v in rec.values() if isinstance(v, str)):
+                continue
+            records.append((reader.line_num, rec))
+    if len(records) > MAX_ROWS:
+        raise TooManyRows("најмногу %d реда по увоз (добиени %d)" % (MAX_ROWS, len(records)))
+    return records, errors
+
+
+def _equipment_list(value):
+    if value is None or value == '':
+        return []
+    if isinstance(value, (list, tuple)):
+        items = value
+    else:
+        items = [x for x in re.split(r'[;,\s]+', str(value)) if x]
+    return [int(x) for x in items]
+
+
+def validate(records, resolve_element, equipment_ids):
+    """Staging rows for the valid records and per-row errors for the rest.
+
+    `resolve_element(value)` maps an id/symbol/name to element_id (None if
+    unknown); `equipment_ids` is the set of existing equipment ids.
+    """
+    rows, errors, seen = [], [], {}
+    for line_no, rec in records:
+        problems = []
+        ids = []
+        for key in ('element1', 'element2'):
+            raw = rec.get(key + '_id') or rec.get(key)
+            if _blank_to_none(raw) is None:
+                problems.append("недостасува %s" % key)
+                continue
+            eid = resolve_element(raw)
+            if eid is None:
+                problems.append("непознат елемент: %s" % raw)
+            ids.append(eid)
+        if len(ids) == 2 and ids[0] is not None and ids[0] == ids[1]:
+            problems.append("ист елемент од двете страни")
+        try:
+            equipment = _equipment_list(rec.get('equipment_ids'))
+        except (TypeError, ValueError):
+            equipment = []
+            problems.append("equipment_ids содржи невалидни вредности")
+        unknown = sorted(set(equipment) - equipment_ids)
+        if unknown:
+            problems.append("непозната опрема: %s" % ", ".join(map(str, unknown)))
+
+        conditions = _blank_to_none(rec.get('conditions'))
+        if not problems and conditions is not None:
+            key = (ids[0], ids[1], conditions)
+            if key in seen:
+                problems.append("дупликат на ред %d" % seen[key])
+            else:
+                seen[key] = line_no
+        if problems:
+            errors.append({'row': line_no, 'error': "; ".join(problems)})
+            continue
+        rows.append({
+            'row_no': line_no, 'element1_id': ids[0], 'element2_id': ids[1],
+            'product': _blank_to_none(rec.get('product')), 'conditions': conditions,
+            'result': _blank_to_none(rec.get('experiment_result')),
+            'safety_warning': _blank_to_none(rec.get('safety_warning')),
+            'equipment_ids': equipment,
+        })
+    return rows, errors
+
+
+def _copy(cur, table, columns, tuples):
+    buf = io.StringIO()
+    csv.writer(buf).writerows(tuples)      # None → празно поле → NULL (празни стрингови веќе се None)
+    buf.seek(0)
+    cur.copy_expert("COPY %s (%s) FROM STDIN WITH (FORMAT csv)" % (table, ", ".join(columns)), buf)
+
+
+def stage(cur, rows):
+    """COPY `rows` into the staging tables; returns errors for rows that clash with existing reactions.
+
+    Clashing rows are removed from staging.
+    """
+    cur.execute(_STAGING_DDL)
+    _copy(cur, "import_reaction", _REACTION_COLUMNS, [[r[c] for c in _REACTION_COLUMNS] for r in rows])
+    _copy(cur, "import_equipment", ("row_no", "equipment_id"),
+          [(r['row_no'], eq) for r in rows for eq in r['equipment_ids']])
+    cur.execute(_CONFLICTS_SQL)
+    conflicts = cur.fetchall()
+    if conflicts:
+        cur.execute("DELETE FROM import_reaction WHERE row_no = ANY(%s)", ([c['row_no'] for c in conflicts],))
+    return [{'row': c['row_no'], 'error': "реакцијата веќе постои (reaction_id=%s)" % c['reaction_id']}
+            for c in conflicts]
+
+
+def load(cur, teacher_id):
+    """Insert everything left in staging; [{'row', 'reaction_id', 'experiment_id'}]."""
+    cur.execute(_ALLOCATE_IDS_SQL)
+    params = {'t': teacher_id}
+    cur.execute(_INSERT_REACTIONS_SQL, params)
+    cur.execute(_INSERT_EXPERIMENTS_SQL, params)
+    cur.execute(_INSERT_EQUIPMENT_SQL)
+    cur.execute("SELECT row_no AS row, reaction_id, experiment_id FROM import_reaction ORDER BY row_no")
+    return [dict(r) for r in cur.fetchall()]
+
+
+# ---------- CLI ----------
+def main(argv=None):
+    import argparse
+    from utils.database_manager import DatabaseManager
+
+    ap = argparse.ArgumentParser(description="Bulk import reactions with experiments and equipment.")
+    ap.add_argument("path", help="CSV or JSON-lines file ('-' for stdin)")
+    ap.add_argument("--teacher-id", type=int, required=True)
+    ap.add_argument("--format", choices=FORMATS)
+    ap.add_argument("--dry-run", action="store_true", help="validate and check for duplicates, insert nothing")
+    ap.add_argument("--strict", action="store_true", help="insert nothing if any row is invalid")
+    args = ap.parse_args(argv)
+
+    if args.path == '-':
+        text = sys.stdin.read()
+    else:
+        with open(args.path, encoding='utf-8-sig') as f:
+            text = f.read()
+    res = DatabaseManager.bulk_import_reactions(text, args.teacher_id, fmt=args.format,
+                                                dry_run=args.dry_run, strict=args.strict)
+    if res is None:
+        print("import failed (see log)", file=sys.stderr)
+        return 2
+    if 'message' in res:
+        print(res['message'], file=sys.stderr)
+        return 2
+    for err in res['errors']:
+        print("row %d: %s" % (err['row'], err['error']), file=sys.stderr)
+    verb = "would import" if res['dry_run'] else "imported"
+    print("%s %d of %d rows (%d errors)" % (verb, res['imported'], res['total'], len(res['errors'])))
+    return 1 if res['errors'] else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,161 @@
+# cache.py
+import os, time, logging, datetime, threading
+from collections import OrderedDict
+
+log = logging.getLogger("simlab.cache")
+
+
+class VersionedCache:
+    """Small in-process cache with TTL and explicit, version-checked invalidation.
+
+    Every invalidate() bumps the version; a loader that started before the bump
+    does not store its (possibly stale) result.
+    """
+
+    def __init__(self, name, ttl=300.0):
+        self.name = name
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._entries = {}       # key -> (loaded_at, value)
+        self._version = 0
+        self._stats = {'hits': 0, 'misses': 0, 'loads': 0, 'invalidations': 0}
+
+    @property
+    def version(self):
+        return self._version
+
+    def get_or_load(self, key, loader, ttl=None):
+        ttl = self.ttl if ttl is None else ttl
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and (not ttl or now - entry[0] < ttl):
+                self._stats['hits'] += 1
+                return entry[1]
+            self._stats['misses'] += 1
+            version = self._version
+
+        value = loader()
+        if value is None:        # грешка при вчитување – не кешираме
+            return None
+        with self._lock:
+            self._stats['loads'] += 1
+            if version == self._version:
+                self._entries[key] = (time.monotonic(), value)
+        return value
+
+    def peek(self, key):
+        """Cached value (ignoring TTL) or None, without counting a hit or miss."""
+        with self._lock:
+            entry = self._entries.get(key)
+            return entry[1] if entry else None
+
+    def invalidate(self, *keys):
+        """Drop the given keys (or everything when called without arguments)."""
+        with self._lock:
+            if keys:
+                for k in keys:
+                    self._entries.pop(k, None)
+            else:
+                self._entries.clear()
+            self._version += 1
+            self._stats['invalidations'] += 1
+        log.debug("cache %s invalidated (%s)", self.name, keys or 'all')
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            s.update(name=self.name, ttl=self.ttl, version=self._version, keys=sorted(map(str, self._entries)))
+        lookups = s['hits'] + s['misses']
+        s['hit_ratio'] = round(s['hits'] / lookups, 3) if lookups else 0.0
+        return s
+
+
+# Периодниот систем и опремата ретко се менуваат
+reference_cache = VersionedCache("reference", ttl=float(os.getenv('REFDATA_CACHE_TTL', '300')))
+
+
+class ReportCache:
+    """Cache for report result sets keyed by (report name, parameters).
+
+    Each entry records the versions of the tables it was computed from; a write
+    to any of them (invalidate_tables) makes the entry stale on its next read.
+    Parameters come from the query string, so the number of entries is capped
+    (least recently used are evicted) and expired entries are dropped on access.
+    """
+
+    def __init__(self, default_ttl=120.0, max_entries=256):
+        self.default_ttl = default_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()  # (name, params) -> (loaded_at, refreshed_at, versions, rows, ttl); LRU редослед
+        self._table_versions = {}      # table -> int
+        self._stats = {'hits': 0, 'misses': 0, 'stale': 0, 'table_invalidations': 0,
+                       'expired': 0, 'evictions': 0}
+
+    def _versions(self, tables):
+        return tuple(self._table_versions.get(t, 0) for t in tables)
+
+    def _drop_expired(self, now):
+        expired = [k for k, e in self._entries.items() if e[4] and now - e[0] >= e[4]]
+        for k in expired:
+            del self._entries[k]
+        self._stats['expired'] += len(expired)
+
+    def get(self, name, params, loader, ttl=None, depends_on=(), force=False):
+        """(rows, refreshed_at) – served from cache unless expired, stale or `force`."""
+        ttl = self.default_ttl if ttl is None else ttl
+        key = (name, tuple(params))
+        depends_on = tuple(depends_on)
+        with self._lock:
+            entry = self._entries.get(key)
+            versions = self._versions(depends_on)
+            if entry is not None and not force:
+                fresh = not ttl or time.monotonic() - entry[0] < ttl
+                if fresh and entry[2] == versions:
+                    self._entries.move_to_end(key)
+                    self._stats['hits'] += 1
+                    return entry[3], entry[1]
+                del self._entries[key]
+                self._stats['stale'] += 1
+            self._stats['misses'] += 1
+
+        rows = loader()
+        refreshed_at = datetime.datetime.now()
+        if rows is None:
+            return None, refreshed_at
+        with self._lock:
+            # верзиите од ПРЕД вчитувањето: упис за време на loader() ќе го направи записот стар
+            now = time.monotonic()
+            self._entries[key] = (now, refreshed_at, versions, rows, ttl)
+            self._entries.move_to_end(key)
+            self._drop_expired(now)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._stats['evictions'] += 1
+        return rows, refreshed_at
+
+    def invalidate_tables(self, *tables):
+        with self._lock:
+            for t in tables:
+                self._table_versions[t] = self._table_versions.get(t, 0) + 1
+            self._stats['table_invalidations'] += 1
+
+    def invalidate(self, name=None):
+        with self._lock:
+            if name is None:
+                self._entries.clear()
+            else:
+                for key in [k for k in self._entries if k[0] == name]:
+                    del self._entries[key]
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            s.update(entries=len(self._entries), max_entries=self.max_entries, default_ttl=self.default_ttl,
+                     table_versions=dict(self._table_versions))
+        return s
+
+
+report_cache = ReportCache(default_ttl=float(os.getenv('REPORT_CACHE_TTL', '120')),
+                           max_entries=int(os.getenv('REPORT_CACHE_MAX_ENTRIES', '256')))
@@ -0,0 +1,217 @@
+# catalog_import.py
+"""Bulk load of the element and lab-equipment catalogs.
+
+The same dataset (CSV, JSON lines or a JSON array) can be loaded into every
+course database: rows are matched on their natural key (symbol /
+equipment_name), new ones are inserted and changed ones updated with one
+execute_values upsert; identical rows are not touched. `--dry-run` prints
+the diff against the database without writing.
+
+    python -m utils.catalog_import elements periodic_table.csv --teacher-id 1 [--dry-run]
+    python -m utils.catalog_import equipment equipment.json --teacher-id 1
+"""
+import sys
+from decimal import Decimal
+from utils.bulk_import import parse, BulkImportError, _blank_to_none
+
+
+def _number(cast):
+    def convert(value):
+        value = _blank_to_none(value)
+        return None if value is None else cast(value.replace(',', '.') if isinstance(value, str) else value)
+    return convert
+
+
+class Catalog:
+    """A reference table loaded by natural key: its columns, aliases accepted in the input, and checks."""
+
+    def __init__(self, name, table, key, columns, aliases=None, required=(), check=None, cache_key=None):
+        self.name = name
+        self.table = table
+        self.key = key
+        self.columns = columns            # column -> converter
+        self.aliases = aliases or {}      # column -> alternative input field
+        self.required = tuple(required)
+        self.check = check
+        self.cache_key = cache_key
+
+    def _present(self, records):
+        # колоните што ги има во dataset-от; останатите не се менуваат во базата
+        fields = set()
+        for _, rec in records:
+            fields.update(rec)
+        return [c for c in self.columns
+                if c == self.key or c in fields or self.aliases.get(c) in fields]
+
+    def normalize(self, records):
+        """(rows keyed by natural key, per-row errors); rows hold only the columns present in the input."""
+        columns = self._present(records)
+        missing = [c for c in self.required if c not in columns]
+        if missing:
+            raise BulkImportError("недостасуваат колони: %s" % ", ".join(missing))
+        rows, errors, seen = {}, [], {}
+        for line_no, rec in records:
+            row, problems = {}, []
+            for col in columns:
+                raw = rec.get(col)
+                if raw in (None, '') and col in self.aliases:
+                    raw = rec.get(self.aliases[col])
+                try:
+                    row[col] = self.columns[col](raw)
+                except (TypeError, ValueError, ArithmeticError):
+                    problems.append("невалидна вредност за %s: %s" % (col, raw))
+            problems += ["недостасува %s" % col for col in self.required
+                         if col in row and row[col] is None]
+            if not problems and self.check is not None:
+                problems += self.check(row)
+            key = row.get(self.key)
+            if not problems and key in seen:
+                problems.append("дупликат на ред %d (%s)" % (seen[key], key))
+            if problems:
+                errors.append({'row': line_no, 'error': "; ".join(problems)})
+                continue
+            seen[key] = line_no
+            rows[key] = row
+        return rows, errors
+
+    def upsert_sql(self, columns):
+        updates = [c for c in columns if c != self.key]
+        on_conflict = "DO NOTHING"
+        if updates:
+            on_conflict = "DO UPDATE SET {set} WHERE ({old}) IS DISTINCT FROM ({new})".format(
+                set=", ".join("%s = EXCLUDED.%s" % (c, c) for c in updates),
+                old=", ".join("%s.%s" % (self.table, c) for c in updates),
+                new=", ".join("EXCLUDED.%s" % c for c in updates))
+        return """
+            INSERT INTO {t} ({cols}, teacher_id) VALUES %s
+            ON CONFLICT ({key}) {on_conflict}
+            RETURNING {key}, (xmax = 0) AS inserted
+        """.format(t=self.table, cols=", ".join(columns), key=self.key, on_conflict=on_conflict)
+
+
+def _element_check(row):
+    # истите CHECK ограничувања како во базата, за грешка по ред наместо неуспешен увоз
+    problems = []
+    for col in ('atomic_number', 'atomic_weight'):
+        if row.get(col) is not None and row[col] <= 0:
+            problems.append("%s мора да е > 0" % col)
+    mp, bp = row.get('melting_point'), row.get('boiling_point')
+    if mp is not None and bp is not None and mp >= bp:
+        problems.append("melting_point мора да е помала од boiling_point")
+    return problems
+
+
+ELEMENTS = Catalog(
+    'elements', 'elements', 'symbol',
+    columns={
+        'symbol': lambda v: (_blank_to_none(v) or '').upper() or None,    # како _norm_symbol
+        'element_name': _blank_to_none,
+        'atomic_number': _number(int),
+        'atomic_weight': _number(Decimal),
+        'melting_point': _number(Decimal),
+        'boiling_point': _number(Decimal),
+        'hazard_type': _blank_to_none,
+        'description_element': _blank_to_none,
+    },
+    aliases={'element_name': 'name', 'description_element': 'description'},
+    required=('symbol', 'element_name', 'atomic_number'),
+    check=_element_check,
+    cache_key='elements',
+)
+
+EQUIPMENT = Catalog(
+    'equipment', 'labequipment', 'equipment_name',
+    columns={
+        'equipment_name': _blank_to_none,
+        'type': _blank_to_none,
+        'description': _blank_to_none,
+        'safety_info': _blank_to_none,
+    },
+    aliases={'equipment_name': 'name', 'type': 'equipment_type'},
+    required=('equipment_name',),
+    cache_key='equipment',
+)
+
+CATALOGS = {c.name: c for c in (ELEMENTS, EQUIPMENT)}
+
+
+def _same(old, new):
+    if isinstance(old, (int, float, Decimal)) and isinstance(new, (int, float, Decimal)):
+        return Decimal(str(old)) == Decimal(str(new))
+    return old == new
+
+
+def diff(catalog, existing, rows):
+    """What loading `rows` would change, compared to the `existing` database rows."""
+    current = {r[catalog.key]: r for r in existing}
+    inserts, updates, unchanged = [], [], 0
+    for key, row in rows.items():
+        old = current.get(key)
+        if old is None:
+            inserts.append(row)
+            continue
+        changes = {c: [old.get(c), v] for c, v in row.items() if not _same(old.get(c), v)}
+        if changes:
+            updates.append({catalog.key: key, 'changes': changes})
+        else:
+            unchanged += 1
+    return {'insert': inserts, 'update': updates, 'unchanged': unchanged}
+
+
+def parse_catalog(catalog, text, fmt=None):
+    """(rows, errors) for `text`; raises BulkImportError when the input cannot be read at all."""
+    records, errors = parse(text, fmt)
+    rows, invalid = catalog.normalize(records)
+    return rows, sorted(errors + invalid, key=lambda e: e['row'])
+
+
+# ---------- CLI ----------
+def _print_diff(catalog, d):
+    for row in d['insert']:
+        print("+ %s" % row[catalog.key])
+    for upd in d['update']:
+        print("~ %s" % upd[catalog.key])
+        for col, (old, new) in upd['changes'].items():
+            print("    %s: %s -> %s" % (col, old, new))
+
+
+def main(argv=None):
+    import argparse
+    from utils.database_manager import DatabaseManager
+
+    ap = argparse.ArgumentParser(description="Upsert the element / lab-equipment catalog from a dataset.")
+    ap.add_argument("catalog", choices=sorted(CATALOGS))
+    ap.add_argument("path", help="CSV, JSON lines or JSON array ('-' for stdin)")
+    ap.add_argument("--teacher-id", type=int, required=True, help="owner of newly inserted rows")
+    ap.add_argument("--format", choices=("csv", "jsonl"))
+    ap.add_argument("--dry-run", action="store_true", help="print the diff, write nothing")
+    args = ap.parse_args(argv)
+
+    if args.path == '-':
+        text = sys.stdin.read()
+    else:
+        with open(args.path, encoding='utf-8-sig') as f:
+            text = f.read()
+    catalog = CATALOGS[args.catalog]
+    try:
+        rows, errors = parse_catalog(catalog, text, args.format)
+    except BulkImportError as ex:
+        print(ex, file=sys.stderr)
+        return 2
+    for err in errors:
+        print("row %d: %s" % (err['row'], err['error']), file=sys.stderr)
+
+    res = DatabaseManager.upsert_catalog(catalog.name, rows, args.teacher_id, dry_run=args.dry_run)
+    if res is None:
+        print("import failed (see log)", file=sys.stderr)
+        return 2
+    _print_diff(catalog, res['diff'])
+    d = res['diff']
+    print("%s: %d new, %d changed, %d unchanged%s" % (
+        catalog.name, len(d['insert']), len(d['update']), d['unchanged'],
+        " (dry run)" if args.dry_run else "; written: %d inserted, %d updated" % (res['inserted'], res['updated'])))
+    return 1 if errors else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,9 +1,17 @@
 # database_manager.py
-import os, logging
+import os, time, logging, threading, atexit
 from contextlib import contextmanager
 import psycopg2
-from psycopg2.extras import RealDictCursor, execute_values
+from psycopg2.extras import execute_values
 from psycopg2 import errors as pg_errors
+from utils.db_pool import ConnectionPool, pool_settings_from_env
+from utils.cache import reference_cache, report_cache
+from utils.reaction_index import ReactionPairIndex, ttl_from_env as _reaction_index_ttl
+from utils.element_resolver import ElementResolver
+from utils.matviews import MATVIEWS, SCHEDULED_ONLY, MatviewRefresher, settings_from_env as _matview_settings
+from utils import migrations, reports, bulk_import, catalog_import
+from utils.pagination import DEFAULT_PAGE_SIZE, decode_token, keyset_predicate, build_page
+from utils.query_trace import TracingCursor, query_tracer
 
 
 def _norm_symbol(s: str) -> str:
@@ -12,7 +20,33 @@ def _norm_symbol(s: str) -> str:
 def _null_if_blank(s: str | None):
     return None if s is None or (isinstance(s, str) and s.strip() == "") else s
 
+def _numeric_id(v):
+    # број се прифаќа како element_id и кога таков елемент нема („реакцијата не е дефинирана“, не 400)
+    v = str(v).strip()
+    return int(v) if v.isascii() and v.isdigit() and len(v) <= 9 and int(v) else None
+
 log = logging.getLogger("simlab.db")
+
+# json_agg на опремата по експеримент (за листи без N+1 барања)
+_EQUIPMENT_JSON_COL = ", eq.equipment"
+_EQUIPMENT_JSON_JOIN = """
+    LEFT JOIN LATERAL (
+        SELECT COALESCE(
+                   json_agg(json_build_object(
+                       'equipment_name', le.equipment_name,
+                       'type', le.type,
+                       'safety_info', le.safety_info
+                   ) ORDER BY le.equipment_name),
+                   '[]'::json) AS equipment
+        FROM experimentlabequipment ele
+        JOIN labequipment le ON ele.equipment_id = le.equipment_id
+        WHERE ele.experiment_id = e.experiment_id
+    ) eq ON TRUE
+"""
+
+def _equipment_sql(with_equipment: bool):
+    return (_EQUIPMENT_JSON_COL, _EQUIPMENT_JSON_JOIN) if with_equipment else ("", "")
+
 class DatabaseManager:
     # ---------- CONNECTION ----------
     @staticmethod
@@ -23,18 +57,192 @@ class DatabaseManager:
             database=os.getenv('DB_NAME', 'db_202425z_va_prj_simlab25'),
             user=os.getenv('DB_USER', 'db_202425z_va_prj_simlab25_owner'),
             password=os.getenv('DB_PASS', 'c9e5ebb7d332'),
-            cursor_factory=RealDictCursor
+            cursor_factory=TracingCursor         # RealDictCursor + мерење (utils/query_trace.py)
         )
-    
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+def get_pool():
+    """Process-wide connection pool, created lazily on first use."""
+    global _pool
+    if _pool is None:
+        with _pool_lock:
+            if _pool is None:
+                _pool = ConnectionPool(DatabaseManager.get_connection, **pool_settings_from_env())
+    return _pool
+
+@atexit.register
+def _close_pool():
+    # регистрирано при import – atexit е LIFO, па подоцна регистрираните
+    # shutdown hooks (пр. view_tracker) сè уште имаат пристап до pool-от
+    if _pool is not None:
+        _pool.closeall()
+
+def _touch(*tables, start_refresher=True):
+    """Mark tables as written (after commit) so dependent cached reports and matviews go stale."""
+    report_cache.invalidate_tables(*tables)
+    matview_refresher.mark_dirty(*tables, start=start_refresher)
+
+@contextmanager
+def _pooled_conn():
+    started = time.perf_counter()
+    with get_pool().connection() as conn:
+        query_tracer.record_acquire((time.perf_counter() - started) * 1000.0)
+        yield conn
+
 @contextmanager
 def _conn_cur():
-    conn = DatabaseManager.get_connection()
-    try:
+    with _pooled_conn() as conn:
         with conn:
             with conn.cursor() as cur:
                 yield cur
-    finally:
-        conn.close()
+
+_REACTION_PAIR_SELECT = """
+    SELECT r.reaction_id, r.element1_id, r.element2_id, r.product, r.conditions,
+           e1.symbol AS element1_symbol, e1.element_name AS element1_name,
+           e2.symbol AS element2_symbol, e2.element_name AS element2_name
+    FROM reaction r
+    JOIN elements e1 ON r.element1_id = e1.element_id
+    JOIN elements e2 ON r.element2_id = e2.element_id
+"""
+
+reaction_index = ReactionPairIndex(lambda: DatabaseManager._load_reaction_pairs(), _reaction_index_ttl())
+element_resolver = ElementResolver(
+    lambda: reference_cache.get_or_load('elements', DatabaseManager._load_all_elements))
+# по refresh, кешираните извештаи што читаат од view-то стануваат стари
+matview_refresher = MatviewRefresher(_conn_cur, MATVIEWS, on_refresh=report_cache.invalidate_tables,
+                                     scheduled_only=SCHEDULED_ONLY, **_matview_settings())
+
+_REACTION_PAIR_COLUMNS = ('reaction_id', 'element1_id', 'element2_id', 'product', 'conditions',
+                          'element1_symbol', 'element1_name', 'element2_symbol', 'element2_name')
+
+# Reaction → Experiment → опрема во една наредба (data-modifying CTEs, една трансакција)
+_CREATE_REACTION_AND_EXPERIMENT_SQL = """
+    WITH r AS (
+        INSERT INTO reaction (teacher_id, element1_id, element2_id, product, conditions)
+        VALUES (%(t)s, %(e1)s, %(e2)s, %(product)s, %(conditions)s)
+        RETURNING reaction_id, element1_id, element2_id, product, conditions
+    ), x AS (
+        INSERT INTO experiment (teacher_id, reaction_id, result, safety_warning, time_stamp)
+        SELECT %(t)s, r.reaction_id,
+               COALESCE(NULLIF(%(result)s::text, ''),
+                        'Експеримент со ' || e1.symbol || ' и ' || e2.symbol
+                        || ' под услови: ' || COALESCE(NULLIF(%(conditions)s::text, ''), 'стандардни')
+                        || '. Очекуван производ: ' || COALESCE(NULLIF(%(product)s::text, ''), 'непознат') || '.'),
+               %(safety)s, CURRENT_TIMESTAMP
+          FROM r
+          JOIN elements e1 ON e1.element_id = r.element1_id
+          JOIN elements e2 ON e2.element_id = r.element2_id
+        RETURNING experiment_id
+    ), eq AS (
+        INSERT INTO experimentlabequipment (experiment_id, equipment_id)
+        SELECT DISTINCT x.experiment_id, eq_id
+          FROM x, unnest(%(equipment)s::int[]) AS eq_id
+        ON CONFLICT DO NOTHING
+    )
+    SELECT r.reaction_id, x.experiment_id,
+           r.element1_id, r.element2_id, r.product, r.conditions,
+           e1.symbol AS element1_symbol, e1.element_name AS element1_name,
+           e2.symbol AS element2_symbol, e2.element_name AS element2_name
+      FROM r
+      CROSS JOIN x
+      JOIN elements e1 ON e1.element_id = r.element1_id
+      JOIN elements e2 ON e2.element_id = r.element2_id
+"""
+
+# опционални функции во базата: name -> True/False (детектирано еднаш по процес)
+_DB_FUNCTIONS = ('create_reaction_and_experiment_fn',)
+_capabilities = {}
+_capabilities_lock = threading.Lock()
+
+def _db_function_available(name):
+    available = _capabilities.get(name)
+    if available is not None:
+        return available
+    with _capabilities_lock:
+        if name not in _capabilities:
+            try:
+                with _conn_cur() as cur:
+                    cur.execute("SELECT EXISTS (SELECT 1 FROM pg_proc WHERE proname = %s) AS present", (name,))
+                    _capabilities[name] = bool(cur.fetchone()['present'])
+                log.info("database function %s: %s", name, "installed" if _capabilities[name] else "missing")
+            except Exception:
+                log.exception("capability check for %s failed", name)
+                return False        # не кешираме – повторен обид следниот пат
+        return _capabilities[name]
+
+# применети миграции: version -> (проверено во, применета); позитивниот резултат важи засекогаш
+_schema_checks = {}
+_SCHEMA_RECHECK_SEC = 60.0
+
+# сите четири бројачи во едно барање (fallback кога нема ред во teacher_dashboard_stats)
+_TEACHER_STATS_LIVE_SQL = """
+    SELECT
+        (SELECT COUNT(*) FROM student    WHERE teacher_id = %(t)s) AS student_count,
+        (SELECT COUNT(*) FROM reaction   WHERE teacher_id = %(t)s) AS reaction_count,
+        (SELECT COUNT(*) FROM experiment WHERE teacher_id = %(t)s) AS experiment_count,
+        (SELECT COUNT(*)
+           FROM userparticipatesinexperiment up
+           JOIN student s ON up.user_id = s.student_id
+          WHERE s.teacher_id = %(t)s
+            AND up.participation_timestamp >= CURRENT_DATE
+            AND up.participation_timestamp <  CURRENT_DATE + 1) AS activity_count
+"""
+
+# Бројачите по табела се агрегираат посебно: LEFT JOIN на повеќе табели со прегледи
+# врз ист корисник дава Декартов производ (views_e x views_l x учества) пред COUNT(DISTINCT).
+# Види benchmarks/activity_fanout.py.
+
+# последен fallback за get_user_activity_summary (кога ги нема ниту matview ниту view)
+_USER_ACTIVITY_SUMMARY_SQL = """
+    SELECT 
+        u.user_id,
+        (u.user_name || ' ' || u.user_surname) AS full_name,
+        u.role,
+        COALESCE(ve.n, 0) AS elements_viewed,
+        COALESCE(vl.n, 0) AS equipment_viewed,
+        COALESCE(p.n, 0)  AS experiments_participated
+    FROM "User" u
+    LEFT JOIN (SELECT user_id, COUNT(DISTINCT element_id) AS n
+                 FROM userviewselement GROUP BY user_id) ve ON ve.user_id = u.user_id
+    LEFT JOIN (SELECT user_id, COUNT(DISTINCT equipment_id) AS n
+                 FROM userviewslabequipment GROUP BY user_id) vl ON vl.user_id = u.user_id
+    LEFT JOIN (SELECT user_id, COUNT(DISTINCT experiment_id) AS n
+                 FROM userparticipatesinexperiment GROUP BY user_id) p ON p.user_id = u.user_id
+    ORDER BY full_name
+"""
+
+# за еден професор: LATERAL бројач по студент (index seek по user_id)
+_MY_STUDENTS_ACTIVITY_SQL = """
+    SELECT 
+        s.student_id,
+        (u.user_name || ' ' || u.user_surname) AS full_name,
+        ve.n AS total_elements_viewed,
+        vl.n AS total_lab_equipment_viewed
+    FROM student s
+    JOIN "User" u ON s.student_id = u.user_id
+    CROSS JOIN LATERAL (SELECT COUNT(DISTINCT element_id) AS n
+                          FROM userviewselement WHERE user_id = s.student_id) ve
+    CROSS JOIN LATERAL (SELECT COUNT(DISTINCT equipment_id) AS n
+                          FROM userviewslabequipment WHERE user_id = s.student_id) vl
+    WHERE s.teacher_id = %s
+    ORDER BY total_elements_viewed DESC, total_lab_equipment_viewed DESC
+"""
+
+def _keyset_page(sql, key_cols, key_fields, descending, page_token, page_size,
+                 params=(), count_sql=None):
+    """Run `sql` (with a {keyset} predicate and trailing LIMIT %s) as one keyset page."""
+    values = decode_token(page_token, len(key_cols))
+    cond, cond_params = keyset_predicate(key_cols, descending, values)
+    with _conn_cur() as cur:
+        cur.execute(sql.replace('{keyset}', cond), tuple(params) + cond_params + (page_size + 1,))
+        rows = cur.fetchall()
+    total_loader = (lambda: DatabaseManager.count_rows(count_sql)) if count_sql else None
+    return build_page(rows, key_fields, page_size,
+                      token=page_token if values is not None else None,
+                      total_loader=total_loader)
 
 class DatabaseManager(DatabaseManager):  # extend class with methods
     # ---------- GENERIC EXEC ----------
@@ -48,7 +256,92 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
             log.exception("execute_query failed: %s | params=%s", query, params)
             return None
 
+    @staticmethod
+    def run_report(report, values=()):
+        """Rows of a registered report (utils/reports.py), PREPAREd once per pooled connection."""
+        try:
+            with _pooled_conn() as conn, conn:
+                with conn.cursor() as cur:
+                    return reports.execute(cur, report, values, get_pool().conn_info(conn))
+        except Exception:
+            log.exception("report %s failed | params=%s", report.name, values)
+            return None
+
+
+    @staticmethod
+    def stream_query(query, params=None, batch_size=500):
+        """Yield rows through a server-side cursor, `batch_size` rows per network fetch."""
+        with _pooled_conn() as conn, conn:
+            with conn.cursor(name="simlab_stream") as cur:
+                cur.itersize = batch_size
+                cur.execute(query, params or ())
+                for row in cur:
+                    yield row
+
+    @staticmethod
+    def count_rows(count_sql, params=None):
+        try:
+            with _conn_cur() as cur:
+                cur.execute(count_sql, params or ())
+                row = cur.fetchone()
+                return int(row['c']) if row else 0
+        except Exception:
+            log.exception("count_rows failed: %s", count_sql)
+            return 0
+
+    @staticmethod
+    def get_pool_stats():
+        return get_pool().stats()
+
+    @staticmethod
+    def get_query_stats():
+        return query_tracer.stats()
+
+    @staticmethod
+    def get_cache_stats():
+        return {'reference': reference_cache.stats(), 'reaction_pairs': reaction_index.stats(),
+                'reports': report_cache.stats()}
+
+    @staticmethod
+    def migrate_schema():
+        """Apply pending migrations (utils/migrations.py); None when the database is unreachable."""
+        try:
+            return migrations.migrate(DatabaseManager.get_connection)
+        except Exception:
+            log.exception("schema migration failed")
+            return None
+
+    @staticmethod
+    def get_schema_status():
+        """Applied/pending migrations and required indexes that are missing."""
+        try:
+            with _conn_cur() as cur:
+                res = migrations.status(cur)
+        except Exception:
+            log.exception("get_schema_status failed")
+            return None
+        res['db_functions'] = {name: _capabilities.get(name) for name in _DB_FUNCTIONS}
+        return res
 
+    @staticmethod
+    def schema_has(version):
+        """True once migration `version` is applied; a negative answer is re-checked every minute."""
+        checked = _schema_checks.get(version)
+        if checked is not None and (checked[1] or time.monotonic() - checked[0] < _SCHEMA_RECHECK_SEC):
+            return checked[1]
+        try:
+            with _conn_cur() as cur:
+                applied = migrations.is_applied(cur, version)
+        except Exception:
+            log.exception("schema_has(%s) failed", version)
+            return False
+        _schema_checks[version] = (time.monotonic(), applied)
+        return applied
+
+    @staticmethod
+    def password_hash_format_ready():
+        """Whether "User".password can hold self-describing hashes (migration 6)."""
+        return DatabaseManager.schema_has(migrations.PASSWORD_HASH_MIGRATION)
 
     @staticmethod
     def test_connection():
@@ -77,6 +370,17 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
             log.exception("authenticate_user failed (email=%s)", email)
             return None
 
+    @staticmethod
+    def update_user_password(user_id, password_hash):
+        """Replace the stored hash (rehash on login after the hashing parameters changed)."""
+        try:
+            with _conn_cur() as cur:
+                cur.execute('UPDATE "User" SET password = %s WHERE user_id = %s', (password_hash, user_id))
+                return cur.rowcount == 1
+        except Exception:
+            log.exception("update_user_password failed (user_id=%s)", user_id)
+            return False
+
     @staticmethod
     def register_user(name, surname, email, password_hash, role, teacher_id=None):
         try:
@@ -97,7 +401,8 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
                 elif role == 'teacher':
                     cur.execute('INSERT INTO teacher (teacher_id) VALUES (%s)', (user_id,))
 
-                return user_id
+            _touch('User', 'student', 'teacher')
+            return user_id
         except pg_errors.UniqueViolation:
             log.warning("register_user: email already exists (%s)", email)
             return None
@@ -147,9 +452,29 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
             log.exception("get_all_users failed")
             return None
 
+    @staticmethod
+    def get_users_page(page_token=None, page_size=DEFAULT_PAGE_SIZE):
+        try:
+            return _keyset_page('''
+                SELECT user_id, user_name, user_surname, email, role
+                FROM "User"
+                WHERE {keyset}
+                ORDER BY user_name, user_id
+                LIMIT %s
+            ''', ('user_name', 'user_id'), ('user_name', 'user_id'), False,
+                page_token, page_size, count_sql='SELECT COUNT(*) AS c FROM "User"')
+        except Exception:
+            log.exception("get_users_page failed")
+            return build_page([], (), page_size)
+
     # ---------- ELEMENTS ----------
     @staticmethod
     def get_all_elements():
+        rows = reference_cache.get_or_load('elements', DatabaseManager._load_all_elements)
+        return list(rows) if rows is not None else None
+
+    @staticmethod
+    def _load_all_elements():
         try:
             with _conn_cur() as cur:
                 cur.execute('''
@@ -162,7 +487,22 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
         except Exception:
             log.exception("get_all_elements failed")
             return None
-        
+
+    @staticmethod
+    def get_elements_page(page_token=None, page_size=DEFAULT_PAGE_SIZE):
+        try:
+            return _keyset_page('''
+                SELECT element_id, symbol, element_name, atomic_number,
+                       atomic_weight, melting_point, boiling_point, hazard_type, description_element
+                FROM elements
+                WHERE {keyset}
+                ORDER BY atomic_number, element_id
+                LIMIT %s
+            ''', ('atomic_number', 'element_id'), ('atomic_number', 'element_id'), False,
+                page_token, page_size, count_sql='SELECT COUNT(*) AS c FROM elements')
+        except Exception:
+            log.exception("get_elements_page failed")
+            return build_page([], (), page_size)
 
     @staticmethod
     def add_element(symbol, name, atomic_number, atomic_weight, melting_point, boiling_point, hazard_type, description, teacher_id):
@@ -175,7 +515,10 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
                     VALUES (%s, %s, %s, %s, %s, %s, %s, %s, %s)
                     RETURNING element_id
                 ''', (symbol, name, atomic_number, atomic_weight, melting_point, boiling_point, hazard_type, description, teacher_id))
-                return cur.fetchone()['element_id']
+                element_id = cur.fetchone()['element_id']
+            reference_cache.invalidate('elements')
+            _touch('elements')
+            return element_id
         except pg_errors.UniqueViolation:
             log.warning("add_element: symbol already exists (%s)", symbol)
             return None
@@ -197,7 +540,10 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
                         melting_point = %s, boiling_point = %s, hazard_type = %s, description_element = %s
                     WHERE element_id = %s
                 ''', (symbol, name, atomic_number, atomic_weight, melting_point, boiling_point, hazard_type, description, element_id))
-                return True
+            reference_cache.invalidate('elements')
+            reaction_index.invalidate()      # симболи/имиња во индексот
+            _touch('elements')
+            return True
         except pg_errors.UniqueViolation:
             log.warning("update_element: symbol already exists (%s)", symbol)
             return False
@@ -208,6 +554,48 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
             log.exception("update_element failed (element_id=%s)", element_id)
             return False
 
+    @staticmethod
+    def upsert_catalog(name, rows, teacher_id, dry_run=False):
+        """Insert/update catalog rows ('elements' by symbol, 'equipment' by name) in one statement.
+
+        `rows` come from catalog_import.parse_catalog. Returns the diff against
+        the database and the number of rows written; None on a database error.
+        """
+        catalog = catalog_import.CATALOGS[name]
+        loader = {'elements': DatabaseManager._load_all_elements,
+                  'equipment': DatabaseManager._load_all_equipment}[name]
+        existing = loader()          # свежо од базата, не од кешот
+        if existing is None:
+            return None
+        d = catalog_import.diff(catalog, existing, rows)
+        res = {'diff': d, 'dry_run': dry_run, 'inserted': 0, 'updated': 0}
+        changed = d['insert'] + [rows[u[catalog.key]] for u in d['update']]
+        if dry_run or not changed:
+            return res
+
+        columns = list(changed[0])
+        try:
+            with _pooled_conn() as conn, conn:
+                with conn.cursor() as cur:
+                    written = execute_values(cur, catalog.upsert_sql(columns),
+                                             [[r[c] for c in columns] + [teacher_id] for r in changed],
+                                             fetch=True)
+        except (pg_errors.CheckViolation, pg_errors.NotNullViolation, pg_errors.UniqueViolation) as ex:
+            log.warning("upsert_catalog(%s) rejected: %s", name, str(ex).strip())
+            return None
+        except Exception:
+            log.exception("upsert_catalog(%s) failed", name)
+            return None
+        res['inserted'] = sum(1 for r in written if r['inserted'])
+        res['updated'] = len(written) - res['inserted']
+
+        reference_cache.invalidate(catalog.cache_key)
+        if name == 'elements':
+            reaction_index.invalidate()      # симболи/имиња во индексот
+        _touch(catalog.table)
+        log.info("upsert_catalog(%s): %d inserted, %d updated", name, res['inserted'], res['updated'])
+        return res
+
     @staticmethod
     def get_element_by_id(element_id):
         try:
@@ -227,6 +615,11 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
     # ---------- LAB EQUIPMENT ----------
     @staticmethod
     def get_all_equipment():
+        rows = reference_cache.get_or_load('equipment', DatabaseManager._load_all_equipment)
+        return list(rows) if rows is not None else None
+
+    @staticmethod
+    def _load_all_equipment():
         try:
             with _conn_cur() as cur:
                 cur.execute('''
@@ -239,6 +632,21 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
             log.exception("get_all_equipment failed")
             return None
 
+    @staticmethod
+    def get_equipment_page(page_token=None, page_size=DEFAULT_PAGE_SIZE):
+        try:
+            return _keyset_page('''
+                SELECT equipment_id, equipment_name, type, description, safety_info
+                FROM labequipment
+                WHERE {keyset}
+                ORDER BY equipment_name, equipment_id
+                LIMIT %s
+            ''', ('equipment_name', 'equipment_id'), ('equipment_name', 'equipment_id'), False,
+                page_token, page_size, count_sql='SELECT COUNT(*) AS c FROM labequipment')
+        except Exception:
+            log.exception("get_equipment_page failed")
+            return build_page([], (), page_size)
+
     @staticmethod
     def add_lab_equipment(name, equipment_type, description, safety_info, teacher_id):
         try:
@@ -248,7 +656,10 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
                     VALUES (%s, %s, %s, %s, %s)
                     RETURNING equipment_id
                 ''', (name, equipment_type, description, safety_info, teacher_id))
-                return cur.fetchone()['equipment_id']
+                equipment_id = cur.fetchone()['equipment_id']
+            reference_cache.invalidate('equipment')
+            _touch('labequipment')
+            return equipment_id
         except pg_errors.UniqueViolation:
             log.warning("add_lab_equipment: equipment_name already exists (%s)", name)
             return None
@@ -265,7 +676,9 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
                     SET equipment_name = %s, type = %s, description = %s, safety_info = %s
                     WHERE equipment_id = %s
                 ''', (name, equipment_type, description, safety_info, equipment_id))
-                return True
+            reference_cache.invalidate('equipment')
+            _touch('labequipment')
+            return True
         except Exception:
             log.exception("update_equipment failed (equipment_id=%s)", equipment_id)
             return False
@@ -298,7 +711,10 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
                     VALUES (%s, %s, %s, %s, %s)
                     RETURNING reaction_id
                 ''', (teacher_id, element1_id, element2_id, product, conditions))
-                return cur.fetchone()['reaction_id']
+                reaction_id = cur.fetchone()['reaction_id']
+            DatabaseManager._sync_reaction_index(reaction_id)
+            _touch('reaction')
+            return reaction_id
         except pg_errors.UniqueViolation:
             log.warning("add_reaction: duplicate (element1, element2, conditions)")
             return None
@@ -321,7 +737,9 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
                     SET element1_id = %s, element2_id = %s, product = %s, conditions = %s
                     WHERE reaction_id = %s
                 ''', (element1_id, element2_id, product, conditions, reaction_id))
-                return True
+            DatabaseManager._sync_reaction_index(reaction_id)
+            _touch('reaction')
+            return True
         except pg_errors.UniqueViolation:
             log.warning("update_reaction: duplicate (element1, element2, conditions)")
             return False
@@ -337,7 +755,9 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
         try:
             with _conn_cur() as cur:
                 cur.execute('DELETE FROM reaction WHERE reaction_id = %s', (reaction_id,))
-                return True
+            reaction_index.remove(reaction_id)
+            _touch('reaction')
+            return True
         except pg_errors.ForeignKeyViolation:
             log.warning("delete_reaction blocked: Reaction %s has Experiments", reaction_id)
             return False
@@ -346,6 +766,30 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
             return False
 
 
+    @staticmethod
+    def _load_reaction_pairs():
+        try:
+            with _conn_cur() as cur:
+                cur.execute(_REACTION_PAIR_SELECT)
+                return cur.fetchall()
+        except Exception:
+            log.exception("_load_reaction_pairs failed")
+            return None
+
+    @staticmethod
+    def _sync_reaction_index(reaction_id):
+        try:
+            with _conn_cur() as cur:
+                cur.execute(_REACTION_PAIR_SELECT + " WHERE r.reaction_id = %s", (reaction_id,))
+                row = cur.fetchone()
+            if row:
+                reaction_index.upsert(row)
+            else:
+                reaction_index.remove(reaction_id)
+        except Exception:
+            log.exception("_sync_reaction_index failed (%s)", reaction_id)
+            reaction_index.invalidate()
+
     @staticmethod
     def get_all_reactions():
         try:
@@ -366,6 +810,27 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
             log.exception("get_all_reactions failed")
             return []
 
+    @staticmethod
+    def get_reactions_page(page_token=None, page_size=DEFAULT_PAGE_SIZE):
+        try:
+            return _keyset_page('''
+                SELECT r.*,
+                       e1.symbol  AS element1_symbol, e1.element_name AS element1_name,
+                       e2.symbol  AS element2_symbol, e2.element_name AS element2_name,
+                       u.user_name || ' ' || u.user_surname AS created_by
+                FROM reaction r
+                JOIN elements e1 ON r.element1_id = e1.element_id
+                JOIN elements e2 ON r.element2_id = e2.element_id
+                JOIN "User"  u   ON r.teacher_id = u.user_id
+                WHERE {keyset}
+                ORDER BY r.reaction_id DESC
+                LIMIT %s
+            ''', ('r.reaction_id',), ('reaction_id',), True,
+                page_token, page_size, count_sql='SELECT COUNT(*) AS c FROM reaction')
+        except Exception:
+            log.exception("get_reactions_page failed")
+            return build_page([], (), page_size)
+
     @staticmethod
     def get_reaction_by_id(reaction_id):
         try:
@@ -398,17 +863,20 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
                     VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
                     RETURNING experiment_id
                 ''', (teacher_id, reaction_id, result, _null_if_blank(safety_warning)))
-                return cur.fetchone()['experiment_id']
+                experiment_id = cur.fetchone()['experiment_id']
+            _touch('experiment')
+            return experiment_id
         except Exception:
             log.exception("insert_experiment failed")
             return None
 
 
     @staticmethod
-    def get_all_experiments():
+    def get_all_experiments(with_equipment=False):
+        eq_col, eq_join = _equipment_sql(with_equipment)
         try:
             with _conn_cur() as cur:
-                cur.execute('''
+                cur.execute(f'''
                     SELECT e.experiment_id,
                            e.result,
                            e.time_stamp,
@@ -419,12 +887,13 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
                            el1.element_name AS element1_name,
                            el2.symbol AS element2_symbol,
                            el2.element_name AS element2_name,
-                           u.user_name || ' ' || u.user_surname AS created_by
+                           u.user_name || ' ' || u.user_surname AS created_by{eq_col}
                     FROM experiment e
                     JOIN reaction r ON e.reaction_id = r.reaction_id
                     JOIN elements el1 ON r.element1_id = el1.element_id
                     JOIN elements el2 ON r.element2_id = el2.element_id
                     JOIN "User" u ON e.teacher_id = u.user_id
+                    {eq_join}
                     ORDER BY e.time_stamp DESC
                 ''')
                 return cur.fetchall()
@@ -433,26 +902,63 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
             return []
 
     @staticmethod
-    def get_experiment_by_id(experiment_id):
+    def get_experiments_page(page_token=None, page_size=DEFAULT_PAGE_SIZE, with_equipment=False):
+        eq_col, eq_join = _equipment_sql(with_equipment)
+        try:
+            return _keyset_page(f'''
+                SELECT e.experiment_id,
+                       e.result,
+                       e.time_stamp,
+                       e.safety_warning,
+                       r.product,
+                       r.conditions,
+                       el1.symbol AS element1_symbol,
+                       el1.element_name AS element1_name,
+                       el2.symbol AS element2_symbol,
+                       el2.element_name AS element2_name,
+                       u.user_name || ' ' || u.user_surname AS created_by{eq_col}
+                FROM experiment e
+                JOIN reaction r ON e.reaction_id = r.reaction_id
+                JOIN elements el1 ON r.element1_id = el1.element_id
+                JOIN elements el2 ON r.element2_id = el2.element_id
+                JOIN "User" u ON e.teacher_id = u.user_id
+                {eq_join}
+                WHERE {{keyset}}
+                ORDER BY e.time_stamp DESC, e.experiment_id DESC
+                LIMIT %s
+            ''', ('e.time_stamp', 'e.experiment_id'), ('time_stamp', 'experiment_id'), True,
+                page_token, page_size, count_sql='SELECT COUNT(*) AS c FROM experiment')
+        except Exception:
+            log.exception("get_experiments_page failed")
+            return build_page([], (), page_size)
+
+    @staticmethod
+    def get_experiment_by_id(experiment_id, with_equipment=False):
+        """Experiment + reaction/element metadata (+ equipment list) by primary key, one query."""
+        eq_col, eq_join = _equipment_sql(with_equipment)
         try:
             with _conn_cur() as cur:
-                cur.execute('''
+                cur.execute(f'''
                     SELECT e.experiment_id,
                            e.result,
                            e.time_stamp,
                            e.safety_warning,
+                           e.reaction_id,
                            r.product,
                            r.conditions,
+                           r.element1_id,
+                           r.element2_id,
                            el1.symbol AS element1_symbol,
                            el1.element_name AS element1_name,
                            el2.symbol AS element2_symbol,
                            el2.element_name AS element2_name,
-                           u.user_name || ' ' || u.user_surname AS created_by
+                           u.user_name || ' ' || u.user_surname AS created_by{eq_col}
                     FROM experiment e
                     JOIN reaction r ON e.reaction_id = r.reaction_id
                     JOIN elements el1 ON r.element1_id = el1.element_id
                     JOIN elements el2 ON r.element2_id = el2.element_id
                     JOIN "User" u ON e.teacher_id = u.user_id
+                    {eq_join}
                     WHERE e.experiment_id = %s
                 ''', (experiment_id,))
                 row = cur.fetchone()
@@ -476,6 +982,30 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
             log.exception("get_experiment_equipment failed (%s)", experiment_id)
             return []
 
+    @staticmethod
+    def get_equipment_for_experiments(experiment_ids):
+        """Equipment for many experiments in one round trip: {experiment_id: [rows]}."""
+        ids = sorted({int(i) for i in (experiment_ids or [])})
+        grouped = {i: [] for i in ids}
+        if not ids:
+            return grouped
+        try:
+            with _conn_cur() as cur:
+                cur.execute('''
+                    SELECT ele.experiment_id, le.equipment_name, le.type, le.safety_info
+                    FROM experimentlabequipment ele
+                    JOIN labequipment le ON ele.equipment_id = le.equipment_id
+                    WHERE ele.experiment_id = ANY(%s)
+                    ORDER BY ele.experiment_id, le.equipment_name
+                ''', (ids,))
+                for row in cur.fetchall():
+                    row = dict(row)
+                    grouped[row.pop('experiment_id')].append(row)
+            return grouped
+        except Exception:
+            log.exception("get_equipment_for_experiments failed (%d ids)", len(ids))
+            return grouped
+
 
     # ---------- PARTICIPATION / VIEWS ----------
     @staticmethod
@@ -487,28 +1017,55 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
                     VALUES (%s, %s)
                     ON CONFLICT (user_id, experiment_id) DO NOTHING
                 ''', (user_id, experiment_id))
-                return True
+            _touch('userparticipatesinexperiment')
+            return True
         except Exception:
             log.exception("track_experiment_participation failed")
             return False
 
 
     @staticmethod
-    def get_user_experiments(user_id):
+    def track_views_bulk(element_views, equipment_views, shutdown=False):
+        """Insert many (user_id, item_id) views in one transaction (used by utils.view_tracker).
+
+        shutdown=True is the final flush from atexit: the write is recorded but no
+        background refresh thread is started.
+        """
+        if not element_views and not equipment_views:
+            return
+        with _conn_cur() as cur:
+            if element_views:
+                execute_values(cur, '''
+                    INSERT INTO userviewselement (user_id, element_id)
+                    VALUES %s ON CONFLICT DO NOTHING
+                ''', list(element_views), page_size=1000)
+            if equipment_views:
+                execute_values(cur, '''
+                    INSERT INTO userviewslabequipment (user_id, equipment_id)
+                    VALUES %s ON CONFLICT DO NOTHING
+                ''', list(equipment_views), page_size=1000)
+        _touch(*[t for t, rows in (('userviewselement', element_views),
+                                   ('userviewslabequipment', equipment_views)) if rows],
+               start_refresher=not shutdown)
+
+    @staticmethod
+    def get_user_experiments(user_id, with_equipment=False):
+        eq_col, eq_join = _equipment_sql(with_equipment)
         try:
             with _conn_cur() as cur:
-                cur.execute('''
+                cur.execute(f'''
                     SELECT e.*,
                            r.product,
                            r.conditions,
                            el1.symbol AS element1_symbol, el1.element_name AS element1_name,
                            el2.symbol AS element2_symbol, el2.element_name AS element2_name,
-                           up.participation_timestamp
+                           up.participation_timestamp{eq_col}
                     FROM experiment e
                     JOIN userparticipatesinexperiment up ON e.experiment_id = up.experiment_id
                     JOIN reaction r ON e.reaction_id = r.reaction_id
                     JOIN elements el1 ON r.element1_id = el1.element_id
                     JOIN elements el2 ON r.element2_id = el2.element_id
+                    {eq_join}
                     WHERE up.user_id = %s
                     ORDER BY up.participation_timestamp DESC
                 ''', (user_id,))
@@ -525,6 +1082,7 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
                     INSERT INTO userviewselement(user_id, element_id)
                     VALUES (%s, %s) ON CONFLICT DO NOTHING
                 ''', (user_id, element_id))
+            _touch('userviewselement')
         except Exception:
             log.exception("track_element_view failed")
 
@@ -536,6 +1094,7 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
                     INSERT INTO userviewslabequipment(user_id, equipment_id)
                     VALUES (%s, %s) ON CONFLICT DO NOTHING
                 ''', (user_id, equipment_id))
+            _touch('userviewslabequipment')
         except Exception:
             log.exception("track_equipment_view failed")
 
@@ -573,12 +1132,13 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
                     VALUES %s ON CONFLICT DO NOTHING
                 """, rows)
             else:
-                with DatabaseManager.get_connection() as c:
+                with _pooled_conn() as c, c:
                     with c.cursor() as k:
                         execute_values(k, """
                             INSERT INTO experimentlabequipment (experiment_id, equipment_id)
                             VALUES %s ON CONFLICT DO NOTHING
                         """, rows)
+                _touch('experimentlabequipment')
         except Exception:
             log.exception("add_experiment_equipment failed (exp=%s)", experiment_id)
 
@@ -593,59 +1153,22 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
         safety_warning=None,
         equipment_ids=None
     ):
-        """Create Reaction → Experiment (+equipment) in ONE transaction."""
-        conn = None
+        """Create Reaction → Experiment (+equipment) in ONE statement (one round trip).
+
+        Also returns the reaction's pair columns so the in-memory index can be
+        updated without reading the row back.
+        """
         try:
-            conn = DatabaseManager.get_connection()
-            with conn:
-                with conn.cursor() as cur:
-                    # 1) Reaction
-                    cur.execute('''
-                        INSERT INTO reaction (teacher_id, element1_id, element2_id, product, conditions)
-                        VALUES (%s, %s, %s, %s, %s)
-                        RETURNING reaction_id
-                    ''', (teacher_id, element1_id, element2_id, product, conditions))
-                    reaction_id = cur.fetchone()['reaction_id']
-
-                    # 2) fallback experiment_result if missing
-                    if not experiment_result:
-                        cur.execute('SELECT symbol FROM elements WHERE element_id = %s', (element1_id,))
-                        s1 = cur.fetchone()['symbol']
-                        cur.execute('SELECT symbol FROM elements WHERE element_id = %s', (element2_id,))
-                        s2 = cur.fetchone()['symbol']
-                        experiment_result = (
-                            f"Експеримент со {s1} и {s2} под услови: {conditions or 'стандардни'}. "
-                            f"Очекуван производ: {product or 'непознат'}."
-                        )
-
-                    # 3) Experiment
-                    cur.execute('''
-                        INSERT INTO experiment (teacher_id, reaction_id, result, safety_warning, time_stamp)
-                        VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
-                        RETURNING experiment_id
-                    ''', (teacher_id, reaction_id, experiment_result, safety_warning))
-                    experiment_id = cur.fetchone()['experiment_id']
-
-                    # 4) Equipment links
-                    if equipment_ids:
-                        DatabaseManager.add_experiment_equipment(
-                            experiment_id=experiment_id,
-                            equipment_ids=equipment_ids,
-                            conn=conn, cur=cur
-                        )
-
-            return {"reaction_id": reaction_id, "experiment_id": experiment_id}
-
-        except Exception:
-            if conn:
-                try:
-                    conn.rollback()
-                except Exception:
-                    pass
-                try:
-                    conn.close()
-                except Exception:
-                    pass
+            with _conn_cur() as cur:
+                cur.execute(_CREATE_REACTION_AND_EXPERIMENT_SQL, {
+                    't': teacher_id, 'e1': element1_id, 'e2': element2_id,
+                    'product': product, 'conditions': conditions,
+                    'result': experiment_result, 'safety': safety_warning,
+                    'equipment': list(equipment_ids or []),
+                })
+                row = cur.fetchone()
+            return dict(row) if row else None
+        except Exception:
             log.exception("_create_reaction_and_experiment_python failed")
             return None
 
@@ -668,10 +1191,11 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
             return None
 
     @staticmethod
-    def get_student_participation_experiments(student_id):
+    def get_student_participation_experiments(student_id, with_equipment=False):
+        eq_col, eq_join = _equipment_sql(with_equipment)
         try:
             with _conn_cur() as cur:
-                cur.execute("""
+                cur.execute(f"""
                     SELECT
                         e.experiment_id,
                         e.result,
@@ -682,12 +1206,13 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
                         el1.symbol AS element1_symbol,
                         el1.element_name AS element1_name,
                         el2.symbol AS element2_symbol,
-                        el2.element_name AS element2_name
+                        el2.element_name AS element2_name{eq_col}
                     FROM userparticipatesinexperiment up
                     JOIN experiment e ON up.experiment_id = e.experiment_id
                     JOIN reaction  r  ON e.reaction_id = r.reaction_id
                     JOIN elements el1 ON r.element1_id = el1.element_id
                     JOIN elements el2 ON r.element2_id = el2.element_id
+                    {eq_join}
                     WHERE up.user_id = %s
                     ORDER BY up.participation_timestamp DESC
                 """, (student_id,))
@@ -698,110 +1223,104 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
 
     @staticmethod
     def get_student_statistics(student_id):
+        """Counters from user_activity_counters (one PK lookup; no row means no activity yet)."""
+        empty = {'experiment_count': 0, 'element_count': 0, 'equipment_count': 0, 'reaction_count': 0}
         try:
             with _conn_cur() as cur:
                 cur.execute("""
-                    SELECT 
-                        (SELECT COUNT(*) FROM userparticipatesinexperiment WHERE user_id = %s) AS experiment_count,
-                        (SELECT COUNT(*) FROM userviewselement             WHERE user_id = %s) AS element_count,
-                        (SELECT COUNT(*) FROM userviewslabequipment        WHERE user_id = %s) AS equipment_count,
-                        (
-                            SELECT COUNT(DISTINCT e.reaction_id)
-                            FROM userparticipatesinexperiment up
-                            JOIN experiment e ON up.experiment_id = e.experiment_id
-                            WHERE up.user_id = %s
-                        ) AS reaction_count
-                """, (student_id, student_id, student_id, student_id))
+                    SELECT experiment_count, element_count, equipment_count, reaction_count
+                    FROM user_activity_counters
+                    WHERE user_id = %s
+                """, (student_id,))
                 row = cur.fetchone()
-                return dict(row) if row else {
-                    'experiment_count': 0, 'element_count': 0, 'equipment_count': 0, 'reaction_count': 0
-                }
+                return dict(row) if row else empty
+        except pg_errors.UndefinedTable:
+            log.warning("user_activity_counters missing; run `python -m utils.migrations`")
         except Exception:
             log.exception("get_student_statistics failed (%s)", student_id)
-            return {'experiment_count': 0, 'element_count': 0, 'equipment_count': 0, 'reaction_count': 0}
+            return empty
+        try:
+            return DatabaseManager._student_statistics_live(student_id) or empty
+        except Exception:
+            log.exception("get_student_statistics live fallback failed (%s)", student_id)
+            return empty
+
+    @staticmethod
+    def _student_statistics_live(student_id):
+        with _conn_cur() as cur:
+            cur.execute("""
+                SELECT 
+                    (SELECT COUNT(*) FROM userparticipatesinexperiment WHERE user_id = %s) AS experiment_count,
+                    (SELECT COUNT(*) FROM userviewselement             WHERE user_id = %s) AS element_count,
+                    (SELECT COUNT(*) FROM userviewslabequipment        WHERE user_id = %s) AS equipment_count,
+                    (
+                        SELECT COUNT(DISTINCT e.reaction_id)
+                        FROM userparticipatesinexperiment up
+                        JOIN experiment e ON up.experiment_id = e.experiment_id
+                        WHERE up.user_id = %s
+                    ) AS reaction_count
+            """, (student_id, student_id, student_id, student_id))
+            row = cur.fetchone()
+            return dict(row) if row else None
 
     @staticmethod
     def get_teacher_dashboard_statistics(teacher_id):
+        """Counters from teacher_dashboard_stats (one PK lookup); live recount + seed on a miss."""
+        empty = {'student_count': 0, 'reaction_count': 0, 'experiment_count': 0, 'activity_count': 0}
         try:
             with _conn_cur() as cur:
-                def get_c():
-                    row = cur.fetchone()
-                    if row is None:
-                        return 0
-                    try:
-                        return int(row['c'])
-                    except Exception:
-                        return int(row[0])
-
                 cur.execute("""
-                    SELECT COUNT(*) AS c
-                    FROM student
+                    SELECT student_count, reaction_count, experiment_count,
+                           CASE WHEN activity_date = CURRENT_DATE THEN activity_count ELSE 0 END AS activity_count
+                    FROM teacher_dashboard_stats
                     WHERE teacher_id = %s
                 """, (teacher_id,))
-                student_count = get_c()
-
-                cur.execute("""
-                    SELECT COUNT(*) AS c
-                    FROM reaction
-                    WHERE teacher_id = %s
-                """, (teacher_id,))
-                reaction_count = get_c()
-
-                cur.execute("""
-                    SELECT COUNT(*) AS c
-                    FROM experiment
-                    WHERE teacher_id = %s
-                """, (teacher_id,))
-                experiment_count = get_c()
-
-                try:
-                    cur.execute("""
-                        SELECT COUNT(*) AS c
-                        FROM userparticipatesinexperiment up
-                        JOIN student s ON up.user_id = s.student_id
-                        WHERE s.teacher_id = %s
-                        AND up.participation_timestamp::date = CURRENT_DATE
-                    """, (teacher_id,))
-                    activity_count = get_c()
-                except Exception:
-                    cur.execute("""
-                        SELECT COUNT(*) AS c
-                        FROM userparticipatesinexperiment up
-                        JOIN student   s ON up.user_id       = s.student_id
-                        JOIN experiment e ON up.experiment_id = e.experiment_id
-                        WHERE s.teacher_id = %s
-                        AND e.time_stamp::date = CURRENT_DATE
-                    """, (teacher_id,))
-                    activity_count = get_c()
-
-                return {
-                    'student_count': student_count,
-                    'reaction_count': reaction_count,
-                    'experiment_count': experiment_count,
-                    'activity_count': activity_count
-                }
+                row = cur.fetchone()
+            if row:
+                return dict(row)
+        except pg_errors.UndefinedTable:
+            log.warning("teacher_dashboard_stats missing; run `python -m utils.migrations`")
+            try:
+                return DatabaseManager._teacher_dashboard_statistics_live(teacher_id) or empty
+            except Exception:
+                log.exception("get_teacher_dashboard_statistics live fallback failed (teacher_id=%s)", teacher_id)
+                return empty
         except Exception:
             log.exception("get_teacher_dashboard_statistics failed (teacher_id=%s)", teacher_id)
-            return {'student_count': 0, 'reaction_count': 0, 'experiment_count': 0, 'activity_count': 0}
+            return empty
+
+        # нема ред (нов професор) → пресметај во живо и запиши го за следните читања
+        try:
+            with _conn_cur() as cur:
+                cur.execute(f"""
+                    INSERT INTO teacher_dashboard_stats
+                           (teacher_id, student_count, reaction_count, experiment_count, activity_date, activity_count)
+                    SELECT %(t)s, c.student_count, c.reaction_count, c.experiment_count, CURRENT_DATE, c.activity_count
+                    FROM ({_TEACHER_STATS_LIVE_SQL}) c
+                    WHERE EXISTS (SELECT 1 FROM teacher WHERE teacher_id = %(t)s)
+                    ON CONFLICT (teacher_id) DO NOTHING
+                    RETURNING student_count, reaction_count, experiment_count, activity_count
+                """, {'t': teacher_id})
+                row = cur.fetchone()
+            if row:
+                return dict(row)
+            return DatabaseManager._teacher_dashboard_statistics_live(teacher_id) or empty
+        except Exception:
+            log.exception("get_teacher_dashboard_statistics seed failed (teacher_id=%s)", teacher_id)
+            return empty
+
+    @staticmethod
+    def _teacher_dashboard_statistics_live(teacher_id):
+        with _conn_cur() as cur:
+            cur.execute(_TEACHER_STATS_LIVE_SQL, {'t': teacher_id})
+            row = cur.fetchone()
+            return dict(row) if row else None
 
     @staticmethod
     def get_my_students_activity(teacher_id):
         try:
             with _conn_cur() as cur:
-                cur.execute("""
-                    SELECT 
-                        s.student_id,
-                        (u.user_name || ' ' || u.user_surname) AS full_name,
-                        COALESCE(COUNT(DISTINCT uve.element_id), 0)      AS total_elements_viewed,
-                        COALESCE(COUNT(DISTINCT uvl.equipment_id), 0)    AS total_lab_equipment_viewed
-                    FROM student s
-                    JOIN "User" u ON s.student_id = u.user_id
-                    LEFT JOIN userviewselement      uve ON s.student_id = uve.user_id
-                    LEFT JOIN userviewslabequipment uvl ON s.student_id = uvl.user_id
-                    WHERE s.teacher_id = %s
-                    GROUP BY s.student_id, full_name
-                    ORDER BY total_elements_viewed DESC, total_lab_equipment_viewed DESC
-                """, (teacher_id,))
+                cur.execute(_MY_STUDENTS_ACTIVITY_SQL, (teacher_id,))
                 return cur.fetchall()
         except Exception:
             log.exception("get_my_students_activity failed")
@@ -928,26 +1447,44 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
             return []
 
     # Views
+    @staticmethod
+    def _read_first(label, queries, params=()):
+        """Rows from the first query that succeeds (materialized view first, then its fallbacks)."""
+        matview_refresher.ensure_started()
+        for source, sql in queries:
+            try:
+                with _conn_cur() as cur:
+                    cur.execute(sql, params)
+                    return cur.fetchall()
+            except Exception:
+                log.exception("%s failed on %s", label, source)
+        return []
+
     @staticmethod
     def vw_students_experiments_detailed():
-        try:
-            with _conn_cur() as cur:
-                cur.execute('SELECT * FROM vw_students_experiments_detailed')
-                return cur.fetchall()
-        except Exception:
-            log.exception("vw_students_experiments_detailed failed")
-            return []
+        return DatabaseManager._read_first("vw_students_experiments_detailed", [
+            ("mv_students_experiments",
+             'SELECT * FROM mv_students_experiments ORDER BY participation_date DESC'),
+            ("vw_students_experiments_detailed", 'SELECT * FROM vw_students_experiments_detailed'),
+        ])
 
     @staticmethod
     def vw_students_experiments_for_teacher(teacher_id):
-        try:
-            with _conn_cur() as cur:
-                cur.execute('SELECT * FROM vw_students_experiments_for_teacher WHERE teacher_id = %s',
-                            (teacher_id,))
-                return cur.fetchall()
-        except Exception:
-            log.exception("vw_students_experiments_for_teacher failed (teacher_id=%s)", teacher_id)
-            return []
+        return DatabaseManager._read_first("vw_students_experiments_for_teacher", [
+            ("mv_students_experiments",
+             'SELECT * FROM mv_students_experiments WHERE teacher_id = %s ORDER BY participation_date DESC'),
+            ("vw_students_experiments_for_teacher",
+             'SELECT * FROM vw_students_experiments_for_teacher WHERE teacher_id = %s'),
+        ], (teacher_id,))
+
+    @staticmethod
+    def get_matview_status():
+        return matview_refresher.status()
+
+    @staticmethod
+    def refresh_matviews():
+        """Refresh every materialized view now; {name: ok}."""
+        return matview_refresher.refresh_all()
 
     # DB function wrapper + fallback
     @staticmethod
@@ -982,6 +1519,11 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
                 )
                 row = cur.fetchone()
                 return dict(row) if row else None
+        except pg_errors.UndefinedFunction:
+            # функцијата е избришана по детекцијата – од сега SQL патеката
+            _capabilities['create_reaction_and_experiment_fn'] = False
+            log.warning("create_reaction_and_experiment_fn is not installed; using the single-statement SQL path")
+            return None
         except Exception:
             log.exception("create_reaction_and_experiment_dbfn failed")
             return None
@@ -997,22 +1539,78 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
         safety_warning=None,
         equipment_ids=None
     ):
-        # Try DB function first
-        res = DatabaseManager.create_reaction_and_experiment_dbfn(
-            teacher_id, element1_id, element2_id, product, conditions,
-            experiment_result, safety_warning, equipment_ids
-        )
-        if res:
-            return res
-        # Fallback to Python transaction
+        args = (teacher_id, element1_id, element2_id, product, conditions,
+                experiment_result, safety_warning, equipment_ids)
+        res = None
+        # стратегијата се одредува еднаш (детекција на функцијата во базата), без обид-па-fallback
+        if _db_function_available('create_reaction_and_experiment_fn'):
+            res = DatabaseManager.create_reaction_and_experiment_dbfn(*args)
+        if res is None and not _capabilities.get('create_reaction_and_experiment_fn'):
+            res = DatabaseManager._create_reaction_and_experiment_python(*args)
+        if not res or not res.get('reaction_id'):
+            return None
+
+        if 'element1_symbol' in res:
+            reaction_index.upsert({k: res[k] for k in _REACTION_PAIR_COLUMNS})
+        else:
+            DatabaseManager._sync_reaction_index(res['reaction_id'])
+        _touch('reaction', 'experiment', 'experimentlabequipment')
+        return {'reaction_id': res['reaction_id'], 'experiment_id': res.get('experiment_id')}
+
+    @staticmethod
+    def detect_capabilities():
+        """Re-check which optional database functions are installed (cached until the next call)."""
+        _capabilities.clear()
+        return {name: _db_function_available(name) for name in _DB_FUNCTIONS}
+
+    @staticmethod
+    def bulk_import_reactions(text, teacher_id, fmt=None, dry_run=False, strict=False):
+        """Import reactions + experiments + equipment from CSV / JSON lines (utils/bulk_import.py).
+
+        Valid rows are inserted and invalid ones reported per row; with `strict`
+        nothing is inserted if any row is invalid. `dry_run` validates and checks
+        for existing reactions without inserting. None on a database error.
+        """
         try:
-            return DatabaseManager._create_reaction_and_experiment_python(
-                teacher_id, element1_id, element2_id, product, conditions,
-                experiment_result, safety_warning, equipment_ids
-            )
-        except Exception:
-            log.exception("fallback _create_reaction_and_experiment_python failed")
+            records, errors = bulk_import.parse(text, fmt)
+        except bulk_import.BulkImportError as ex:
+            return {'message': str(ex), 'status': ex.status}
+        total = len(records) + len(errors)          # и редовите со невалиден JSON
+        equipment = DatabaseManager.get_all_equipment()
+        if equipment is None:
+            return None
+        try:
+            rows, invalid = bulk_import.validate(records, element_resolver.resolve,
+                                                 {e['equipment_id'] for e in equipment})
+        except LookupError:
+            log.exception("bulk_import_reactions: element list unavailable")
             return None
+        errors += invalid
+
+        result = {'total': total, 'dry_run': dry_run, 'imported': 0, 'created': [], 'errors': errors}
+        if rows:
+            try:
+                with _pooled_conn() as conn, conn:
+                    with conn.cursor() as cur:
+                        conflicts = bulk_import.stage(cur, rows)
+                        errors += conflicts
+                        if dry_run or (strict and errors):
+                            conn.rollback()
+                            if dry_run:
+                                result['imported'] = len(rows) - len(conflicts)
+                        else:
+                            result['created'] = bulk_import.load(cur, teacher_id)
+                            result['imported'] = len(result['created'])
+            except Exception:
+                log.exception("bulk_import_reactions failed")
+                return None
+        errors.sort(key=lambda e: e['row'])
+        if result['created']:
+            reaction_index.invalidate()
+            _touch('reaction', 'experiment', 'experimentlabequipment')
+            log.info("bulk import: %d reactions (teacher=%s, %d rejected)",
+                     result['imported'], teacher_id, len(errors))
+        return result
 
     @staticmethod
     def get_students_experiments_detailed(teacher_id: int):
@@ -1020,49 +1618,253 @@ class DatabaseManager(DatabaseManager):  # extend class with methods
 
     @staticmethod
     def get_user_activity_summary():
+        return DatabaseManager._read_first("get_user_activity_summary", [
+            ("mv_user_activity_summary", 'SELECT * FROM mv_user_activity_summary ORDER BY full_name'),
+            ("vw_user_activity_summary", 'SELECT * FROM vw_user_activity_summary ORDER BY full_name'),
+            ("raw SELECT", _USER_ACTIVITY_SUMMARY_SQL),
+        ])
+
+    @staticmethod
+    def get_reaction_by_element_ids(e1: int, e2: int):
+        try:
+            return reaction_index.lookup(e1, e2)
+        except LookupError:
+            pass
+        # индексот не е достапен → canonical-pair барање (idx_reaction_canonical_pair)
         try:
             with _conn_cur() as cur:
-                cur.execute('SELECT * FROM vw_user_activity_summary ORDER BY full_name')
-                return cur.fetchall()
+                cur.execute(_REACTION_PAIR_SELECT + """
+                    WHERE LEAST(r.element1_id, r.element2_id) = LEAST(%s, %s)
+                      AND GREATEST(r.element1_id, r.element2_id) = GREATEST(%s, %s)
+                    ORDER BY r.reaction_id
+                    LIMIT 1
+                """, (e1, e2, e1, e2))
+                row = cur.fetchone()
+                return dict(row) if row else None
         except Exception:
-            log.exception("get_user_activity_summary view failed; falling back to raw SELECT")
-            try:
-                with _conn_cur() as cur:
-                    cur.execute("""
-                        SELECT 
-                            u.user_id,
-                            (u.user_name || ' ' || u.user_surname) AS full_name,
-                            u.role,
-                            COUNT(DISTINCT uve.element_id)     AS elements_viewed,
-                            COUNT(DISTINCT uvl.equipment_id)   AS equipment_viewed,
-                            COUNT(DISTINCT upe.experiment_id)  AS experiments_participated
-                        FROM "User" u
-                        LEFT JOIN userviewselement           uve ON u.user_id = uve.user_id
-                        LEFT JOIN userviewslabequipment      uvl ON u.user_id = uvl.user_id
-                        LEFT JOIN userparticipatesinexperiment upe ON u.user_id = upe.user_id
-                        GROUP BY u.user_id, full_name, u.role
-                        ORDER BY full_name
-                    """)
-                    return cur.fetchall()
-            except Exception:
-                log.exception("get_user_activity_summary fallback failed")
-                return []
+            log.exception("get_reaction_by_element_ids failed (%s, %s)", e1, e2)
+            return None
 
     @staticmethod
-    def get_reaction_by_element_ids(e1: int, e2: int):
+    def get_reaction_by_symbols(sym1: str, sym2: str):
+        try:
+            return reaction_index.lookup_symbols(sym1, sym2)
+        except LookupError:
+            pass
+        s1, s2 = _norm_symbol(sym1), _norm_symbol(sym2)
         try:
             with _conn_cur() as cur:
-                cur.execute("""
-                    SELECT r.reaction_id, r.product, r.conditions
-                    FROM reaction r
-                    WHERE (r.element1_id = %s AND r.element2_id = %s)
-                    OR (r.element1_id = %s AND r.element2_id = %s)
+                cur.execute(_REACTION_PAIR_SELECT + """
+                    WHERE (UPPER(e1.symbol) = %s AND UPPER(e2.symbol) = %s)
+                       OR (UPPER(e1.symbol) = %s AND UPPER(e2.symbol) = %s)
+                    ORDER BY r.reaction_id
                     LIMIT 1
-                """, (e1, e2, e2, e1))
+                """, (s1, s2, s2, s1))
                 row = cur.fetchone()
                 return dict(row) if row else None
         except Exception:
-            log.exception("get_reaction_by_element_ids failed (%s, %s)", e1, e2)
+            log.exception("get_reaction_by_symbols failed (%s, %s)", sym1, sym2)
+            return None
+
+    @staticmethod
+    def resolve_element_id(value):
+        """element_id for an id, symbol or (Cyrillic/Latin) name; None if unknown."""
+        try:
+            return element_resolver.resolve(value)
+        except LookupError:
+            pass
+        if value is None or str(value).strip() == "":
+            return None
+        # cold path: idx_elements_upper_symbol / idx_elements_upper_name
+        try:
+            with _conn_cur() as cur:
+                v = str(value).strip()
+                if v.isdigit():
+                    cur.execute('SELECT element_id FROM elements WHERE element_id = %s', (int(v),))
+                    row = cur.fetchone()
+                    if row:
+                        return row['element_id']
+                cur.execute('''
+                    SELECT element_id FROM elements WHERE UPPER(symbol) = UPPER(%s)
+                    UNION ALL
+                    SELECT element_id FROM elements WHERE UPPER(element_name) = UPPER(%s)
+                    LIMIT 1
+                ''', (v, v))
+                row = cur.fetchone()
+                return row['element_id'] if row else None
+        except Exception:
+            log.exception("resolve_element_id failed (%s)", value)
+            return None
+
+    @staticmethod
+    def _resolve_reaction_pair_cached(v1, v2, with_experiment):
+        """In-memory variant of resolve_reaction_pair; raises LookupError when a structure is unavailable."""
+        e1 = element_resolver.resolve(v1) or _numeric_id(v1)
+        e2 = element_resolver.resolve(v2) or _numeric_id(v2)
+        if not e1 or not e2:
+            return None
+        el1, el2 = element_resolver.element(e1) or {}, element_resolver.element(e2) or {}
+        rx = reaction_index.lookup(e1, e2)
+        res = {
+            'element1_id': e1, 'element1_symbol': el1.get('symbol'), 'element1_name': el1.get('element_name'),
+            'element1_atomic_number': el1.get('atomic_number'), 'element1_hazard_type': el1.get('hazard_type'),
+            'element2_id': e2, 'element2_symbol': el2.get('symbol'), 'element2_name': el2.get('element_name'),
+            'element2_atomic_number': el2.get('atomic_number'), 'element2_hazard_type': el2.get('hazard_type'),
+            'reaction_id': None, 'product': None, 'conditions': None,
+            'reaction_element1_name': None, 'reaction_element2_name': None,
+            'experiment_id': None,
+        }
+        if rx:
+            res.update(
+                reaction_id=rx['reaction_id'], product=rx['product'], conditions=rx['conditions'],
+                reaction_element1_name=rx['element1_name'], reaction_element2_name=rx['element2_name'],
+            )
+            if with_experiment:
+                exp = DatabaseManager.get_experiment_by_reaction(rx['reaction_id'])
+                res['experiment_id'] = exp['experiment_id'] if exp else None
+        return res
+
+    @staticmethod
+    def resolve_reaction_pair(v1, v2, with_experiment=True):
+        """Elements (by id, symbol or name) + reaction + latest experiment.
+
+        Served from the element resolver and reaction index (a single query for
+        the latest experiment, none at all with with_experiment=False); when those
+        are unavailable, everything is resolved in ONE query.
+
+        A positive numeric id is accepted even when no such element exists (no
+        reaction is found for it), as the original /api/check-reaction did.
+        Returns None when either element cannot be resolved; otherwise a dict with
+        element1_*/element2_* (input order: id, symbol, name, atomic_number,
+        hazard_type), reaction_id/product/conditions
+        (None when no reaction), reaction_element{1,2}_name (reaction order)
+        and experiment_id of the most recent experiment for the reaction.
+        """
+        if v1 in (None, "") or v2 in (None, ""):
+            return None
+        try:
+            return DatabaseManager._resolve_reaction_pair_cached(v1, v2, with_experiment)
+        except LookupError:
+            pass
+        try:
+            with _conn_cur() as cur:
+                cur.execute("""
+                    WITH input(pos, v) AS (VALUES (1, %s::text), (2, %s::text)),
+                    el AS (
+                        SELECT i.pos,
+                               COALESCE(x.element_id, NULLIF(CASE WHEN btrim(i.v) ~ '^[0-9]{1,9}$'
+                                                                  THEN btrim(i.v)::int END, 0)) AS element_id,
+                               x.symbol, x.element_name, x.atomic_number, x.hazard_type
+                        FROM input i
+                        LEFT JOIN LATERAL (
+                            SELECT e.element_id, e.symbol, e.element_name, e.atomic_number, e.hazard_type
+                            FROM elements e
+                            WHERE e.element_id = CASE WHEN btrim(i.v) ~ '^[0-9]{1,9}$'
+                                                      THEN btrim(i.v)::int END
+                               OR UPPER(e.symbol) = UPPER(btrim(i.v))
+                               OR UPPER(e.element_name) = UPPER(btrim(i.v))
+                            ORDER BY (e.element_id::text = btrim(i.v)) DESC,
+                                     (UPPER(e.symbol) = UPPER(btrim(i.v))) DESC,
+                                     e.element_id
+                            LIMIT 1
+                        ) x ON TRUE
+                    )
+                    SELECT a.element_id   AS element1_id,
+                           a.symbol       AS element1_symbol,
+                           a.element_name AS element1_name,
+                           a.atomic_number AS element1_atomic_number,
+                           a.hazard_type  AS element1_hazard_type,
+                           b.element_id   AS element2_id,
+                           b.symbol       AS element2_symbol,
+                           b.element_name AS element2_name,
+                           b.atomic_number AS element2_atomic_number,
+                           b.hazard_type  AS element2_hazard_type,
+                           r.reaction_id, r.product, r.conditions,
+                           CASE WHEN r.element1_id = a.element_id THEN a.element_name ELSE b.element_name END
+                               AS reaction_element1_name,
+                           CASE WHEN r.element1_id = a.element_id THEN b.element_name ELSE a.element_name END
+                               AS reaction_element2_name,
+                           x.experiment_id
+                    FROM el a
+                    JOIN el b ON a.pos = 1 AND b.pos = 2
+                               AND a.element_id IS NOT NULL AND b.element_id IS NOT NULL
+                    LEFT JOIN LATERAL (
+                        SELECT rr.reaction_id, rr.element1_id, rr.product, rr.conditions
+                        FROM reaction rr
+                        WHERE LEAST(rr.element1_id, rr.element2_id) = LEAST(a.element_id, b.element_id)
+                          AND GREATEST(rr.element1_id, rr.element2_id) = GREATEST(a.element_id, b.element_id)
+                        ORDER BY rr.reaction_id
+                        LIMIT 1
+                    ) r ON TRUE
+                    LEFT JOIN LATERAL (
+                        SELECT ex.experiment_id
+                        FROM experiment ex
+                        WHERE ex.reaction_id = r.reaction_id
+                        ORDER BY ex.time_stamp DESC
+                        LIMIT 1
+                    ) x ON TRUE
+                """, (str(v1), str(v2)))
+                row = cur.fetchone()
+                return dict(row) if row else None
+        except Exception:
+            log.exception("resolve_reaction_pair failed (%s, %s)", v1, v2)
+            return None
+
+    @staticmethod
+    def _pair_details_cached(distinct):
+        """In-memory variant of get_pair_details; raises LookupError when a structure is unavailable."""
+        out = {}
+        for a, b in distinct:
+            row = {'element1_id': a, 'element2_id': b, 'reaction_id': None, 'product': None, 'conditions': None}
+            for prefix, eid in (('e1', a), ('e2', b)):
+                el = element_resolver.element(eid) or {}
+                row.update({prefix + '_symbol': el.get('symbol'), prefix + '_name': el.get('element_name'),
+                            prefix + '_atomic_number': el.get('atomic_number'),
+                            prefix + '_hazard_type': el.get('hazard_type')})
+            rx = reaction_index.lookup(a, b)
+            if rx:
+                row.update(reaction_id=rx['reaction_id'], product=rx['product'], conditions=rx['conditions'])
+            out[(a, b)] = row
+        return out
+
+    @staticmethod
+    def get_pair_details(pairs):
+        """Both elements + reaction for many (element1_id, element2_id) pairs in ONE query.
+
+        Returns {(e1, e2): row} for the distinct input pairs; e*_ columns are None
+        for unknown elements and reaction columns are None when no reaction exists.
+        """
+        distinct = sorted({(int(a), int(b)) for a, b in (pairs or [])})
+        if not distinct:
+            return {}
+        try:
+            return DatabaseManager._pair_details_cached(distinct)
+        except LookupError:
+            pass
+        try:
+            with _conn_cur() as cur:
+                cur.execute("""
+                    SELECT p.a AS element1_id, p.b AS element2_id,
+                           ea.symbol AS e1_symbol, ea.element_name AS e1_name,
+                           ea.atomic_number AS e1_atomic_number, ea.hazard_type AS e1_hazard_type,
+                           eb.symbol AS e2_symbol, eb.element_name AS e2_name,
+                           eb.atomic_number AS e2_atomic_number, eb.hazard_type AS e2_hazard_type,
+                           r.reaction_id, r.product, r.conditions
+                    FROM unnest(%s::int[], %s::int[]) AS p(a, b)
+                    LEFT JOIN elements ea ON ea.element_id = p.a
+                    LEFT JOIN elements eb ON eb.element_id = p.b
+                    LEFT JOIN LATERAL (
+                        SELECT rr.reaction_id, rr.product, rr.conditions
+                        FROM reaction rr
+                        WHERE LEAST(rr.element1_id, rr.element2_id) = LEAST(p.a, p.b)
+                          AND GREATEST(rr.element1_id, rr.element2_id) = GREATEST(p.a, p.b)
+                        ORDER BY rr.reaction_id
+                        LIMIT 1
+                    ) r ON TRUE
+                """, ([a for a, _ in distinct], [b for _, b in distinct]))
+                return {(row['element1_id'], row['element2_id']): dict(row) for row in cur.fetchall()}
+        except Exception:
+            log.exception("get_pair_details failed (%d pairs)", len(distinct))
             return None
 
     @staticmethod
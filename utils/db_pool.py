@@ -0,0 +1,226 @@
+# db_pool.py
+import os, time, logging, threading
+from contextlib import contextmanager
+import psycopg2
+from psycopg2 import extensions as pg_ext
+
+log = logging.getLogger("simlab.db.pool")
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    """Raised when no connection becomes available within the checkout timeout."""
+
+
+class ConnectionPool:
+    """Thread-safe PostgreSQL connection pool.
+
+    - `minconn` connections are opened eagerly, up to `maxconn` on demand
+    - idle connections are pinged (SELECT 1) on checkout after `health_check_idle` seconds
+    - connections older than `max_lifetime` seconds are closed and replaced
+    - callers block up to `timeout` seconds when the pool is exhausted
+    """
+
+    def __init__(self, factory, minconn=1, maxconn=10, max_lifetime=1800.0,
+                 health_check_idle=30.0, timeout=10.0):
+        if minconn < 0 or maxconn < 1 or minconn > maxconn:
+            raise ValueError("invalid pool size (min=%s, max=%s)" % (minconn, maxconn))
+        self._factory = factory
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.max_lifetime = max_lifetime
+        self.health_check_idle = health_check_idle
+        self.timeout = timeout
+
+        self._cond = threading.Condition(threading.Lock())
+        self._idle = []          # [(conn, returned_at)] – LIFO, топлите конекции први
+        self._meta = {}          # id(conn) -> {'created_at', 'info'}
+        self._in_use = 0
+        self._opening = 0
+        self._closed = False
+        self._stats = {
+            'checkouts': 0, 'waits': 0, 'timeouts': 0,
+            'wait_ms_total': 0.0, 'wait_ms_max': 0.0,
+            'created': 0, 'recycled': 0, 'discarded': 0, 'failed_checks': 0,
+            'in_use_peak': 0,
+        }
+
+        for _ in range(minconn):
+            try:
+                self._idle.append((self._open(), time.monotonic()))
+            except Exception:
+                log.exception("pool prefill failed")
+                break
+
+    # ---------- internals ----------
+    def _open(self):
+        conn = self._factory()
+        self._meta[id(conn)] = {'created_at': time.monotonic(), 'info': {}}
+        with self._cond:
+            self._stats['created'] += 1
+        return conn
+
+    def _close(self, conn):
+        self._meta.pop(id(conn), None)
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _size(self):
+        return len(self._idle) + self._in_use + self._opening
+
+    def _expired(self, conn):
+        meta = self._meta.get(id(conn))
+        return (self.max_lifetime and meta is not None
+                and time.monotonic() - meta['created_at'] > self.max_lifetime)
+
+    def _healthy(self, conn, idle_for):
+        if conn.closed:
+            return False
+        if conn.info.transaction_status != pg_ext.TRANSACTION_STATUS_IDLE:
+            return False
+        if self.health_check_idle is not None and idle_for >= self.health_check_idle:
+            try:
+                with conn.cursor() as cur:
+                    cur.execute("SELECT 1")
+                conn.rollback()
+            except Exception:
+                return False
+        return True
+
+    # ---------- public API ----------
+    def getconn(self):
+        started = time.monotonic()
+        deadline = started + self.timeout if self.timeout else None
+        waited = False
+        while True:
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise psycopg2.InterfaceError("connection pool is closed")
+                    if self._idle:
+                        conn, returned_at = self._idle.pop()
+                        self._in_use += 1
+                        reuse = True
+                        break
+                    if self._size() < self.maxconn:
+                        self._opening += 1
+                        reuse = False
+                        break
+                    remaining = None if deadline is None else deadline - time.monotonic()
+                    if remaining is not None and remaining <= 0:
+                        self._stats['timeouts'] += 1
+                        raise PoolTimeout("no free connection after %.1fs (max=%s)"
+                                          % (self.timeout, self.maxconn))
+                    waited = True
+                    self._cond.wait(remaining)
+
+            if not reuse:
+                try:
+                    conn = self._open()
+                except Exception:
+                    with self._cond:
+                        self._opening -= 1
+                        self._cond.notify()
+                    raise
+                with self._cond:
+                    self._opening -= 1
+                    self._in_use += 1
+                break
+
+            # проверки надвор од lock-от (SELECT 1 е мрежен повик)
+            if self._expired(conn):
+                self._discard_checked_out(conn, 'recycled')
+                continue
+            if not self._healthy(conn, time.monotonic() - returned_at):
+                log.warning("pool: dropping unhealthy connection")
+                self._discard_checked_out(conn, 'failed_checks')
+                continue
+            break
+
+        wait_ms = (time.monotonic() - started) * 1000.0
+        with self._cond:
+            s = self._stats
+            s['checkouts'] += 1
+            if waited:
+                s['waits'] += 1
+            s['wait_ms_total'] += wait_ms
+            s['wait_ms_max'] = max(s['wait_ms_max'], wait_ms)
+            s['in_use_peak'] = max(s['in_use_peak'], self._in_use)
+        return conn
+
+    def _discard_checked_out(self, conn, counter):
+        self._close(conn)
+        with self._cond:
+            self._in_use -= 1
+            self._stats[counter] += 1
+            self._cond.notify()
+
+    def putconn(self, conn, discard=False):
+        """Return a connection; broken, busy or expired connections are closed instead."""
+        if not discard and not conn.closed:
+            status = conn.info.transaction_status
+            if status != pg_ext.TRANSACTION_STATUS_IDLE:
+                try:
+                    conn.rollback()
+                except Exception:
+                    discard = True
+        discard = discard or conn.closed or self._closed or self._expired(conn)
+
+        if discard:
+            self._close(conn)
+        with self._cond:
+            self._in_use -= 1
+            if discard:
+                self._stats['discarded'] += 1
+            else:
+                self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self):
+        conn = self.getconn()
+        broken = False
+        try:
+            yield conn
+        except (psycopg2.OperationalError, psycopg2.InterfaceError):
+            broken = True
+            raise
+        finally:
+            self.putconn(conn, discard=broken)
+
+    def conn_info(self, conn):
+        """Per-connection scratch dict that lives as long as the physical connection."""
+        meta = self._meta.get(id(conn))
+        return meta['info'] if meta is not None else {}
+
+    def stats(self):
+        with self._cond:
+            s = dict(self._stats)
+            s.update(
+                size=self._size(), idle=len(self._idle), in_use=self._in_use,
+                min=self.minconn, max=self.maxconn,
+                wait_ms_avg=round(s['wait_ms_total'] / s['checkouts'], 3) if s['checkouts'] else 0.0,
+            )
+        s['wait_ms_total'] = round(s['wait_ms_total'], 3)
+        s['wait_ms_max'] = round(s['wait_ms_max'], 3)
+        s['occupancy'] = round(s['in_use'] / s['max'], 3)
+        return s
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._cond.notify_all()
+        for conn, _ in idle:
+            self._close(conn)
+
+
+def pool_settings_from_env():
+    return {
+        'minconn': int(os.getenv('DB_POOL_MIN', '1')),
+        'maxconn': int(os.getenv('DB_POOL_MAX', '10')),
+        'max_lifetime': float(os.getenv('DB_POOL_MAX_LIFETIME', '1800')),
+        'health_check_idle': float(os.getenv('DB_POOL_HEALTH_CHECK_IDLE', '30')),
+        'timeout': float(os.getenv('DB_POOL_TIMEOUT', '10')),
+    }
@@ -0,0 +1,77 @@
+# element_resolver.py
+import logging, threading
+
+log = logging.getLogger("simlab.elements")
+
+# Македонска кирилица → латиница (ASCII и варијанта со дијакритици)
+_MK_TO_LATIN = {
+    'а': 'a', 'б': 'b', 'в': 'v', 'г': 'g', 'д': 'd', 'ѓ': 'gj', 'е': 'e', 'ж': 'zh',
+    'з': 'z', 'ѕ': 'dz', 'и': 'i', 'ј': 'j', 'к': 'k', 'л': 'l', 'љ': 'lj', 'м': 'm',
+    'н': 'n', 'њ': 'nj', 'о': 'o', 'п': 'p', 'р': 'r', 'с': 's', 'т': 't', 'ќ': 'kj',
+    'у': 'u', 'ф': 'f', 'х': 'h', 'ц': 'c', 'ч': 'ch', 'џ': 'dzh', 'ш': 'sh',
+}
+_MK_TO_LATIN_DIACRITIC = dict(_MK_TO_LATIN, **{
+    'ѓ': 'ǵ', 'ж': 'ž', 'ѕ': 'dz', 'ќ': 'ḱ', 'ч': 'č', 'џ': 'dž', 'ш': 'š',
+})
+
+
+def _key(value):
+    return str(value).strip().casefold()
+
+
+def transliterate(text, table=_MK_TO_LATIN):
+    return ''.join(table.get(ch, ch) for ch in text.casefold())
+
+
+class ElementResolver:
+    """Case-insensitive map from element id / symbol / name (Cyrillic or Latin) to element_id.
+
+    `source` returns the cached element list; the map is rebuilt whenever that
+    list object changes, i.e. after a cache reload or an element write.
+    """
+
+    def __init__(self, source):
+        self._source = source
+        self._lock = threading.Lock()
+        self._built_from = None
+        self._by_key = {}
+        self._by_id = {}
+
+    def _current(self):
+        rows = self._source()
+        if rows is None:
+            raise LookupError("element list unavailable")
+        if rows is not self._built_from:
+            with self._lock:
+                if rows is not self._built_from:
+                    self._rebuild(rows)
+        return self._by_key, self._by_id
+
+    def _rebuild(self, rows):
+        by_key, by_id, names = {}, {}, {}
+        for row in rows:
+            eid = row['element_id']
+            by_id[eid] = row
+            by_key[str(eid)] = eid
+            if row.get('symbol'):
+                by_key[_key(row['symbol'])] = eid      # симболот има предност пред името
+            name = (row.get('element_name') or '').strip()
+            if name:
+                for variant in (name, transliterate(name), transliterate(name, _MK_TO_LATIN_DIACRITIC)):
+                    names.setdefault(_key(variant), eid)
+        for k, eid in names.items():
+            by_key.setdefault(k, eid)
+        self._by_key, self._by_id = by_key, by_id
+        self._built_from = rows
+        log.debug("element resolver rebuilt (%d elements, %d keys)", len(by_id), len(by_key))
+
+    def resolve(self, value):
+        """element_id for an id, symbol or name; None if unknown. Raises LookupError if unavailable."""
+        if value is None or (isinstance(value, str) and not value.strip()):
+            return None
+        by_key, _ = self._current()
+        return by_key.get(_key(value))
+
+    def element(self, element_id):
+        _, by_id = self._current()
+        return by_id.get(element_id)
@@ -0,0 +1,134 @@
+# hash_executor.py
+"""Process pool for CPU-bound password hashing.
+
+Key derivation runs in worker processes so concurrent logins use every core
+instead of queueing on the request threads. At most `max_pending` jobs may be
+in flight (running or queued); beyond that callers wait up to
+`acquire_timeout` seconds and then get HashQueueFull, which the routes turn
+into a "try again" response instead of an ever-growing backlog.
+"""
+import os, time, atexit, logging, threading, multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+log = logging.getLogger("simlab.auth.hashing")
+
+
+class HashQueueFull(RuntimeError):
+    """Too many hashing jobs are already in flight."""
+
+
+def _timed(fn, args):
+    # се извршува во процесот-работник: (кога почнал, резултат)
+    return time.time(), fn(*args)
+
+
+class HashExecutor:
+    def __init__(self, workers=2, max_pending=64, acquire_timeout=5.0, start_method='spawn'):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.acquire_timeout = acquire_timeout
+        self.start_method = start_method
+        self._slots = threading.BoundedSemaphore(max_pending)
+        self._lock = threading.Lock()
+        self._executor = None
+        self._pid = None
+        self._in_flight = 0
+        self._stats = {'submitted': 0, 'completed': 0, 'failed': 0, 'rejected': 0, 'inline': 0,
+                       'pool_restarts': 0, 'peak_in_flight': 0,
+                       'wait_ms_total': 0.0, 'wait_ms_max': 0.0, 'run_ms_total': 0.0, 'run_ms_max': 0.0}
+
+    def _pool(self):
+        # по fork (gunicorn worker) наследениот executor не е употреблив
+        with self._lock:
+            if self._executor is None or self._pid != os.getpid():
+                self._executor = ProcessPoolExecutor(
+                    max_workers=self.workers, mp_context=multiprocessing.get_context(self.start_method))
+                self._pid = os.getpid()
+            return self._executor
+
+    def _reset_pool(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+            self._stats['pool_restarts'] += 1
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+
+    def run(self, fn, *args):
+        """fn(*args) in a worker process (inline when workers == 0); blocks for the result.
+
+        `fn` must be a module-level function so it can be pickled.
+        """
+        if not self._slots.acquire(timeout=self.acquire_timeout):
+            with self._lock:
+                self._stats['rejected'] += 1
+            raise HashQueueFull("password hashing queue is full (%d in flight)" % self.max_pending)
+        submitted = time.time()
+        with self._lock:
+            self._in_flight += 1
+            self._stats['submitted'] += 1
+            self._stats['peak_in_flight'] = max(self._stats['peak_in_flight'], self._in_flight)
+        ok = False
+        try:
+            started, result = self._execute(fn, args, submitted)
+            ok = True
+            return result
+        finally:
+            finished = time.time()
+            self._slots.release()
+            with self._lock:
+                s = self._stats
+                self._in_flight -= 1
+                if ok:
+                    wait_ms = max(0.0, (started - submitted) * 1000.0)
+                    run_ms = (finished - started) * 1000.0
+                    s['completed'] += 1
+                    s['wait_ms_total'] += wait_ms
+                    s['wait_ms_max'] = max(s['wait_ms_max'], wait_ms)
+                    s['run_ms_total'] += run_ms
+                    s['run_ms_max'] = max(s['run_ms_max'], run_ms)
+                else:
+                    s['failed'] += 1
+
+    def _execute(self, fn, args, submitted):
+        if self.workers > 0:
+            try:
+                return self._pool().submit(_timed, fn, args).result()
+            except BrokenProcessPool:
+                log.exception("hashing pool broke; falling back to inline hashing for this call")
+                self._reset_pool()
+        with self._lock:
+            self._stats['inline'] += 1
+        return time.time(), fn(*args)
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+            in_flight = self._in_flight
+        done = s['completed']
+        s.update(
+            workers=self.workers, max_pending=self.max_pending, in_flight=in_flight,
+            queued=max(0, in_flight - self.workers) if self.workers else 0,
+            wait_ms_avg=round(s['wait_ms_total'] / done, 3) if done else 0.0,
+            run_ms_avg=round(s['run_ms_total'] / done, 3) if done else 0.0,
+        )
+        return s
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None and self._pid == os.getpid():
+            executor.shutdown(wait=False, cancel_futures=True)
+
+
+def settings_from_env():
+    return {
+        'workers': int(os.getenv('PASSWORD_HASH_WORKERS', str(min(4, os.cpu_count() or 1)))),
+        'max_pending': int(os.getenv('PASSWORD_HASH_MAX_PENDING', '64')),
+        'acquire_timeout': float(os.getenv('PASSWORD_HASH_QUEUE_TIMEOUT', '5')),
+        'start_method': os.getenv('PASSWORD_HASH_START_METHOD', 'spawn'),
+    }
+
+
+hash_executor = HashExecutor(**settings_from_env())
+atexit.register(hash_executor.shutdown)
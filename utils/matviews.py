@@ -0,0 +1,163 @@
+# matviews.py
+"""Background refresh of the materialized views behind the activity reports.
+
+Views are refreshed CONCURRENTLY (readers are never blocked) in two cases:
+shortly after a write to one of their base tables (debounced, so a burst of
+writes costs one refresh) and on a fixed schedule as a safety net for writes
+that bypass DatabaseManager. Writes to SCHEDULED_ONLY tables (the view
+tracking log, written every few seconds while anyone browses) do not trigger
+a refresh; views reading them catch up on the schedule. A transaction-level advisory lock keeps several
+app workers from refreshing the same view at the same time.
+"""
+import os, time, logging, datetime, threading
+
+log = logging.getLogger("simlab.matviews")
+
+# materialized view -> табели од кои се пресметува (дефинициите се во utils/migrations.py)
+MATVIEWS = {
+    'mv_user_activity_summary': ('User', 'userviewselement', 'userviewslabequipment',
+                                 'userparticipatesinexperiment'),
+    'mv_students_experiments': ('User', 'student', 'experiment', 'reaction', 'elements',
+                                'userparticipatesinexperiment'),
+}
+
+# уписи во овие табели не го означуваат view-то како застарено – се освежува само периодично
+SCHEDULED_ONLY = ('userviewselement', 'userviewslabequipment')
+
+
+class MatviewRefresher:
+    def __init__(self, conn_cur, views, interval=300.0, debounce=5.0, on_refresh=None, scheduled_only=()):
+        self._conn_cur = conn_cur
+        self.views = dict(views)
+        self.scheduled_only = frozenset(scheduled_only)
+        self.interval = interval
+        self.debounce = debounce
+        self._on_refresh = on_refresh
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self._started_at = time.monotonic()
+        self._status = {name: {'dirty_since': None, 'last_attempt': None, 'last_refresh_at': None,
+                               'last_duration_ms': None, 'last_error': None, 'concurrent': None,
+                               'refreshes': 0, 'skipped': 0, 'failures': 0}
+                        for name in self.views}
+
+    def ensure_started(self):
+        # нишката се стартува при прва употреба (по fork-от на worker-от)
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name="simlab-matview-refresh", daemon=True)
+                self._thread.start()
+
+    def mark_dirty(self, *tables, start=True):
+        """Schedule a refresh of every view that depends on one of `tables` (SCHEDULED_ONLY ones are ignored).
+
+        With start=False the views are only marked (used at interpreter shutdown,
+        when no new thread may be started).
+        """
+        touched = set(tables) - self.scheduled_only
+        if not touched:
+            return
+        now = time.monotonic()
+        hit = False
+        with self._lock:
+            for name, deps in self.views.items():
+                if touched.intersection(deps):
+                    st = self._status[name]
+                    if st['dirty_since'] is None:
+                        st['dirty_since'] = now
+                    hit = True
+        if hit and start:
+            self.ensure_started()
+            self._wake.set()
+
+    def refresh(self, name):
+        """Refresh one view now; False when it failed or another worker holds the lock."""
+        if name not in self.views:
+            raise KeyError(name)
+        with self._lock:
+            st = self._status[name]
+            st['dirty_since'] = None       # уписи за време на refresh-от повторно го означуваат
+            st['last_attempt'] = time.monotonic()
+        started = time.monotonic()
+        try:
+            with self._conn_cur() as cur:
+                cur.execute("SELECT pg_try_advisory_xact_lock(hashtext(%s)) AS locked", (name,))
+                if not cur.fetchone()['locked']:
+                    with self._lock:
+                        st['skipped'] += 1
+                    return False
+                cur.execute("SELECT ispopulated FROM pg_matviews WHERE matviewname = %s", (name,))
+                row = cur.fetchone()
+                if row is None:
+                    raise LookupError("materialized view %s does not exist (run python -m utils.migrations)" % name)
+                # CONCURRENTLY бара веќе пополнет view
+                concurrent = bool(row['ispopulated'])
+                cur.execute("REFRESH MATERIALIZED VIEW %s%s" % ("CONCURRENTLY " if concurrent else "", name))
+        except Exception as ex:
+            log.exception("refresh of %s failed", name)
+            with self._lock:
+                st['failures'] += 1
+                st['last_error'] = str(ex).strip()
+            return False
+        with self._lock:
+            st['refreshes'] += 1
+            st['concurrent'] = concurrent
+            st['last_error'] = None
+            st['last_refresh_at'] = datetime.datetime.now()
+            st['last_duration_ms'] = round((time.monotonic() - started) * 1000.0, 3)
+        if self._on_refresh is not None:
+            self._on_refresh(name)
+        return True
+
+    def refresh_all(self):
+        return {name: self.refresh(name) for name in self.views}
+
+    # ---------- worker ----------
+    def _due(self, now):
+        """(views to refresh now, seconds until the next one is due)."""
+        due, wait = [], self.interval or 60.0
+        with self._lock:
+            for name, st in self._status.items():
+                if st['dirty_since'] is not None:
+                    left = st['dirty_since'] + self.debounce - now
+                elif self.interval:
+                    left = (st['last_attempt'] or self._started_at) + self.interval - now
+                else:
+                    continue
+                if left <= 0:
+                    due.append(name)
+                else:
+                    wait = min(wait, left)
+        return due, wait
+
+    def _run(self):
+        while True:
+            due, wait = self._due(time.monotonic())
+            for name in due:
+                self.refresh(name)
+            if not due:
+                self._wake.wait(wait)
+                self._wake.clear()
+
+    def status(self):
+        with self._lock:
+            views = {name: dict(st) for name, st in self._status.items()}
+        now = time.monotonic()
+        for st in views.values():
+            st['dirty'] = st.pop('dirty_since') is not None
+            last = st.pop('last_attempt')
+            st['seconds_since_attempt'] = round(now - last, 1) if last is not None else None
+            if st['last_refresh_at'] is not None:
+                st['last_refresh_at'] = st['last_refresh_at'].isoformat(timespec='seconds')
+        return {'interval': self.interval, 'debounce': self.debounce,
+                'running': bool(self._thread and self._thread.is_alive()), 'views': views}
+
+
+def settings_from_env():
+    return {
+        'interval': float(os.getenv('MATVIEW_REFRESH_SEC', '300')),
+        'debounce': float(os.getenv('MATVIEW_REFRESH_DEBOUNCE_SEC', '5')),
+    }
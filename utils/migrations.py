@@ -0,0 +1,583 @@
+# migrations.py
+"""Versioned schema migrations and the index set the hot queries rely on.
+
+Migrations run in order and are recorded in `schema_migrations`; a
+session advisory lock keeps concurrently starting workers from applying
+the same version twice. Required indexes are declared as access paths
+(table + leading key columns), so `verify` also accepts equivalent indexes
+created by hand under another name, and index migrations skip creating a
+duplicate when one already exists.
+
+    python -m utils.migrations [migrate]   # apply pending migrations (also run by `python app.py`)
+    python -m utils.migrations status      # applied / pending versions
+    python -m utils.migrations verify      # exit 1 when a required index is missing
+"""
+import sys, time, hashlib, logging
+
+log = logging.getLogger("simlab.migrations")
+
+_LOCK_KEY = 5_736_201     # pg_advisory_lock за миграциите (произволен, фиксен)
+
+_BOOKKEEPING = """
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version     INT PRIMARY KEY,
+        name        TEXT NOT NULL,
+        checksum    TEXT NOT NULL,
+        applied_at  TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP,
+        duration_ms NUMERIC
+    )
+"""
+
+
+class Index:
+    """A required access path on `table`.
+
+    `columns` are the leading key columns (optionally with DESC); any valid
+    index that starts with them satisfies the path. Expression indexes
+    (`expr`) can only be recognised by `name`.
+    """
+
+    def __init__(self, name, table, columns=(), expr=None, include=(), unique=False):
+        self.name = name
+        self.table = table
+        self.columns = tuple(columns)
+        self.expr = expr
+        self.include = tuple(include)
+        self.unique = unique
+
+    @property
+    def key_columns(self):
+        return [c.split()[0] for c in self.columns]
+
+    def ddl(self, concurrently):
+        keys = self.expr or ", ".join(self.columns)
+        table = '"%s"' % self.table if self.table != self.table.lower() else self.table
+        sql = "CREATE %sINDEX %sIF NOT EXISTS %s ON %s (%s)" % (
+            "UNIQUE " if self.unique else "", "CONCURRENTLY " if concurrently else "", self.name, table, keys)
+        if self.include:
+            sql += " INCLUDE (%s)" % ", ".join(self.include)
+        return sql
+
+    def satisfied_by(self, existing):
+        """`existing`: rows of _EXISTING_INDEXES_SQL for all tables."""
+        for ix in existing:
+            if ix['table_name'] != self.table or not ix['is_valid']:
+                continue
+            if self.expr:
+                if ix['index_name'] == self.name:
+                    return ix['index_name']
+            elif list(ix['columns'][:len(self.columns)]) == self.key_columns and (ix['is_unique'] or not self.unique):
+                return ix['index_name']
+        return None
+
+
+class Migration:
+    """`steps` are (name, sql) pairs or Index objects. Non-transactional migrations
+    run each step in autocommit mode, which lets indexes be built CONCURRENTLY."""
+
+    def __init__(self, version, name, steps, transactional=True):
+        self.version = version
+        self.name = name
+        self.steps = list(steps)
+        self.transactional = transactional
+
+    @property
+    def checksum(self):
+        h = hashlib.sha1()
+        for step in self.steps:
+            h.update((step.ddl(False) if isinstance(step, Index) else step[1]).encode())
+        return h.hexdigest()
+
+
+MIGRATIONS = [
+    Migration(1, "reaction_and_element_lookup", [
+        # неподредена двојка елементи → еден index seek наместо (a,b) OR (b,a)
+        Index("idx_reaction_canonical_pair", "reaction",
+              expr="LEAST(element1_id, element2_id), GREATEST(element1_id, element2_id)"),
+        # cold path за resolve_element_id (симбол/име без разлика на големи букви)
+        Index("idx_elements_upper_symbol", "elements", expr="UPPER(symbol)"),
+        Index("idx_elements_upper_name", "elements", expr="UPPER(element_name)"),
+    ], transactional=False),
+
+    # ---------- бројачи за dashboard-от на професорот ----------
+    Migration(2, "teacher_dashboard_stats", [
+        # Редовите ги ажурираат тригерите; нов професор добива ред при првото читање
+        # (DatabaseManager.get_teacher_dashboard_statistics), затоа тригерите само UPDATE-ираат.
+        ("teacher_dashboard_stats", """
+            CREATE TABLE IF NOT EXISTS teacher_dashboard_stats (
+                teacher_id       INT PRIMARY KEY REFERENCES teacher(teacher_id) ON DELETE CASCADE,
+                student_count    INT NOT NULL DEFAULT 0,
+                reaction_count   INT NOT NULL DEFAULT 0,
+                experiment_count INT NOT NULL DEFAULT 0,
+                activity_date    DATE NOT NULL DEFAULT CURRENT_DATE,
+                activity_count   INT NOT NULL DEFAULT 0,
+                updated_at       TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """),
+        ("fn_tds_bump", """
+            CREATE OR REPLACE FUNCTION tds_bump(p_teacher INT, p_col TEXT, p_delta INT)
+            RETURNS void LANGUAGE plpgsql AS $$
+            BEGIN
+                IF p_teacher IS NULL THEN RETURN; END IF;
+                EXECUTE format(
+                    'UPDATE teacher_dashboard_stats SET %1$I = GREATEST(%1$I + $1, 0), updated_at = CURRENT_TIMESTAMP '
+                    'WHERE teacher_id = $2', p_col)
+                USING p_delta, p_teacher;
+            END $$
+        """),
+        ("fn_tds_bump_activity", """
+            CREATE OR REPLACE FUNCTION tds_bump_activity(p_student INT, p_day DATE, p_delta INT)
+            RETURNS void LANGUAGE plpgsql AS $$
+            BEGIN
+                UPDATE teacher_dashboard_stats t
+                   SET activity_count = CASE WHEN t.activity_date = p_day
+                                             THEN GREATEST(t.activity_count + p_delta, 0)
+                                             WHEN p_delta > 0 THEN p_delta
+                                             ELSE t.activity_count END,
+                       activity_date  = CASE WHEN p_delta > 0 THEN GREATEST(t.activity_date, p_day)
+                                             ELSE t.activity_date END,
+                       updated_at     = CURRENT_TIMESTAMP
+                  FROM student s
+                 WHERE s.student_id = p_student
+                   AND t.teacher_id = s.teacher_id
+                   AND p_day >= t.activity_date;
+            END $$
+        """),
+        ("trg_tds_student", """
+            CREATE OR REPLACE FUNCTION trg_tds_student() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP IN ('INSERT', 'UPDATE') THEN PERFORM tds_bump(NEW.teacher_id, 'student_count', 1); END IF;
+                IF TG_OP IN ('DELETE', 'UPDATE') THEN PERFORM tds_bump(OLD.teacher_id, 'student_count', -1); END IF;
+                RETURN NULL;
+            END $$;
+            DROP TRIGGER IF EXISTS tds_student ON student;
+            CREATE TRIGGER tds_student AFTER INSERT OR DELETE OR UPDATE OF teacher_id ON student
+                FOR EACH ROW EXECUTE FUNCTION trg_tds_student();
+        """),
+        ("trg_tds_reaction", """
+            CREATE OR REPLACE FUNCTION trg_tds_reaction() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN PERFORM tds_bump(NEW.teacher_id, 'reaction_count', 1);
+                ELSE PERFORM tds_bump(OLD.teacher_id, 'reaction_count', -1); END IF;
+                RETURN NULL;
+            END $$;
+            DROP TRIGGER IF EXISTS tds_reaction ON reaction;
+            CREATE TRIGGER tds_reaction AFTER INSERT OR DELETE ON reaction
+                FOR EACH ROW EXECUTE FUNCTION trg_tds_reaction();
+        """),
+        ("trg_tds_experiment", """
+            CREATE OR REPLACE FUNCTION trg_tds_experiment() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN PERFORM tds_bump(NEW.teacher_id, 'experiment_count', 1);
+                ELSE PERFORM tds_bump(OLD.teacher_id, 'experiment_count', -1); END IF;
+                RETURN NULL;
+            END $$;
+            DROP TRIGGER IF EXISTS tds_experiment ON experiment;
+            CREATE TRIGGER tds_experiment AFTER INSERT OR DELETE ON experiment
+                FOR EACH ROW EXECUTE FUNCTION trg_tds_experiment();
+        """),
+        ("trg_tds_participation", """
+            CREATE OR REPLACE FUNCTION trg_tds_participation() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN
+                    PERFORM tds_bump_activity(NEW.user_id, NEW.participation_timestamp::date, 1);
+                ELSE
+                    PERFORM tds_bump_activity(OLD.user_id, OLD.participation_timestamp::date, -1);
+                END IF;
+                RETURN NULL;
+            END $$;
+            DROP TRIGGER IF EXISTS tds_participation ON userparticipatesinexperiment;
+            CREATE TRIGGER tds_participation AFTER INSERT OR DELETE ON userparticipatesinexperiment
+                FOR EACH ROW EXECUTE FUNCTION trg_tds_participation();
+        """),
+        # почетна состојба (понатаму ја одржуваат тригерите, drift-от го поправа REPEATABLE)
+        ("backfill_teacher_dashboard_stats", """
+            INSERT INTO teacher_dashboard_stats AS t
+                   (teacher_id, student_count, reaction_count, experiment_count, activity_date, activity_count)
+            SELECT te.teacher_id,
+                   (SELECT COUNT(*) FROM student s    WHERE s.teacher_id = te.teacher_id),
+                   (SELECT COUNT(*) FROM reaction r   WHERE r.teacher_id = te.teacher_id),
+                   (SELECT COUNT(*) FROM experiment e WHERE e.teacher_id = te.teacher_id),
+                   CURRENT_DATE,
+                   (SELECT COUNT(*)
+                      FROM userparticipatesinexperiment up
+                      JOIN student s ON up.user_id = s.student_id
+                     WHERE s.teacher_id = te.teacher_id
+                       AND up.participation_timestamp >= CURRENT_DATE
+                       AND up.participation_timestamp <  CURRENT_DATE + 1)
+              FROM teacher te
+            ON CONFLICT (teacher_id) DO UPDATE
+               SET student_count    = EXCLUDED.student_count,
+                   reaction_count   = EXCLUDED.reaction_count,
+                   experiment_count = EXCLUDED.experiment_count,
+                   activity_date    = EXCLUDED.activity_date,
+                   activity_count   = EXCLUDED.activity_count,
+                   updated_at       = CURRENT_TIMESTAMP
+        """),
+    ]),
+
+    # ---------- активност по корисник (студентски dashboard) ----------
+    Migration(3, "user_activity_counters", [
+        # Нема ред = нема активност, па тригерите смеат да прават upsert.
+        ("user_activity_counters", """
+            CREATE TABLE IF NOT EXISTS user_activity_counters (
+                user_id          INT PRIMARY KEY REFERENCES "User"(user_id) ON DELETE CASCADE,
+                experiment_count INT NOT NULL DEFAULT 0,
+                element_count    INT NOT NULL DEFAULT 0,
+                equipment_count  INT NOT NULL DEFAULT 0,
+                reaction_count   INT NOT NULL DEFAULT 0,
+                updated_at       TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+            )
+        """),
+        ("fn_uac_bump", """
+            CREATE OR REPLACE FUNCTION uac_bump(p_user INT, p_col TEXT, p_delta INT)
+            RETURNS void LANGUAGE plpgsql AS $$
+            BEGIN
+                EXECUTE format(
+                    'INSERT INTO user_activity_counters AS c (user_id, %1$I) VALUES ($2, GREATEST($1, 0)) '
+                    'ON CONFLICT (user_id) DO UPDATE '
+                    'SET %1$I = GREATEST(c.%1$I + $1, 0), updated_at = CURRENT_TIMESTAMP', p_col)
+                USING p_delta, p_user;
+            END $$
+        """),
+        ("trg_uac_element_view", """
+            CREATE OR REPLACE FUNCTION trg_uac_element_view() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN PERFORM uac_bump(NEW.user_id, 'element_count', 1);
+                ELSE PERFORM uac_bump(OLD.user_id, 'element_count', -1); END IF;
+                RETURN NULL;
+            END $$;
+            DROP TRIGGER IF EXISTS uac_element_view ON userviewselement;
+            CREATE TRIGGER uac_element_view AFTER INSERT OR DELETE ON userviewselement
+                FOR EACH ROW EXECUTE FUNCTION trg_uac_element_view();
+        """),
+        ("trg_uac_equipment_view", """
+            CREATE OR REPLACE FUNCTION trg_uac_equipment_view() RETURNS trigger LANGUAGE plpgsql AS $$
+            BEGIN
+                IF TG_OP = 'INSERT' THEN PERFORM uac_bump(NEW.user_id, 'equipment_count', 1);
+                ELSE PERFORM uac_bump(OLD.user_id, 'equipment_count', -1); END IF;
+                RETURN NULL;
+            END $$;
+            DROP TRIGGER IF EXISTS uac_equipment_view ON userviewslabequipment;
+            CREATE TRIGGER uac_equipment_view AFTER INSERT OR DELETE ON userviewslabequipment
+                FOR EACH ROW EXECUTE FUNCTION trg_uac_equipment_view();
+        """),
+        ("trg_uac_participation", """
+            CREATE OR REPLACE FUNCTION trg_uac_participation() RETURNS trigger LANGUAGE plpgsql AS $$
+            DECLARE
+                r      userparticipatesinexperiment%ROWTYPE;
+                delta  INT;
+            BEGIN
+                IF TG_OP = 'INSERT' THEN r := NEW; delta := 1; ELSE r := OLD; delta := -1; END IF;
+                PERFORM uac_bump(r.user_id, 'experiment_count', delta);
+                -- reaction_count брои различни реакции: менува само ако е прва/последна за таа реакција
+                IF NOT EXISTS (
+                    SELECT 1
+                      FROM userparticipatesinexperiment up
+                      JOIN experiment e  ON e.experiment_id  = up.experiment_id
+                      JOIN experiment e0 ON e0.experiment_id = r.experiment_id
+                     WHERE up.user_id = r.user_id
+                       AND up.experiment_id <> r.experiment_id
+                       AND e.reaction_id = e0.reaction_id
+                ) THEN
+                    PERFORM uac_bump(r.user_id, 'reaction_count', delta);
+                END IF;
+                RETURN NULL;
+            END $$;
+            DROP TRIGGER IF EXISTS uac_participation ON userparticipatesinexperiment;
+            CREATE TRIGGER uac_participation AFTER INSERT OR DELETE ON userparticipatesinexperiment
+                FOR EACH ROW EXECUTE FUNCTION trg_uac_participation();
+        """),
+        ("backfill_user_activity_counters", """
+            INSERT INTO user_activity_counters AS c
+                   (user_id, experiment_count, element_count, equipment_count, reaction_count)
+            SELECT u.user_id,
+                   COALESCE(p.experiment_count, 0), COALESCE(ve.n, 0), COALESCE(vl.n, 0),
+                   COALESCE(p.reaction_count, 0)
+              FROM "User" u
+              LEFT JOIN (
+                    SELECT up.user_id, COUNT(*) AS experiment_count, COUNT(DISTINCT e.reaction_id) AS reaction_count
+                      FROM userparticipatesinexperiment up
+                      JOIN experiment e ON up.experiment_id = e.experiment_id
+                     GROUP BY up.user_id
+              ) p ON p.user_id = u.user_id
+              LEFT JOIN (SELECT user_id, COUNT(*) AS n FROM userviewselement GROUP BY user_id) ve
+                     ON ve.user_id = u.user_id
+              LEFT JOIN (SELECT user_id, COUNT(*) AS n FROM userviewslabequipment GROUP BY user_id) vl
+                     ON vl.user_id = u.user_id
+             WHERE p.user_id IS NOT NULL OR ve.user_id IS NOT NULL OR vl.user_id IS NOT NULL
+            ON CONFLICT (user_id) DO UPDATE
+               SET experiment_count = EXCLUDED.experiment_count,
+                   element_count    = EXCLUDED.element_count,
+                   equipment_count  = EXCLUDED.equipment_count,
+                   reaction_count   = EXCLUDED.reaction_count,
+                   updated_at       = CURRENT_TIMESTAMP
+        """),
+    ]),
+
+    # ---------- materialized views за извештаите (освежување: utils/matviews.py) ----------
+    # UNIQUE индексите се задолжителни за REFRESH MATERIALIZED VIEW CONCURRENTLY
+    Migration(4, "report_matviews", [
+        ("mv_user_activity_summary", """
+            CREATE MATERIALIZED VIEW IF NOT EXISTS mv_user_activity_summary AS
+            SELECT u.user_id,
+                   (u.user_name || ' ' || u.user_surname) AS full_name,
+                   u.role,
+                   COALESCE(ve.n, 0) AS elements_viewed,
+                   COALESCE(vl.n, 0) AS equipment_viewed,
+                   COALESCE(p.n, 0)  AS experiments_participated
+              FROM "User" u
+              LEFT JOIN (SELECT user_id, COUNT(DISTINCT element_id) AS n
+                           FROM userviewselement GROUP BY user_id) ve ON ve.user_id = u.user_id
+              LEFT JOIN (SELECT user_id, COUNT(DISTINCT equipment_id) AS n
+                           FROM userviewslabequipment GROUP BY user_id) vl ON vl.user_id = u.user_id
+              LEFT JOIN (SELECT user_id, COUNT(DISTINCT experiment_id) AS n
+                           FROM userparticipatesinexperiment GROUP BY user_id) p ON p.user_id = u.user_id
+        """),
+        Index("ux_mv_user_activity_summary", "mv_user_activity_summary", ["user_id"], unique=True),
+        ("mv_students_experiments", """
+            CREATE MATERIALIZED VIEW IF NOT EXISTS mv_students_experiments AS
+            SELECT s.teacher_id,
+                   s.student_id,
+                   (u.user_name || ' ' || u.user_surname) AS full_name,
+                   e.experiment_id,
+                   e.result,
+                   e.time_stamp,
+                   r.product,
+                   el1.symbol AS element1_symbol,
+                   el2.symbol AS element2_symbol,
+                   up.participation_timestamp AS participation_date
+              FROM student s
+              JOIN "User" u ON s.student_id = u.user_id
+              JOIN userparticipatesinexperiment up ON s.student_id = up.user_id
+              JOIN experiment e ON up.experiment_id = e.experiment_id
+              LEFT JOIN reaction r   ON e.reaction_id = r.reaction_id
+              LEFT JOIN elements el1 ON r.element1_id = el1.element_id
+              LEFT JOIN elements el2 ON r.element2_id = el2.element_id
+        """),
+        # (user_id, experiment_id) е UNIQUE во userparticipatesinexperiment
+        Index("ux_mv_students_experiments", "mv_students_experiments", ["student_id", "experiment_id"],
+              unique=True),
+        Index("idx_mv_students_experiments_teacher", "mv_students_experiments",
+              ["teacher_id", "participation_date DESC"]),
+    ]),
+
+    # ---------- индекси за најчестите барања во DatabaseManager ----------
+    Migration(5, "hot_path_indexes", [
+        # get_experiment_by_reaction: WHERE reaction_id = ? ORDER BY time_stamp DESC
+        Index("idx_experiment_reaction_ts", "experiment", ["reaction_id", "time_stamp DESC"]),
+        Index("idx_experiment_teacher", "experiment", ["teacher_id"]),
+        # учества по корисник, најнови први (dashboard, мои експерименти)
+        Index("idx_participation_user_ts", "userparticipatesinexperiment",
+              ["user_id", "participation_timestamp DESC"], include=["experiment_id"]),
+        Index("idx_participation_experiment", "userparticipatesinexperiment", ["experiment_id"]),
+        Index("idx_student_teacher", "student", ["teacher_id"], include=["student_id"]),
+        Index("idx_reaction_teacher", "reaction", ["teacher_id"]),
+        Index("idx_ele_experiment", "experimentlabequipment", ["experiment_id"], include=["equipment_id"]),
+        # LATERAL бројачите за прегледи по студент
+        Index("idx_userviewselement_user", "userviewselement", ["user_id"]),
+        Index("idx_userviewslabequipment_user", "userviewslabequipment", ["user_id"]),
+    ], transactional=False),
+
+    # самоописни hash-ови (pbkdf2_sha256$... / scrypt$...) се подолги од старите 96 знаци;
+    # додека не е применета, AuthManager го пишува стариот формат (PASSWORD_HASH_MIGRATION)
+    Migration(6, "password_hash_length", [
+        ("widen_user_password", """
+            DO $$
+            BEGIN
+                IF EXISTS (SELECT 1 FROM information_schema.columns
+                            WHERE table_schema = current_schema() AND table_name = 'User'
+                              AND column_name = 'password' AND character_maximum_length < 255) THEN
+                    ALTER TABLE "User" ALTER COLUMN password TYPE VARCHAR(255);
+                END IF;
+            END $$
+        """),
+    ]),
+]
+
+PASSWORD_HASH_MIGRATION = 6
+
+# Се извршуваат при секое `migrate` (корекција на евентуален drift на бројачите)
+REPEATABLE = [
+    step for m in MIGRATIONS for step in m.steps
+    if not isinstance(step, Index) and step[0].startswith("backfill_")
+]
+
+REQUIRED_INDEXES = [step for m in MIGRATIONS for step in m.steps if isinstance(step, Index)]
+
+_EXISTING_INDEXES_SQL = """
+    SELECT ic.relname AS index_name,
+           t.relname  AS table_name,
+           i.indisvalid AS is_valid,
+           i.indisunique AS is_unique,
+           ARRAY(SELECT a.attname::text
+                   FROM unnest(i.indkey[0:i.indnkeyatts - 1]) WITH ORDINALITY AS k(attnum, ord)
+                   LEFT JOIN pg_attribute a ON a.attrelid = i.indrelid AND a.attnum = k.attnum
+                  ORDER BY k.ord) AS columns
+      FROM pg_index i
+      JOIN pg_class ic ON ic.oid = i.indexrelid
+      JOIN pg_class t  ON t.oid  = i.indrelid
+      JOIN pg_namespace n ON n.oid = t.relnamespace
+     WHERE n.nspname = current_schema()
+"""
+
+
+def _existing_indexes(cur):
+    cur.execute(_EXISTING_INDEXES_SQL)
+    return cur.fetchall()
+
+
+def missing_indexes(cur):
+    """Required access paths with no valid index: [{'name', 'table', 'columns'}]."""
+    existing = _existing_indexes(cur)
+    return [{'name': ix.name, 'table': ix.table, 'columns': list(ix.columns) or [ix.expr]}
+            for ix in REQUIRED_INDEXES if not ix.satisfied_by(existing)]
+
+
+def _applied(cur):
+    cur.execute("SELECT version, name, checksum, applied_at FROM schema_migrations ORDER BY version")
+    return {r['version']: r for r in cur.fetchall()}
+
+
+def is_applied(cur, version):
+    """True when migration `version` is recorded in schema_migrations."""
+    cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL AS present")
+    if not cur.fetchone()['present']:
+        return False
+    cur.execute("SELECT 1 FROM schema_migrations WHERE version = %s", (version,))
+    return cur.fetchone() is not None
+
+
+def status(cur):
+    """Applied/pending versions and missing indexes (read-only)."""
+    cur.execute("SELECT to_regclass('schema_migrations') IS NOT NULL AS present")
+    applied = _applied(cur) if cur.fetchone()['present'] else {}
+    drifted = [m.version for m in MIGRATIONS
+               if m.version in applied and applied[m.version]['checksum'] != m.checksum]
+    return {
+        'current_version': max(applied) if applied else 0,
+        'latest_version': MIGRATIONS[-1].version,
+        'pending': [{'version': m.version, 'name': m.name} for m in MIGRATIONS if m.version not in applied],
+        'changed_since_applied': drifted,
+        'missing_indexes': missing_indexes(cur),
+    }
+
+
+def _run_index(cur, ix, existing, concurrently):
+    found = ix.satisfied_by(existing)
+    if found:
+        log.info("index %s: satisfied by %s", ix.name, found)
+        return
+    if any(e['index_name'] == ix.name and not e['is_valid'] for e in existing):
+        # остаток од прекинат CREATE INDEX CONCURRENTLY
+        cur.execute("DROP INDEX %sIF EXISTS %s" % ("CONCURRENTLY " if concurrently else "", ix.name))
+    cur.execute(ix.ddl(concurrently))
+
+
+def _apply(conn, cur, m):
+    started = time.monotonic()
+    existing = _existing_indexes(cur)
+    if m.transactional:
+        conn.autocommit = False
+        try:
+            for step in m.steps:
+                if isinstance(step, Index):
+                    _run_index(cur, step, existing, concurrently=False)
+                else:
+                    cur.execute(step[1])
+            _record(cur, m, started)
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.autocommit = True
+    else:
+        for step in m.steps:
+            if isinstance(step, Index):
+                _run_index(cur, step, existing, concurrently=True)
+            else:
+                cur.execute(step[1])
+        _record(cur, m, started)
+
+
+def _record(cur, m, started):
+    cur.execute(
+        "INSERT INTO schema_migrations (version, name, checksum, duration_ms) VALUES (%s, %s, %s, %s)",
+        (m.version, m.name, m.checksum, round((time.monotonic() - started) * 1000.0, 3)))
+
+
+def migrate(connect):
+    """Apply pending migrations and the repeatable steps on a dedicated connection.
+
+    Returns {'applied': [versions], 'failed': version or None, 'missing_indexes': [...]}.
+    """
+    result = {'applied': [], 'failed': None, 'missing_indexes': []}
+    conn = connect()
+    try:
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(_BOOKKEEPING)
+            cur.execute("SELECT pg_advisory_lock(%s)", (_LOCK_KEY,))
+            try:
+                applied = _applied(cur)
+                for m in MIGRATIONS:
+                    if m.version in applied:
+                        if applied[m.version]['checksum'] != m.checksum:
+                            log.warning("migration %s (%s) changed after it was applied", m.version, m.name)
+                        continue
+                    try:
+                        _apply(conn, cur, m)
+                    except Exception:
+                        log.exception("migration %s (%s) failed", m.version, m.name)
+                        result['failed'] = m.version
+                        break
+                    log.info("applied migration %s (%s)", m.version, m.name)
+                    result['applied'].append(m.version)
+                if result['failed'] is None:
+                    for name, sql in REPEATABLE:
+                        try:
+                            cur.execute(sql)
+                        except Exception:
+                            log.exception("repeatable step %s failed", name)
+            finally:
+                cur.execute("SELECT pg_advisory_unlock(%s)", (_LOCK_KEY,))
+            result['missing_indexes'] = missing_indexes(cur)
+    finally:
+        conn.close()
+    for ix in result['missing_indexes']:
+        log.warning("missing index for %s(%s) (expected %s)", ix['table'], ", ".join(ix['columns']), ix['name'])
+    return result
+
+
+def main(argv=None):
+    from utils.database_manager import DatabaseManager, _conn_cur
+    logging.basicConfig(level=logging.INFO)
+    cmd = (argv or sys.argv[1:] or ["migrate"])[0]
+    if cmd == "migrate":
+        res = migrate(DatabaseManager.get_connection)
+        print("applied: %s" % (res['applied'] or "nothing"))
+        if res['failed'] is not None:
+            print("FAILED at version %s" % res['failed'])
+        for ix in res['missing_indexes']:
+            print("MISSING %(name)s on %(table)s" % ix)
+        return 1 if res['failed'] is not None or res['missing_indexes'] else 0
+    if cmd in ("status", "verify"):
+        with _conn_cur() as cur:
+            st = status(cur)
+        print("version %(current_version)s / %(latest_version)s" % st)
+        for p in st['pending']:
+            print("PENDING %(version)s %(name)s" % p)
+        for v in st['changed_since_applied']:
+            print("CHANGED %s" % v)
+        for ix in st['missing_indexes']:
+            print("MISSING %s on %s(%s)" % (ix['name'], ix['table'], ", ".join(ix['columns'])))
+        if cmd == "verify":
+            return 1 if st['missing_indexes'] or st['pending'] else 0
+        return 0
+    print("usage: python -m utils.migrations [migrate|status|verify]")
+    return 2
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,112 @@
+# pagination.py
+import base64, json, datetime, decimal
+
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 500
+
+
+def clamp_page_size(value, default=DEFAULT_PAGE_SIZE):
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        return default
+    return max(1, min(value, MAX_PAGE_SIZE))
+
+
+def _jsonable(v):
+    if isinstance(v, (datetime.datetime, datetime.date)):
+        return v.isoformat()
+    if isinstance(v, decimal.Decimal):
+        return str(v)
+    return v
+
+
+def encode_token(values):
+    """Opaque page token from the sort-key values of the last row on a page."""
+    raw = json.dumps([_jsonable(v) for v in values], separators=(',', ':'))
+    return base64.urlsafe_b64encode(raw.encode('utf-8')).decode('ascii').rstrip('=')
+
+
+def decode_token(token, arity):
+    """Inverse of encode_token; a malformed token means 'start from the first page'."""
+    if not token:
+        return None
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+    except Exception:
+        return None
+    if not isinstance(values, list) or len(values) != arity:
+        return None
+    return values
+
+
+def keyset_predicate(columns, descending, values):
+    """Row-value comparison continuing after `values` in (columns) order.
+
+    Works because every keyset ends with the primary key, so the tuple is unique.
+    """
+    if values is None:
+        return "TRUE", ()
+    cols = ", ".join(columns)
+    marks = ", ".join(["%s"] * len(columns))
+    op = "<" if descending else ">"
+    return f"({cols}) {op} ({marks})", tuple(values)
+
+
+class LazyCount:
+    """Total row count evaluated only when a template or caller actually reads it."""
+
+    def __init__(self, loader):
+        self._loader = loader
+        self._value = None
+
+    @property
+    def value(self):
+        if self._value is None:
+            try:
+                self._value = int(self._loader() or 0)
+            except Exception:
+                self._value = 0
+        return self._value
+
+    def __int__(self):
+        return self.value
+
+    def __str__(self):
+        return str(self.value)
+
+
+class Page:
+    """One keyset page; iterates like the list of rows it wraps."""
+
+    def __init__(self, items, next_token, page_size, token=None, total_loader=None):
+        self.items = items
+        self.next_token = next_token
+        self.page_size = page_size
+        self.token = token
+        self.total = LazyCount(total_loader or (lambda: len(items)))
+
+    @property
+    def has_more(self):
+        return self.next_token is not None
+
+    def __iter__(self):
+        return iter(self.items)
+
+    def __len__(self):
+        return len(self.items)
+
+    def __bool__(self):
+        return bool(self.items)
+
+
+def build_page(rows, key_fields, page_size, token=None, total_loader=None):
+    """Trim the look-ahead row (queries fetch page_size + 1) and derive the next token."""
+    rows = list(rows or [])
+    next_token = None
+    if len(rows) > page_size:
+        rows = rows[:page_size]
+        last = rows[-1]
+        next_token = encode_token([last[f] for f in key_fields])
+    return Page(rows, next_token, page_size, token=token, total_loader=total_loader)
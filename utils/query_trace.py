@@ -0,0 +1,205 @@
+# query_trace.py
+"""Per-request database instrumentation.
+
+Every connection uses TracingCursor, which times each statement and reports
+it to `query_tracer`. While a request is being served (app.py starts and
+finishes a trace around it) the statement count, database time, connection
+acquisition time and rows are added to that request's trace; the totals go
+out as a Server-Timing header and are aggregated per endpoint for
+/api/query-stats. Statements slower than SLOW_QUERY_MS are logged to
+"simlab.db.slow" with their SQL normalized (literals → ?), whether or not
+a request is active.
+"""
+import os, re, time, logging, threading, contextvars
+from collections import deque
+from psycopg2.extras import RealDictCursor
+
+log = logging.getLogger("simlab.db.trace")
+slow_log = logging.getLogger("simlab.db.slow")
+
+_current = contextvars.ContextVar("simlab_query_trace", default=None)
+
+_WS = re.compile(r"\s+")
+_LITERALS = re.compile(r"""
+    '(?:[^']|'')*'            # 'string'
+  | %\(\w+\)s | %s            # psycopg2 placeholders
+  | \$\d+                     # $n (PREPARE/EXECUTE)
+  | \b\d+(?:\.\d+)?\b         # numbers
+""", re.X)
+_MAX_SQL = 500
+
+
+def normalize_sql(sql):
+    """One-line SQL with literals and placeholders replaced by ?, for grouping in logs."""
+    if isinstance(sql, bytes):
+        sql = sql.decode("utf-8", "replace")
+    elif not isinstance(sql, str):
+        sql = repr(sql)          # psycopg2.sql.Composed
+    sql = _LITERALS.sub("?", _WS.sub(" ", sql).strip())
+    return sql if len(sql) <= _MAX_SQL else sql[:_MAX_SQL] + " …"
+
+
+class RequestTrace:
+    """Totals for one request."""
+
+    __slots__ = ('name', 'started', 'queries', 'db_ms', 'acquires', 'acquire_ms', 'rows', 'slow')
+
+    def __init__(self, name):
+        self.name = name
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.db_ms = 0.0
+        self.acquires = 0
+        self.acquire_ms = 0.0
+        self.rows = 0
+        self.slow = 0
+
+    def elapsed_ms(self):
+        return (time.perf_counter() - self.started) * 1000.0
+
+    def server_timing(self):
+        return ('db;dur=%.1f;desc="%d queries, %d rows", db-acquire;dur=%.1f;desc="%d connections", app;dur=%.1f'
+                % (self.db_ms, self.queries, self.rows, self.acquire_ms, self.acquires, self.elapsed_ms()))
+
+
+class QueryTracer:
+    def __init__(self, enabled=True, slow_ms=200.0, warn_queries=25, keep_slow=50):
+        self.enabled = enabled
+        self.slow_ms = slow_ms
+        self.warn_queries = warn_queries
+        self._lock = threading.Lock()
+        self._endpoints = {}
+        self._recent_slow = deque(maxlen=keep_slow)
+        self._background = {'queries': 0, 'db_ms': 0.0, 'rows': 0}    # надвор од request (нишки, CLI)
+
+    # ---------- request lifecycle ----------
+    def start(self, name):
+        """Begin a trace for the current request; returns a token for finish()."""
+        if not self.enabled:
+            return None
+        return _current.set(RequestTrace(name))
+
+    @staticmethod
+    def current():
+        return _current.get()
+
+    def finish(self, token):
+        trace = _current.get()
+        if token is not None:
+            try:
+                _current.reset(token)
+            except ValueError:      # друг context (пр. streaming одговор)
+                _current.set(None)
+        if trace is None:
+            return None
+        total_ms = trace.elapsed_ms()
+        with self._lock:
+            ep = self._endpoints.get(trace.name)
+            if ep is None:
+                ep = self._endpoints[trace.name] = {
+                    'requests': 0, 'queries': 0, 'queries_max': 0, 'db_ms': 0.0, 'db_ms_max': 0.0,
+                    'acquire_ms': 0.0, 'rows': 0, 'slow': 0, 'total_ms': 0.0}
+            ep['requests'] += 1
+            ep['queries'] += trace.queries
+            ep['queries_max'] = max(ep['queries_max'], trace.queries)
+            ep['db_ms'] += trace.db_ms
+            ep['db_ms_max'] = max(ep['db_ms_max'], trace.db_ms)
+            ep['acquire_ms'] += trace.acquire_ms
+            ep['rows'] += trace.rows
+            ep['slow'] += trace.slow
+            ep['total_ms'] += total_ms
+        if self.warn_queries and trace.queries > self.warn_queries:
+            # најчест знак за N+1
+            log.warning("%s issued %d queries (%.1f ms in the database)", trace.name, trace.queries, trace.db_ms)
+        return trace
+
+    # ---------- called by the cursor / pool ----------
+    def record_query(self, sql, ms, rows):
+        trace = _current.get()
+        rows = max(rows or 0, 0)
+        slow = self.slow_ms is not None and ms >= self.slow_ms
+        if trace is not None:
+            trace.queries += 1
+            trace.db_ms += ms
+            trace.rows += rows
+            trace.slow += slow
+        elif self.enabled:
+            with self._lock:
+                bg = self._background
+                bg['queries'] += 1
+                bg['db_ms'] += ms
+                bg['rows'] += rows
+        if slow:
+            normalized = normalize_sql(sql)
+            endpoint = trace.name if trace is not None else None
+            slow_log.warning("%.1f ms, %d rows [%s]: %s", ms, rows, endpoint or "-", normalized)
+            with self._lock:
+                self._recent_slow.append({'at': time.strftime('%Y-%m-%dT%H:%M:%S'), 'ms': round(ms, 3),
+                                          'rows': rows, 'endpoint': endpoint, 'sql': normalized})
+
+    def record_acquire(self, ms):
+        trace = _current.get()
+        if trace is not None:
+            trace.acquires += 1
+            trace.acquire_ms += ms
+
+    # ---------- reporting ----------
+    def stats(self):
+        with self._lock:
+            endpoints = {name: dict(ep) for name, ep in self._endpoints.items()}
+            slow = list(self._recent_slow)
+            background = dict(self._background)
+        for ep in endpoints.values():
+            n = ep['requests']
+            ep['queries_avg'] = round(ep['queries'] / n, 2)
+            ep['db_ms_avg'] = round(ep['db_ms'] / n, 3)
+            ep['total_ms_avg'] = round(ep['total_ms'] / n, 3)
+            for key in ('db_ms', 'db_ms_max', 'acquire_ms', 'total_ms'):
+                ep[key] = round(ep[key], 3)
+        background['db_ms'] = round(background['db_ms'], 3)
+        return {'enabled': self.enabled, 'slow_ms': self.slow_ms, 'warn_queries': self.warn_queries,
+                'endpoints': dict(sorted(endpoints.items(), key=lambda kv: -kv[1]['db_ms'])),
+                'background': background, 'recent_slow': slow[::-1]}
+
+    def reset(self):
+        with self._lock:
+            self._endpoints.clear()
+            self._recent_slow.clear()
+            self._background = {'queries': 0, 'db_ms': 0.0, 'rows': 0}
+
+
+def settings_from_env():
+    return {
+        'enabled': os.getenv('QUERY_TRACE', '1') not in ('0', 'false', 'no'),
+        'slow_ms': float(os.getenv('SLOW_QUERY_MS', '200')),
+        'warn_queries': int(os.getenv('QUERY_COUNT_WARN', '25')),
+        'keep_slow': int(os.getenv('SLOW_QUERY_KEEP', '50')),
+    }
+
+
+query_tracer = QueryTracer(**settings_from_env())
+
+
+class TracingCursor(RealDictCursor):
+    """RealDictCursor that reports every statement's duration and row count to query_tracer."""
+
+    def execute(self, query, vars=None):
+        started = time.perf_counter()
+        try:
+            return super().execute(query, vars)
+        finally:
+            query_tracer.record_query(query, (time.perf_counter() - started) * 1000.0, self.rowcount)
+
+    def executemany(self, query, vars_list):
+        started = time.perf_counter()
+        try:
+            return super().executemany(query, vars_list)
+        finally:
+            query_tracer.record_query(query, (time.perf_counter() - started) * 1000.0, self.rowcount)
+
+    def copy_expert(self, sql, file, size=8192):
+        started = time.perf_counter()
+        try:
+            return super().copy_expert(sql, file, size)
+        finally:
+            query_tracer.record_query(sql, (time.perf_counter() - started) * 1000.0, self.rowcount)
@@ -0,0 +1,114 @@
+# reaction_index.py
+import os, time, logging, threading
+
+log = logging.getLogger("simlab.reactions")
+
+
+def canonical_pair(a, b):
+    """Order-independent key for an element pair: (min, max)."""
+    return (a, b) if a <= b else (b, a)
+
+
+class ReactionPairIndex:
+    """In-memory map from an unordered element pair to its reactions.
+
+    Keyed both by (min_id, max_id) and by the normalized symbol pair, so the
+    simulate/check endpoints resolve a pair without touching the database.
+    The full table is loaded lazily and reloaded every `ttl` seconds, which
+    bounds staleness when several worker processes write independently.
+    """
+
+    def __init__(self, loader, ttl=60.0):
+        self._loader = loader
+        self.ttl = ttl
+        self._lock = threading.RLock()
+        self._loaded_at = None
+        self._by_ids = {}        # (min_id, max_id) -> [row, ...] sorted by reaction_id
+        self._by_symbols = {}    # (SYM_A, SYM_B)   -> [row, ...]
+        self._by_reaction = {}   # reaction_id -> row
+
+    # ---------- internals ----------
+    @staticmethod
+    def _sym_key(row):
+        return canonical_pair((row.get('element1_symbol') or '').upper(),
+                              (row.get('element2_symbol') or '').upper())
+
+    def _add(self, row):
+        rid = row['reaction_id']
+        self._by_reaction[rid] = row
+        for index, key in ((self._by_ids, canonical_pair(row['element1_id'], row['element2_id'])),
+                           (self._by_symbols, self._sym_key(row))):
+            bucket = [r for r in index.get(key, []) if r['reaction_id'] != rid]
+            bucket.append(row)
+            bucket.sort(key=lambda r: r['reaction_id'])
+            index[key] = bucket
+
+    def _drop(self, reaction_id):
+        row = self._by_reaction.pop(reaction_id, None)
+        if row is None:
+            return
+        for index, key in ((self._by_ids, canonical_pair(row['element1_id'], row['element2_id'])),
+                           (self._by_symbols, self._sym_key(row))):
+            bucket = [r for r in index.get(key, []) if r['reaction_id'] != reaction_id]
+            if bucket:
+                index[key] = bucket
+            else:
+                index.pop(key, None)
+
+    def _ensure_loaded(self):
+        """True when the index can answer (loaded and fresh); False if loading failed."""
+        fresh = self._loaded_at is not None and (
+            not self.ttl or time.monotonic() - self._loaded_at < self.ttl)
+        if fresh:
+            return True
+        with self._lock:
+            if self._loaded_at is not None and (
+                    not self.ttl or time.monotonic() - self._loaded_at < self.ttl):
+                return True
+            rows = self._loader()
+            if rows is None:
+                return False
+            self._by_ids, self._by_symbols, self._by_reaction = {}, {}, {}
+            for row in rows:
+                self._add(dict(row))
+            self._loaded_at = time.monotonic()
+            log.info("reaction index loaded (%d reactions)", len(self._by_reaction))
+            return True
+
+    # ---------- public API ----------
+    def lookup(self, element1_id, element2_id):
+        """Reaction row for the unordered pair; None on miss, raises LookupError if unavailable."""
+        if not self._ensure_loaded():
+            raise LookupError("reaction index unavailable")
+        bucket = self._by_ids.get(canonical_pair(int(element1_id), int(element2_id)))
+        return dict(bucket[0]) if bucket else None
+
+    def lookup_symbols(self, symbol1, symbol2):
+        if not self._ensure_loaded():
+            raise LookupError("reaction index unavailable")
+        key = canonical_pair((symbol1 or '').strip().upper(), (symbol2 or '').strip().upper())
+        bucket = self._by_symbols.get(key)
+        return dict(bucket[0]) if bucket else None
+
+    def upsert(self, row):
+        with self._lock:
+            if self._loaded_at is None:
+                return          # ќе се вчита целосно при прво барање
+            self._drop(row['reaction_id'])
+            self._add(dict(row))
+
+    def remove(self, reaction_id):
+        with self._lock:
+            self._drop(reaction_id)
+
+    def invalidate(self):
+        with self._lock:
+            self._loaded_at = None
+
+    def stats(self):
+        return {'loaded': self._loaded_at is not None, 'reactions': len(self._by_reaction),
+                'pairs': len(self._by_ids), 'ttl': self.ttl}
+
+
+def ttl_from_env():
+    return float(os.getenv('REACTION_INDEX_TTL', '60'))
@@ -0,0 +1,313 @@
+# reports.py
+"""Registry of the advanced SQL reports served under /reports/adv/<name>.
+
+Each report declares its SQL once (with native $n placeholders), its
+parameters and output columns. The statement is PREPAREd the first time it
+runs on a pooled connection and EXECUTEd afterwards, so PostgreSQL parses
+and plans it once per connection instead of once per request.
+"""
+import logging
+
+log = logging.getLogger("simlab.reports")
+
+_INFO_KEY = 'prepared_reports'
+
+
+class MissingParameter(ValueError):
+    """A required report parameter was not supplied."""
+
+
+class Param:
+    """Report parameter: `source` is 'teacher' (the logged-in user) or 'query' (?name=...)."""
+
+    def __init__(self, name, sql_type='integer', source='query', default=None, cast=int):
+        self.name = name
+        self.sql_type = sql_type
+        self.source = source
+        self.default = default
+        self.cast = cast
+
+
+class Report:
+    def __init__(self, name, title, sql, params=(), columns=(), depends_on=(), ttl=120):
+        self.name = name
+        self.title = title                # може да содржи {param}
+        self.sql = sql
+        self.params = tuple(params)
+        self.columns = tuple(columns)
+        self.depends_on = tuple(depends_on)
+        self.ttl = ttl
+
+    @property
+    def statement(self):
+        return "rpt_" + self.name
+
+    def bind(self, args, user_id):
+        """Parameter values (in $n order) from request args and the session user.
+
+        A blank or invalid value falls back to the parameter's default (as
+        request.args.get(..., default=, type=) did); without a default it, or a
+        falsy value such as experiment_id=0, raises MissingParameter.
+        """
+        values = []
+        for p in self.params:
+            raw = user_id if p.source == 'teacher' else args.get(p.name)
+            try:
+                value = None if raw is None or raw == '' else p.cast(raw)
+            except (TypeError, ValueError):
+                value = None
+            if value is None and p.default is not None:
+                value = p.default
+            elif not value and p.default is None:
+                raise MissingParameter(p.name)
+            values.append(value)
+        return tuple(values)
+
+    def format_title(self, values):
+        return self.title.format(**{p.name: v for p, v in zip(self.params, values)})
+
+    def as_dict(self):
+        return {'name': self.name, 'title': self.title, 'columns': list(self.columns),
+                'params': [p.name for p in self.params if p.source == 'query'],
+                'depends_on': list(self.depends_on), 'ttl': self.ttl}
+
+
+REPORTS = {}
+
+
+def register(report):
+    if report.name in REPORTS:
+        raise ValueError("report already registered: %s" % report.name)
+    REPORTS[report.name] = report
+    return report
+
+
+def get(name):
+    return REPORTS.get(name)
+
+
+# ---------- execution ----------
+def _prepared_names(cur, info):
+    names = info.get(_INFO_KEY)
+    if names is None:
+        # нова (или ресетирана) конекција – што е веќе подготвено на серверот
+        cur.execute("SELECT name FROM pg_prepared_statements")
+        names = info[_INFO_KEY] = {r['name'] for r in cur.fetchall()}
+    return names
+
+
+def execute(cur, report, values, info):
+    """Run `report` on `cur`, PREPAREing it first if this connection has not seen it.
+
+    `info` is the pool's per-connection scratch dict (ConnectionPool.conn_info).
+    """
+    try:
+        names = _prepared_names(cur, info)
+        if report.statement not in names:
+            types = ", ".join(p.sql_type for p in report.params)
+            head = "PREPARE %s (%s)" % (report.statement, types) if types else "PREPARE %s" % report.statement
+            cur.execute("%s AS %s" % (head, report.sql))
+            names.add(report.statement)
+            log.debug("prepared %s", report.statement)
+        if values:
+            cur.execute("EXECUTE %s (%s)" % (report.statement, ", ".join(["%s"] * len(values))), values)
+        else:
+            cur.execute("EXECUTE %s" % report.statement)
+        return cur.fetchall()
+    except Exception:
+        # по rollback не знаеме што преживеало – синхронизирај одново при следно користење
+        info.pop(_INFO_KEY, None)
+        raise
+
+
+# ---------- definitions ----------
+_TEACHER = Param('teacher_id', source='teacher')
+
+register(Report(
+    'student_experiment_counts', "Студенти и број на извршени експерименти",
+    """
+        SELECT
+            s.student_id,
+            u.user_name || ' ' || u.user_surname AS full_name,
+            COUNT(up.experiment_id) AS total_experiments
+        FROM student s
+        JOIN "User" u ON s.student_id = u.user_id
+        LEFT JOIN userparticipatesinexperiment up ON s.student_id = up.user_id
+        WHERE s.teacher_id = $1
+        GROUP BY s.student_id, full_name
+        ORDER BY total_experiments DESC, full_name
+    """,
+    params=[_TEACHER],
+    columns=['student_id', 'full_name', 'total_experiments'],
+    depends_on=['User', 'student', 'userparticipatesinexperiment'],
+))
+
+register(Report(
+    'equipment_usage', "Користеност на лабораториска опрема",
+    """
+        SELECT
+            le.equipment_name,
+            COUNT(ele.experiment_id) AS usage_count
+        FROM experimentlabequipment ele
+        JOIN labequipment le ON ele.equipment_id = le.equipment_id
+        GROUP BY le.equipment_name
+        ORDER BY usage_count DESC, le.equipment_name
+    """,
+    columns=['equipment_name', 'usage_count'],
+    depends_on=['labequipment', 'experimentlabequipment'],
+    ttl=600,
+))
+
+register(Report(
+    'students_experiments_detailed', "Детален извештај: студенти и експерименти",
+    """
+        SELECT
+            s.student_id,
+            u.user_name || ' ' || u.user_surname AS full_name,
+            e.experiment_id,
+            e.result,
+            up.participation_timestamp AS participation_time
+        FROM student s
+        JOIN "User" u ON s.student_id = u.user_id
+        JOIN userparticipatesinexperiment up ON s.student_id = up.user_id
+        JOIN experiment e ON up.experiment_id = e.experiment_id
+        WHERE s.teacher_id = $1
+        ORDER BY u.user_name, up.participation_timestamp DESC
+    """,
+    params=[_TEACHER],
+    columns=['student_id', 'full_name', 'experiment_id', 'result', 'participation_time'],
+    depends_on=['User', 'student', 'experiment', 'userparticipatesinexperiment'],
+))
+
+register(Report(
+    'experiment_participants', "Студенти кои го извршиле експеримент #{experiment_id}",
+    """
+        SELECT
+            s.student_id,
+            u.user_name || ' ' || u.user_surname AS full_name,
+            e.experiment_id,
+            e.result
+        FROM student s
+        JOIN "User" u ON s.student_id = u.user_id
+        JOIN userparticipatesinexperiment up ON s.student_id = up.user_id
+        JOIN experiment e ON up.experiment_id = e.experiment_id
+        WHERE s.teacher_id = $1 AND e.experiment_id = $2
+        ORDER BY u.user_name
+    """,
+    params=[_TEACHER, Param('experiment_id')],
+    columns=['student_id', 'full_name', 'experiment_id', 'result'],
+    depends_on=['User', 'student', 'experiment', 'userparticipatesinexperiment'],
+))
+
+register(Report(
+    'avg_equipment_per_experiment', "Просечен број инструменти по експеримент",
+    """
+        SELECT
+            COALESCE(AVG(instrument_count), 0) AS average_lab_equipment_per_experiment
+        FROM (
+            SELECT e.experiment_id, COUNT(ele.equipment_id) AS instrument_count
+            FROM experiment e
+            LEFT JOIN experimentlabequipment ele ON e.experiment_id = ele.experiment_id
+            GROUP BY e.experiment_id
+        ) subquery
+    """,
+    columns=['average_lab_equipment_per_experiment'],
+    depends_on=['experiment', 'experimentlabequipment'],
+    ttl=600,
+))
+
+register(Report(
+    'most_used_elements', "Најчесто користени елементи во експерименти",
+    """
+        SELECT
+            el.element_name,
+            COUNT(r.reaction_id) AS total_uses
+        FROM elements el
+        JOIN reaction r
+          ON el.element_id = r.element1_id
+          OR el.element_id = r.element2_id
+        GROUP BY el.element_name
+        ORDER BY total_uses DESC, el.element_name
+    """,
+    columns=['element_name', 'total_uses'],
+    depends_on=['elements', 'reaction'],
+    ttl=600,
+))
+
+register(Report(
+    'most_performed_experiments', "Најчесто реализирани експерименти",
+    """
+        SELECT
+            e.experiment_id,
+            e.result,
+            COUNT(up.user_id) AS student_participation
+        FROM experiment e
+        LEFT JOIN userparticipatesinexperiment up
+               ON e.experiment_id = up.experiment_id
+        GROUP BY e.experiment_id, e.result
+        ORDER BY student_participation DESC, e.experiment_id
+    """,
+    columns=['experiment_id', 'result', 'student_participation'],
+    depends_on=['experiment', 'userparticipatesinexperiment'],
+))
+
+register(Report(
+    'never_participated_students', "Студенти кои никогаш не учествувале во експерименти",
+    """
+        SELECT
+            s.student_id,
+            u.user_name || ' ' || u.user_surname AS full_name
+        FROM student s
+        JOIN "User" u ON s.student_id = u.user_id
+        LEFT JOIN userparticipatesinexperiment up ON s.student_id = up.user_id
+        WHERE s.teacher_id = $1
+          AND up.user_id IS NULL
+        ORDER BY full_name
+    """,
+    params=[_TEACHER],
+    columns=['student_id', 'full_name'],
+    depends_on=['User', 'student', 'userparticipatesinexperiment'],
+))
+
+register(Report(
+    'students_below_threshold', "Студенти со помалку од {max} експерименти",
+    """
+        SELECT
+            s.student_id,
+            u.user_name || ' ' || u.user_surname AS full_name,
+            COUNT(up.experiment_id) AS total_experiments
+        FROM student s
+        JOIN "User" u ON s.student_id = u.user_id
+        LEFT JOIN userparticipatesinexperiment up ON s.student_id = up.user_id
+        WHERE s.teacher_id = $1
+        GROUP BY s.student_id, full_name
+        HAVING COUNT(up.experiment_id) < $2
+        ORDER BY total_experiments ASC, full_name
+    """,
+    params=[_TEACHER, Param('max', default=3)],
+    columns=['student_id', 'full_name', 'total_experiments'],
+    depends_on=['User', 'student', 'userparticipatesinexperiment'],
+))
+
+register(Report(
+    'student_views', "Прегледи на елементи и опрема по студент",
+    """
+        SELECT
+            s.student_id,
+            u.user_name || ' ' || u.user_surname AS full_name,
+            ue.n AS total_elements_viewed,
+            ul.n AS total_lab_equipment_viewed
+        FROM student s
+        JOIN "User" u ON s.student_id = u.user_id
+        -- посебен бројач по табела (без views_e x views_l производ по студент)
+        CROSS JOIN LATERAL (SELECT COUNT(DISTINCT element_id) AS n
+                              FROM userviewselement WHERE user_id = s.student_id) ue
+        CROSS JOIN LATERAL (SELECT COUNT(DISTINCT equipment_id) AS n
+                              FROM userviewslabequipment WHERE user_id = s.student_id) ul
+        WHERE s.teacher_id = $1
+        ORDER BY total_elements_viewed DESC, total_lab_equipment_viewed DESC
+    """,
+    params=[_TEACHER],
+    columns=['student_id', 'full_name', 'total_elements_viewed', 'total_lab_equipment_viewed'],
+    depends_on=['User', 'student', 'userviewselement', 'userviewslabequipment'],
+))
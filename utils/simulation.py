@@ -0,0 +1,127 @@
+# simulation.py
+"""Temperature-curve engine for the virtual lab.
+
+The didactic model is the first-order recurrence (one step per second)
+
+    T[n+1] = T[n] + k*r - c*(T[n] - T_amb),   T[0] = T_amb
+
+whose closed form is  T(t) = T_amb + (k*r/c) * (1 - (1-c)**t).
+Evaluating it directly makes every point independent, so arbitrary
+durations and sub-second resolutions cost one vectorized pass, and many
+scenarios share the same decay vector.
+"""
+import math
+from array import array
+
+try:  # NumPy е опционален – без него се користи array('d')
+    import numpy as np
+except ImportError:
+    np = None
+
+AMBIENT_C = 25.0
+HEAT_GAIN = 0.9
+COOLING = 0.05
+
+MAX_DURATION_SEC = 600.0
+MIN_STEP_SEC = 0.05
+MAX_POINTS = 20000
+
+
+def _check_grid(duration_sec, step_sec):
+    duration_sec, step_sec = float(duration_sec), float(step_sec)
+    if not (0 < duration_sec <= MAX_DURATION_SEC):
+        raise ValueError(f"duration_sec must be in (0, {MAX_DURATION_SEC:g}]")
+    if step_sec < MIN_STEP_SEC:
+        raise ValueError(f"step_sec must be >= {MIN_STEP_SEC:g}")
+    n = int(math.floor(duration_sec / step_sec + 1e-9)) + 1
+    if n > MAX_POINTS:
+        raise ValueError(f"too many points ({n} > {MAX_POINTS})")
+    return duration_sec, step_sec, n
+
+
+def hazard_factor(hazard_type):
+    """Reactivity multiplier for an element's hazard_type (English or Macedonian keywords)."""
+    if not hazard_type:
+        return 1.0
+    hz = hazard_type.lower()
+    if "flamm" in hz or "оган" in hz:
+        return 1.4
+    if "corros" in hz or "кисел" in hz or "короз" in hz:
+        return 1.25
+    if "toxic" in hz or "токс" in hz:
+        return 1.2
+    return 1.0
+
+
+def reactivity(atomic_number1, hazard1, atomic_number2, hazard2, has_reaction, amount=1.0):
+    """Didactic reactivity of a pair: atomic numbers scaled by hazard and by whether a reaction exists."""
+    hz = hazard_factor(hazard1) * hazard_factor(hazard2) * (1.1 if has_reaction else 1.0)
+    return ((atomic_number1 or 10) + (atomic_number2 or 10)) / 5.0 * hz * float(amount)
+
+
+def time_grid(duration_sec=60, step_sec=1.0):
+    _, step_sec, n = _check_grid(duration_sec, step_sec)
+    if np is not None:
+        return np.arange(n, dtype=np.float64) * step_sec
+    return array('d', (i * step_sec for i in range(n)))
+
+
+def _decay(times, cool):
+    """1 - (1-c)**t, or t itself when there is no cooling (c == 0)."""
+    if np is not None:
+        return times.copy() if cool == 0 else 1.0 - np.power(1.0 - cool, times)
+    if cool == 0:
+        return array('d', times)
+    q = 1.0 - cool
+    return array('d', (1.0 - q ** t for t in times))
+
+
+def _gain(reactivity, k, cool):
+    return k * reactivity / cool if cool else k * reactivity
+
+
+def steady_state(reactivity, ambient=AMBIENT_C, k=HEAT_GAIN, cool=COOLING):
+    """Temperature the curve converges to (inf when there is no cooling)."""
+    return ambient + k * reactivity / cool if cool else math.inf
+
+
+def temperature_curve(reactivity, duration_sec=60, step_sec=1.0,
+                      ambient=AMBIENT_C, k=HEAT_GAIN, cool=COOLING):
+    """(times, temperatures) for one reactivity, as float64 arrays."""
+    times = time_grid(duration_sec, step_sec)
+    decay = _decay(times, cool)
+    g = _gain(float(reactivity), k, cool)
+    if np is not None:
+        return times, ambient + g * decay
+    return times, array('d', (ambient + g * d for d in decay))
+
+
+def temperature_curves(reactivities, amounts=None, duration_sec=60, step_sec=1.0,
+                       ambient=AMBIENT_C, k=HEAT_GAIN, cool=COOLING):
+    """Batch form: one shared time axis and one curve per (reactivity, amount) scenario.
+
+    With NumPy the curves are a (scenarios x points) float64 matrix (one outer
+    product); otherwise a list of array('d').
+    """
+    reactivities = [float(r) for r in reactivities]
+    if amounts is not None:
+        amounts = [float(a) for a in amounts]
+        if len(amounts) != len(reactivities):
+            raise ValueError("reactivities and amounts must have the same length")
+        reactivities = [r * a for r, a in zip(reactivities, amounts)]
+
+    times = time_grid(duration_sec, step_sec)
+    decay = _decay(times, cool)
+    if np is not None:
+        gains = np.asarray([_gain(r, k, cool) for r in reactivities], dtype=np.float64)
+        return times, ambient + np.outer(gains, decay)
+    return times, [array('d', (ambient + g * d for d in decay))
+                   for g in (_gain(r, k, cool) for r in reactivities)]
+
+
+def to_list(values, ndigits=None):
+    """JSON-friendly list from an array/ndarray, optionally rounded."""
+    out = values.tolist()
+    if ndigits is not None:
+        out = [round(v, ndigits) for v in out]
+    return out
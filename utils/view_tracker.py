@@ -0,0 +1,140 @@
+# view_tracker.py
+import os, time, queue, atexit, logging, threading
+# увезено пред atexit.register подолу: затворањето на pool-от се извршува ПОСЛЕ flush-от
+from utils.database_manager import DatabaseManager
+
+log = logging.getLogger("simlab.views")
+
+ELEMENT = 'element'
+EQUIPMENT = 'equipment'
+
+
+class ViewTracker:
+    """Buffers (user, item) view events off the request thread.
+
+    A bounded queue is drained by one daemon thread that coalesces duplicate
+    events and hands them to `flush_fn(element_views, equipment_views,
+    shutdown=...)` in batches. When the queue is full the event is dropped (and counted) rather
+    than blocking the page render.
+    """
+
+    def __init__(self, flush_fn, maxsize=10000, batch_size=500, flush_interval=1.0):
+        self._flush_fn = flush_fn
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._queue = queue.Queue(maxsize=maxsize)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._stopping = threading.Event()
+        self._stats = {'enqueued': 0, 'dropped': 0, 'coalesced': 0,
+                       'flushed': 0, 'batches': 0, 'failed_batches': 0, 'last_flush_ms': 0.0}
+
+    def _ensure_started(self):
+        # нишката се стартува при прв настан (по fork-от на worker-от)
+        if self._thread is not None and self._thread.is_alive():
+            return
+        with self._lock:
+            if self._thread is None or not self._thread.is_alive():
+                self._stopping.clear()
+                self._thread = threading.Thread(target=self._run, name="simlab-view-tracker", daemon=True)
+                self._thread.start()
+
+    def track(self, kind, user_id, item_id):
+        """Queue one view event; returns False when it had to be dropped."""
+        if user_id is None or item_id is None:
+            return False
+        self._ensure_started()
+        try:
+            self._queue.put_nowait((kind, int(user_id), int(item_id)))
+        except queue.Full:
+            with self._lock:
+                self._stats['dropped'] += 1
+            return False
+        with self._lock:
+            self._stats['enqueued'] += 1
+        return True
+
+    def track_element_view(self, user_id, element_id):
+        return self.track(ELEMENT, user_id, element_id)
+
+    def track_equipment_view(self, user_id, equipment_id):
+        return self.track(EQUIPMENT, user_id, equipment_id)
+
+    # ---------- worker ----------
+    def _drain(self, first=None, wait=True):
+        """Collect up to batch_size events (waiting at most flush_interval); deduplicated per kind."""
+        batch = {ELEMENT: set(), EQUIPMENT: set()}
+        taken = 0
+        if first is not None:
+            batch[first[0]].add(first[1:])
+            taken = 1
+        deadline = time.monotonic() + (self.flush_interval if wait else 0)
+        while taken < self.batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self._queue.get(timeout=remaining) if remaining > 0 else self._queue.get_nowait()
+            except queue.Empty:
+                break
+            batch[item[0]].add(item[1:])
+            taken += 1
+        return batch, taken
+
+    def _flush(self, batch, taken, shutdown=False):
+        rows = len(batch[ELEMENT]) + len(batch[EQUIPMENT])
+        if not rows:
+            return
+        started = time.monotonic()
+        try:
+            self._flush_fn(sorted(batch[ELEMENT]), sorted(batch[EQUIPMENT]), shutdown=shutdown)
+            ok = True
+        except Exception:
+            log.exception("view tracking flush failed (%d rows)", rows)
+            ok = False
+        with self._lock:
+            s = self._stats
+            s['coalesced'] += taken - rows
+            s['batches'] += 1
+            s['last_flush_ms'] = round((time.monotonic() - started) * 1000.0, 3)
+            if ok:
+                s['flushed'] += rows
+            else:
+                s['failed_batches'] += 1
+
+    def _run(self):
+        while not self._stopping.is_set():
+            try:
+                first = self._queue.get(timeout=0.5)
+            except queue.Empty:
+                continue
+            self._flush(*self._drain(first))
+
+    def flush(self, shutdown=False):
+        """Synchronously write everything currently queued (used on shutdown)."""
+        while True:
+            batch, taken = self._drain(wait=False)
+            if not taken:
+                return
+            self._flush(batch, taken, shutdown)
+
+    def stop(self, timeout=5.0):
+        self._stopping.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+        # atexit: во овој момент не смее да се стартува нова нишка (matview refresher)
+        self.flush(shutdown=True)
+
+    def stats(self):
+        with self._lock:
+            s = dict(self._stats)
+        s.update(backlog=self._queue.qsize(), capacity=self._queue.maxsize,
+                 running=bool(self._thread and self._thread.is_alive()))
+        return s
+
+
+view_tracker = ViewTracker(
+    DatabaseManager.track_views_bulk,
+    maxsize=int(os.getenv('VIEW_TRACKING_QUEUE', '10000')),
+    batch_size=int(os.getenv('VIEW_TRACKING_BATCH', '500')),
+    flush_interval=float(os.getenv('VIEW_TRACKING_FLUSH_SEC', '1.0')),
+)
+atexit.register(view_tracker.stop)